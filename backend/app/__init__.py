@@ -5,5 +5,5 @@ This package contains all the core functionality including API routes,
 database models, and services.
 """
 
-from .database import Base, engine, SessionLocal
+from .database import Base, engine, SessionLocal, async_engine, AsyncSessionLocal
 from . import models
\ No newline at end of file
@@ -0,0 +1,77 @@
+# backend/app/compression.py
+"""
+Compression of note content at rest.
+
+Every compressed value starts with a one-byte format tag, so the codec can
+change over time while rows written with an older format stay readable.
+zstd is used when the optional zstandard package is installed, gzip
+otherwise; NOTE_COMPRESSION selects one explicitly.
+"""
+
+import os
+import gzip
+import logging
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Format tags stored as the first byte of every value
+FORMAT_RAW = 0
+FORMAT_GZIP = 1
+FORMAT_ZSTD = 2
+
+# Values shorter than this are stored raw; compressing them saves nothing
+MIN_COMPRESS_SIZE = 64
+
+def _default_codec() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+CODEC = os.getenv("NOTE_COMPRESSION", _default_codec()).lower()
+LEVEL = os.getenv("NOTE_COMPRESSION_LEVEL")
+
+if CODEC == "zstd" and zstandard is None:
+    logger.warning("NOTE_COMPRESSION=zstd but zstandard is not installed, using gzip")
+    CODEC = "gzip"
+
+def compress_text(value: str, codec: str = CODEC) -> bytes:
+    """
+    Compresses text into a tagged blob.
+
+    Args:
+        value: Text to store
+        codec: "zstd", "gzip" or "none"
+
+    Returns:
+        The format tag followed by the encoded bytes
+    """
+    raw = value.encode("utf-8")
+    if codec == "none" or len(raw) < MIN_COMPRESS_SIZE:
+        return bytes([FORMAT_RAW]) + raw
+    if codec == "zstd":
+        level = int(LEVEL) if LEVEL else 3
+        return bytes([FORMAT_ZSTD]) + zstandard.ZstdCompressor(level=level).compress(raw)
+    level = int(LEVEL) if LEVEL else 6
+    return bytes([FORMAT_GZIP]) + gzip.compress(raw, compresslevel=level, mtime=0)
+
+def decompress_text(blob: bytes) -> str:
+    """
+    Decodes a blob written by compress_text in any supported format.
+
+    Raises:
+        ValueError: If the format tag is unknown or zstandard is missing
+    """
+    blob = bytes(blob)
+    tag, payload = blob[0], blob[1:]
+    if tag == FORMAT_RAW:
+        return payload.decode("utf-8")
+    if tag == FORMAT_GZIP:
+        return gzip.decompress(payload).decode("utf-8")
+    if tag == FORMAT_ZSTD:
+        if zstandard is None:
+            raise ValueError("Note content is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    raise ValueError(f"Unknown note content format {tag}")
@@ -1,11 +1,16 @@
 # backend/app/database.py
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
+import time
 from dotenv import load_dotenv
 
+from .metrics import DB_POOL_CHECKOUT_SECONDS, DB_POOL_IN_USE
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -13,17 +18,43 @@ load_dotenv()
 # In Docker, this will use the URL we defined in docker-compose.yml
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Create the SQLAlchemy engine with some sensible defaults for a web application
-engine = create_engine(
-    DATABASE_URL,
+# Connection pool settings shared by the sync and async engines
+POOL_SETTINGS = {
     # Pool size determines how many connections to keep in memory
-    pool_size=5,
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
     # Max overflow allows temporary additional connections when pool_size is reached
-    max_overflow=10,
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
     # Connection timeout in seconds
-    pool_timeout=30,
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
     # Recycle connections after 30 minutes to prevent stale connections
-    pool_recycle=1800,
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+}
+
+class _TimedCheckout:
+    """Pool mixin that records how long each checkout waits for a connection."""
+
+    engine_label = ""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(self.engine_label).observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    engine_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+# Create the SQLAlchemy engine with some sensible defaults for a web application
+engine = create_engine(
+    DATABASE_URL,
+    **POOL_SETTINGS,
+    poolclass=TimedQueuePool,
     # Echo SQL statements for debugging (set to False in production)
     echo=False
 )
@@ -33,5 +64,43 @@ engine = create_engine(
 # autoflush=False prevents SQLAlchemy from automatically flushing on every query
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(url: str) -> str:
+    """
+    Derives the async driver URL from a sync database URL, e.g.
+    postgresql://... becomes postgresql+asyncpg://...
+    """
+    async_drivers = {
+        "postgresql": "postgresql+asyncpg",
+        "postgresql+psycopg2": "postgresql+asyncpg",
+        "sqlite": "sqlite+aiosqlite",
+    }
+    scheme, separator, rest = url.partition("://")
+    return f"{async_drivers.get(scheme, scheme)}{separator}{rest}"
+
+# The async engine serves the request handlers so database I/O never blocks
+# the event loop. Set ASYNC_DATABASE_URL to override the derived URL.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **POOL_SETTINGS,
+    # aiosqlite defaults to a pool without sizing options; use a queue pool
+    # so the same settings apply everywhere
+    poolclass=TimedAsyncQueuePool,
+    echo=False
+)
+
+# Connections in use are read from the pools when /metrics is scraped
+DB_POOL_IN_USE.labels("sync").set_function(lambda: engine.pool.checkedout())
+DB_POOL_IN_USE.labels("async").set_function(lambda: async_engine.pool.checkedout())
+
+# expire_on_commit=False keeps loaded attributes usable after commit without
+# an implicit (and, in async code, illegal) lazy reload
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base class that our database models will inherit from
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
@@ -1,24 +1,47 @@
 # backend/app/main.py
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Depends, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+import json
+import math
+import asyncio
 import logging
+from functools import partial
 from datetime import datetime
+import os
 
 from . import models
-from .database import SessionLocal, engine
+from .database import SessionLocal, AsyncSessionLocal, engine, async_engine
 from .services.ollama_service import OllamaService
+from .services.resilience import CircuitOpenError
+from .services.admission import AdmissionController, AdmissionRejected
+from .services.cache_service import GenerationCache
+from .services.job_queue import JobQueue, QueueFullError
+from .services.embedding_service import EmbeddingService
+from .services.note_writer import GroupCommitWriter
+from .services.precompute import PrecomputeScheduler
+from .services import note_service, transfer_service, topic_service
+from .services.search_service import search_notes, SearchNotSupportedError
+from .services.read_cache import CachedNote
+from .schema import upgrade_schema
+from .middleware import CompressionMiddleware, MetricsMiddleware
+from .serialization import FastJSONResponse, encode_note, note_response
+from .sections import SECTION_KEYS, parse_sections
+from .topics import canonical_topic
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel, Field
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create database tables
+# Create database tables and any indexes missing from existing tables
 models.Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -36,8 +59,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Ollama service
-ollama_service = OllamaService()
+# Compress responses above GZIP_MINIMUM_SIZE bytes; streams are left alone
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1000"))
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=GZIP_MINIMUM_SIZE,
+    compresslevel=int(os.getenv("GZIP_COMPRESSION_LEVEL", "6"))
+)
+
+# Outermost, so request timings include compression
+app.add_middleware(MetricsMiddleware)
+
+# Initialize Ollama service with a two-tier generation cache in front of it
+generation_cache = GenerationCache(session_factory=SessionLocal)
+ollama_service = OllamaService(cache=generation_cache)
+
+# Embeddings for related-note and semantic search
+embedding_service = EmbeddingService(
+    embed=ollama_service.embed,
+    session_factory=AsyncSessionLocal,
+    model=ollama_service.embedding_model
+)
+
+# Optional write-behind path that commits concurrently completed notes
+# together (NOTE_GROUP_COMMIT=true)
+note_writer = GroupCommitWriter(session_factory=AsyncSessionLocal, write=note_service.insert_notes)
+
+# Whether coalesced identical requests each get their own note ("copy")
+# or all receive the single note saved for the shared generation ("shared")
+NOTE_DEDUP_MODE = os.getenv("NOTE_DEDUP_MODE", "copy")
+
+# Minimum cosine similarity for reuse_similar to return an existing note
+SEMANTIC_REUSE_THRESHOLD = float(os.getenv("SEMANTIC_REUSE_THRESHOLD", "0.9"))
+
+# Whether create_note serves an existing note on the same normalized topic
+# (within TOPIC_REUSE_THRESHOLD) when the request does not say
+TOPIC_REUSE = os.getenv("TOPIC_REUSE", "false").lower() == "true"
+
+# Concurrency, queueing and per-client rate limits for generation endpoints.
+# Read endpoints never pass through it.
+admission = AdmissionController()
+
+# How long clients may reuse a note response before revalidating it
+NOTE_CACHE_CONTROL = f"public, max-age={int(os.getenv('NOTE_CACHE_MAX_AGE', '60'))}"
+
+# Limits for POST /notes/batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
 
 # Pydantic models for request validation
 class NoteRequest(BaseModel):
@@ -48,6 +116,29 @@ class NoteRequest(BaseModel):
                       pattern="^(beginner|intermediate|expert)$")
     learning_style: str = Field(..., description="Preferred learning style",
                               pattern="^(visual|auditory|reading|kinesthetic)$")
+    bypass_cache: bool = Field(False, description="Skip the generation cache entirely")
+    refresh_cache: bool = Field(False, description="Regenerate and overwrite any cached result")
+    reuse_similar: bool = Field(False, description="Return an existing note on a semantically "
+                                                   "similar topic instead of generating a new one")
+    reuse_topic: Optional[bool] = Field(None, description="Return an existing note whose normalized "
+                                                          "topic matches instead of generating a new "
+                                                          "one; defaults to TOPIC_REUSE")
+    generation_mode: Optional[str] = Field(None, pattern="^(single|sections)$",
+                                           description="Generate the note in one request (single) "
+                                                       "or one concurrent request per section "
+                                                       "(sections); defaults to GENERATION_MODE")
+
+class RegenerateSectionRequest(BaseModel):
+    """Schema for regenerating one section of a note"""
+    instructions: Optional[str] = Field(None, max_length=500,
+                                        description="What to change, e.g. \"use simpler examples\"")
+
+class BatchNoteRequest(BaseModel):
+    """Schema for generating several notes in one request"""
+    items: List[NoteRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS,
+                                     description="Notes to generate")
+    concurrency: Optional[int] = Field(None, ge=1, description="Maximum generations in "
+                                                               "flight; capped by BATCH_CONCURRENCY")
 
 class NoteResponse(BaseModel):
     """Schema for note responses"""
@@ -64,13 +155,10 @@ class NoteResponse(BaseModel):
         from_attributes = True  # Enables ORM model conversion
 
 # Database dependency
-def get_db():
-    """Database session dependency for routes"""
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    """Async database session dependency for routes"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @app.get("/health")
 async def health_check():
@@ -79,13 +167,171 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "ollama_server": "healthy" if ollama_health else "unhealthy"
+        "ollama_server": "healthy" if ollama_health else "unhealthy",
+        "ollama_nodes": ollama_service.pool.status(),
+        "ollama_circuit": ollama_service.breaker.to_dict(),
+        "generation_cache": generation_cache.stats(),
+        "coalesced_generations": ollama_service.generations.coalesced,
+        "admission": admission.stats(),
+        "note_read_cache": note_service.read_cache.stats(),
+        "note_writer": note_writer.stats(),
+        "precompute": precompute_scheduler.stats()
     }
 
-@app.post("/notes", response_model=NoteResponse)
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+async def _save_note(
+    db: AsyncSession,
+    request: NoteRequest,
+    generation_result: Dict[str, Any]
+) -> models.Note:
+    """Saves a generated note and schedules its embedding in the background"""
+    new_note = await note_service.save_generated_note(
+        db,
+        title=request.title,
+        topic=request.topic,
+        level=request.level,
+        learning_style=request.learning_style,
+        generation_result=generation_result,
+        share_rows=NOTE_DEDUP_MODE == "shared",
+        writer=note_writer if note_writer.enabled else None,
+        session_factory=AsyncSessionLocal
+    )
+    embedding_service.schedule_index(
+        new_note.id,
+        embedding_service.note_text(new_note.title, new_note.topic, new_note.content)
+    )
+    return new_note
+
+async def _find_similar_note(
+    db: AsyncSession,
+    request: NoteRequest
+) -> Optional[Tuple[models.Note, float]]:
+    """
+    Looks for an existing note with the same level and learning style whose
+    embedding is within SEMANTIC_REUSE_THRESHOLD of the requested topic.
+    """
+    try:
+        matches = await embedding_service.search_text(f"{request.title}\n{request.topic}", k=10)
+    except Exception as e:
+        logger.error(f"Semantic reuse lookup failed: {str(e)}")
+        return None
+    
+    for note_id, similarity in matches:
+        if similarity < SEMANTIC_REUSE_THRESHOLD:
+            break
+        note = await note_service.get_note(db, note_id)
+        if note is not None and note.level == request.level \
+                and note.learning_style == request.learning_style:
+            return note, similarity
+    return None
+
+async def _find_reusable_note(
+    db: AsyncSession,
+    request: NoteRequest
+) -> Optional[Tuple[models.Note, Dict[str, Any]]]:
+    """
+    Looks for an existing note to serve instead of generating one, by
+    canonical topic (reuse_topic) or by embedding (reuse_similar).
+    
+    Returns:
+        The note and the fields marking it as reused in its metadata, or
+        None if a new note has to be generated
+    """
+    reuse_topic = TOPIC_REUSE if request.reuse_topic is None else request.reuse_topic
+    if reuse_topic and not (request.bypass_cache or request.refresh_cache):
+        matches = await topic_service.find_topic_matches(
+            db, request.topic, level=request.level, learning_style=request.learning_style, limit=1
+        )
+        note = await note_service.get_note(db, matches[0][0]) if matches else None
+        if note is not None:
+            logger.info(f"Reusing note {note.id} (topic similarity {matches[0][1]:.3f}) for topic: {request.topic}")
+            return note, {"reused": True, "match": "topic", "similarity": matches[0][1]}
+    
+    if request.reuse_similar:
+        similar = await _find_similar_note(db, request)
+        if similar is not None:
+            note, similarity = similar
+            logger.info(f"Reusing note {note.id} (similarity {similarity:.3f}) for topic: {request.topic}")
+            return note, {"reused": True, "similarity": round(similarity, 4)}
+    
+    return None
+
+async def _run_generation_job(request_data: Dict[str, Any]) -> int:
+    """Generates and saves the note for a queued job, returning the note id"""
+    request = NoteRequest(**request_data)
+    # Checked when the job runs, so it can also reuse a note that an
+    # earlier job in the queue has just saved
+    async with AsyncSessionLocal() as db:
+        reusable = await _find_reusable_note(db, request)
+    if reusable is not None:
+        return reusable[0].id
+    
+    # Queued jobs share the generation slots but never get shed; the queue
+    # already bounds how many wait
+    generation_result = await ollama_service.generate_study_notes(
+        topic=request.topic,
+        level=request.level,
+        learning_style=request.learning_style,
+        bypass_cache=request.bypass_cache,
+        refresh_cache=request.refresh_cache,
+        generation_mode=request.generation_mode,
+        slot=partial(admission.slot, shed=False)
+    )
+    
+    async with AsyncSessionLocal() as db:
+        new_note = await _save_note(db, request, generation_result)
+        return new_note.id
+
+# Background queue for POST /notes?async=true
+job_queue = JobQueue(session_factory=SessionLocal, handler=_run_generation_job)
+
+# Fills the generation cache with popular requests while Ollama is idle
+# (PRECOMPUTE_ENABLED=true), yielding to real requests at once
+precompute_scheduler = PrecomputeScheduler(
+    session_factory=AsyncSessionLocal,
+    ollama_service=ollama_service,
+    admission=admission,
+    job_queue=job_queue
+)
+
+def _client_key(http_request: Request) -> str:
+    """Identifies the client for rate limiting: its API key, else its IP"""
+    api_key = http_request.headers.get("X-API-Key")
+    if api_key:
+        return f"key:{api_key}"
+    return f"ip:{http_request.client.host if http_request.client else 'unknown'}"
+
+def _rejected(error: AdmissionRejected) -> HTTPException:
+    """Builds the 429/503 returned when admission control sheds a request"""
+    return HTTPException(
+        status_code=error.status_code,
+        detail=error.detail,
+        headers={"Retry-After": str(max(math.ceil(error.retry_after), 1))}
+    )
+
+def _unavailable(error: CircuitOpenError) -> HTTPException:
+    """Builds the 503 returned while the Ollama circuit breaker is open"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(error),
+        headers={"Retry-After": str(max(int(error.retry_after + 0.5), 1))}
+    )
+
+@app.post(
+    "/notes",
+    response_model=NoteResponse,
+    responses={202: {"description": "Generation job accepted; poll /jobs/{job_id}"}}
+)
 async def create_note(
     request: NoteRequest,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    async_mode: bool = Query(False, alias="async", description="Queue the generation and return a job id"),
+    priority: int = Query(0, ge=0, le=9, description="Queue priority for async jobs; higher runs first"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new study note using the Ollama model.
@@ -95,56 +341,487 @@ async def create_note(
     2. Generates study notes using Ollama
     3. Saves the notes to the database
     4. Returns the created note with its content
+    
+    With ?async=true the request is queued instead and the endpoint returns
+    202 with a job id right away.
+    
+    With reuse_topic, an existing note for the same level and learning
+    style whose normalized topic matches is returned instead, so "Python
+    Variables" and "Variables in Python" cost one generation.
+    
+    Requests over the client's rate limit get 429, and requests arriving
+    while every generation slot is busy and the wait queue is full get
+    503; both carry Retry-After.
     """
     try:
-        # Generate study notes using Ollama
-        generation_result = await ollama_service.generate_study_notes(
-            topic=request.topic,
-            level=request.level,
-            learning_style=request.learning_style
+        admission.check_rate(_client_key(http_request))
+    except AdmissionRejected as e:
+        raise _rejected(e)
+    
+    if async_mode:
+        try:
+            job = await job_queue.submit(request.model_dump(), priority=priority)
+        except QueueFullError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e)
+            )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=job,
+            headers={"Location": f"/jobs/{job['id']}"}
         )
-        
-        # Create new note in database
-        new_note = models.Note(
-            title=request.title,
+    
+    reusable = await _find_reusable_note(db, request)
+    if reusable is not None:
+        note, reuse = reusable
+        return FastJSONResponse(note_response(note, metadata={**(note.note_metadata or {}), **reuse}))
+    
+    try:
+        # Generate study notes using Ollama; only a call that reaches Ollama
+        # waits for a generation slot, cache hits are served at once
+        generation_result = await ollama_service.generate_study_notes(
             topic=request.topic,
-            content=generation_result["content"],
             level=request.level,
             learning_style=request.learning_style,
-            metadata=generation_result["metadata"]
+            bypass_cache=request.bypass_cache,
+            refresh_cache=request.refresh_cache,
+            generation_mode=request.generation_mode,
+            slot=admission.slot
         )
         
-        # Save to database
-        db.add(new_note)
-        db.commit()
-        db.refresh(new_note)
+        # Save the new note to the database
+        new_note = await _save_note(db, request, generation_result)
         
-        return new_note
+        return FastJSONResponse(note_response(new_note))
         
+    except AdmissionRejected as e:
+        raise _rejected(e)
+    except CircuitOpenError as e:
+        raise _unavailable(e)
     except Exception as e:
         logger.error(f"Error creating note: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create note: {str(e)}"
         )
 
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Formats a single server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/notes/stream")
+async def create_note_stream(request: NoteRequest, http_request: Request):
+    """
+    Create a new study note, streaming the content as it is generated.
+    
+    Responds with server-sent events:
+    - "chunk" events carrying content as Ollama produces it
+    - a final "done" event with the id of the saved note
+    - an "error" event if generation or saving fails
+    
+    While the Ollama circuit breaker is open, or admission control sheds
+    the request, it is rejected with 429/503 before the stream starts. The
+    generation slot is held by the stream itself, so it stays taken until
+    the last chunk is sent; notes served from the cache take none.
+    """
+    try:
+        admission.check_rate(_client_key(http_request))
+    except AdmissionRejected as e:
+        raise _rejected(e)
+    
+    cached = not (request.bypass_cache or request.refresh_cache) and await ollama_service.is_cached(
+        request.topic, request.level, request.learning_style, request.generation_mode
+    )
+    if not cached:
+        if ollama_service.breaker.state == ollama_service.breaker.OPEN:
+            raise _unavailable(CircuitOpenError(ollama_service.breaker.retry_after()))
+        try:
+            admission.check_capacity()
+        except AdmissionRejected as e:
+            raise _rejected(e)
+    
+    async def event_stream():
+        chunks = []
+        stats: Dict[str, Any] = {}
+        try:
+            async for chunk in ollama_service.stream_study_notes(
+                topic=request.topic,
+                level=request.level,
+                learning_style=request.learning_style,
+                bypass_cache=request.bypass_cache,
+                refresh_cache=request.refresh_cache,
+                stats=stats,
+                generation_mode=request.generation_mode,
+                slot=admission.slot
+            ):
+                chunks.append(chunk)
+                yield _sse_event("chunk", {"content": chunk})
+            
+            generation_result = {
+                "content": "".join(chunks),
+                "metadata": ollama_service.build_metadata(
+                    request.topic, request.level, request.learning_style, stats,
+                    generation_mode=request.generation_mode or ollama_service.generation_mode
+                )
+            }
+            
+            # The request-scoped session is already closed once streaming
+            # starts, so the note is saved with a session of its own
+            async with AsyncSessionLocal() as db:
+                new_note = await _save_note(db, request, generation_result)
+            yield _sse_event("done", {
+                "id": new_note.id,
+                "created_at": new_note.created_at.isoformat() if new_note.created_at else None
+            })
+                
+        except Exception as e:
+            logger.error(f"Error streaming note: {str(e)}")
+            yield _sse_event("error", {"detail": f"Failed to create note: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx from buffering the stream
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+def _ndjson_line(data: Dict[str, Any]) -> str:
+    """Formats a single newline-delimited JSON record"""
+    return json.dumps(data) + "\n"
+
+@app.post("/notes/batch")
+async def create_notes_batch(batch: BatchNoteRequest, http_request: Request):
+    """
+    Generate many notes in one request, e.g. for a whole syllabus.
+    
+    Generations run concurrently up to the concurrency limit, and one
+    failing item never stops the rest. The response is streamed as
+    newline-delimited JSON:
+    - an "item" record as each generation finishes, in completion order
+    - a final "summary" record with the per-item status and note ids, sent
+      after all generated notes are saved with a single bulk insert
+    
+    Every item counts against the client's rate limit. Items then wait for
+    the shared generation slots rather than being shed one by one.
+    """
+    try:
+        admission.check_rate(_client_key(http_request), cost=len(batch.items))
+    except AdmissionRejected as e:
+        raise _rejected(e)
+    
+    concurrency = min(batch.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def generate(index: int, item: NoteRequest):
+        async with semaphore:
+            try:
+                generation_result = await ollama_service.generate_study_notes(
+                    topic=item.topic,
+                    level=item.level,
+                    learning_style=item.learning_style,
+                    bypass_cache=item.bypass_cache,
+                    refresh_cache=item.refresh_cache,
+                    generation_mode=item.generation_mode,
+                    slot=partial(admission.slot, shed=False)
+                )
+                return index, generation_result, None
+            except Exception as e:
+                return index, None, str(e)
+    
+    async def result_stream():
+        results: List[Dict[str, Any]] = [{} for _ in batch.items]
+        generated: List[Tuple[int, Dict[str, Any]]] = []
+        tasks = [asyncio.create_task(generate(index, item)) for index, item in enumerate(batch.items)]
+        
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, generation_result, error = await finished
+                if error is None:
+                    generated.append((index, generation_result))
+                    results[index] = {"index": index, "status": "generated"}
+                else:
+                    logger.error(f"Batch item {index} failed: {error}")
+                    results[index] = {"index": index, "status": "failed", "error": error}
+                yield _ndjson_line({"type": "item", **results[index]})
+        finally:
+            # Stop outstanding work if the client goes away mid-batch
+            for task in tasks:
+                task.cancel()
+        
+        try:
+            async with AsyncSessionLocal() as db:
+                note_ids = await note_service.bulk_save_generated_notes(db, [
+                    {
+                        "title": batch.items[index].title,
+                        "topic": batch.items[index].topic,
+                        "level": batch.items[index].level,
+                        "learning_style": batch.items[index].learning_style,
+                        "generation_result": generation_result
+                    }
+                    for index, generation_result in generated
+                ])
+            
+            for (index, generation_result), note_id in zip(generated, note_ids):
+                item = batch.items[index]
+                results[index] = {"index": index, "status": "created", "note_id": note_id}
+                embedding_service.schedule_index(
+                    note_id,
+                    embedding_service.note_text(item.title, item.topic, generation_result["content"])
+                )
+        except Exception as e:
+            logger.error(f"Error saving batch: {str(e)}")
+            for index, _ in generated:
+                results[index] = {"index": index, "status": "failed",
+                                  "error": f"Failed to save note: {str(e)}"}
+        
+        yield _ndjson_line({
+            "type": "summary",
+            "created": sum(1 for result in results if result["status"] == "created"),
+            "failed": sum(1 for result in results if result["status"] == "failed"),
+            "results": results
+        })
+    
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+# Declared before /notes/{note_id} so "topic-matches" is not parsed as a note id
+@app.get("/notes/topic-matches")
+async def topic_matches(
+    topic: str = Query(..., min_length=1, max_length=255),
+    level: Optional[str] = Query(None, pattern="^(beginner|intermediate|expert)$"),
+    learning_style: Optional[str] = Query(None, pattern="^(visual|auditory|reading|kinesthetic)$"),
+    threshold: float = Query(topic_service.TOPIC_REUSE_THRESHOLD, ge=0.0, le=1.0),
+    limit: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Find existing notes on the same or a nearly identical topic, e.g. to
+    offer one of them before generating a new note.
+    
+    Topics are compared in normalized form (case, whitespace, punctuation,
+    stop words and word order are ignored) and scored by trigram
+    similarity; exact normalized matches score 1.
+    """
+    try:
+        matches = await topic_service.find_topic_matches(
+            db, topic, level=level, learning_style=learning_style,
+            threshold=threshold, limit=limit
+        )
+        return {
+            "topic": topic,
+            "canonical_topic": canonical_topic(topic),
+            "results": await _scored_summaries(db, matches)
+        }
+    except SQLAlchemyError as e:
+        logger.error(f"Database error matching topics: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+# Declared before /notes/{note_id} so "export" is not parsed as a note id
+@app.get("/notes/export")
+async def export_notes(
+    after_id: int = Query(0, ge=0, description="Resume after this id, e.g. the last_id of a broken export"),
+    compression: str = Query("none", pattern="^(none|gzip)$"),
+    batch_size: int = Query(transfer_service.EXPORT_BATCH_SIZE, ge=1, le=10000)
+):
+    """
+    Export notes as newline-delimited JSON, in id order.
+    
+    The stream holds one "note" record per note, a "progress" record after
+    every batch_size notes and a final "end" record. Its last_id can be
+    passed as after_id to resume, and the output can be sent to
+    POST /notes/import as is. With compression=gzip the whole stream is
+    gzipped, for downloading to a .ndjson.gz file.
+    """
+    async def record_stream():
+        # The request-scoped session is closed once streaming starts, and
+        # the server-side cursor needs its session for the whole export
+        async with AsyncSessionLocal() as db:
+            lines = []
+            try:
+                async for record in transfer_service.export_notes(db, after_id, batch_size):
+                    lines.append(_ndjson_line(record))
+                    # Sent a batch at a time, closed by its progress record, so
+                    # gzip output is flushed once per batch rather than per note
+                    if record["type"] != "note":
+                        yield "".join(lines).encode("utf-8")
+                        lines = []
+            except Exception as e:
+                logger.error(f"Error exporting notes: {str(e)}")
+                lines.append(_ndjson_line({"type": "error", "detail": f"Export failed: {str(e)}"}))
+                yield "".join(lines).encode("utf-8")
+    
+    if compression == "gzip":
+        return StreamingResponse(
+            transfer_service.gzip_stream(record_stream()),
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="notes.ndjson.gz"'}
+        )
+    return StreamingResponse(record_stream(), media_type="application/x-ndjson")
+
+@app.post("/notes/import")
+async def import_notes(
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    after_id: int = Query(0, ge=0, description="Skip records with ids up to this one"),
+    skip: int = Query(0, ge=0, description="Skip this many note records first"),
+    ids: str = Query("keep", pattern="^(keep|new)$",
+                     description="keep record ids and skip existing notes, or assign new ones"),
+    batch_size: int = Query(transfer_service.IMPORT_BATCH_SIZE, ge=1, le=10000)
+):
+    """
+    Import notes from a newline-delimited JSON body, plain or gzipped, in
+    the format written by GET /notes/export.
+    
+    The body is read and written in batches as it arrives, each committed
+    on its own, so bodies of any size use constant memory. The summary
+    reports counts, the first invalid lines, and last_id/records for
+    resuming with after_id or skip. If a batch fails, complete is false
+    and everything before it stays committed. With ids=keep, sending the
+    same file again only skips the notes that already exist.
+    """
+    # Errors past the first batch are reported in the summary, since
+    # earlier batches are already committed
+    summary = await transfer_service.import_notes(
+        AsyncSessionLocal,
+        transfer_service.read_lines(http_request.stream()),
+        after_id=after_id,
+        skip=skip,
+        keep_ids=ids == "keep",
+        batch_size=batch_size
+    )
+    if summary["imported"]:
+        # Imported notes are written in bulk, without embeddings; they are
+        # embedded once the summary has been sent
+        background_tasks.add_task(embedding_service.backfill)
+    
+    return summary
+
+# Declared before /notes/{note_id} so "search" is not parsed as a note id
+@app.get("/notes/search")
+async def search_notes_endpoint(
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms"),
+    level: Optional[str] = Query(None, pattern="^(beginner|intermediate|expert)$"),
+    learning_style: Optional[str] = Query(None, pattern="^(visual|auditory|reading|kinesthetic)$"),
+    limit: int = Query(10, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Full-text search over note titles, topics and content.
+    
+    Results are ranked by relevance and include a snippet with matched terms
+    wrapped in <mark> tags.
+    """
+    try:
+        results, has_more = await search_notes(
+            db,
+            query=q,
+            level=level,
+            learning_style=learning_style,
+            limit=limit,
+            offset=offset
+        )
+        return {
+            "query": q,
+            "results": results,
+            "limit": limit,
+            "offset": offset,
+            "has_more": has_more
+        }
+        
+    except SearchNotSupportedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=str(e)
+        )
+    except SQLAlchemyError as e:
+        logger.error(f"Database error searching notes: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+async def _scored_summaries(db: AsyncSession, matches: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+    """Attaches note summaries to (note_id, score) pairs, keeping their order"""
+    summaries = await note_service.get_note_summaries(db, [note_id for note_id, _ in matches])
+    return [
+        {**summaries[note_id], "score": round(score, 6)}
+        for note_id, score in matches
+        if note_id in summaries
+    ]
+
+@app.get("/notes/semantic")
+async def semantic_search(
+    q: str = Query(..., min_length=1, max_length=500, description="Natural-language query"),
+    k: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Find the notes whose embeddings are closest to a natural-language query.
+    """
+    try:
+        matches = await embedding_service.search_text(q, k=k)
+        return {"query": q, "results": await _scored_summaries(db, matches)}
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in semantic search: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+
+def _cached_note_response(entry: CachedNote, http_request: Request) -> Response:
+    """Answers a note read from a cached entry, honouring conditional and gzip headers"""
+    headers = {
+        **entry.headers(),
+        "Cache-Control": NOTE_CACHE_CONTROL,
+        "Vary": "Accept-Encoding"
+    }
+    if entry.is_not_modified(http_request.headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if len(entry.body) >= GZIP_MINIMUM_SIZE and "gzip" in http_request.headers.get("accept-encoding", ""):
+        # Already encoded, so the compression middleware passes it through
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=entry.gzipped, media_type="application/json", headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 @app.get("/notes/{note_id}", response_model=NoteResponse)
-async def get_note(note_id: int, db: Session = Depends(get_db)):
+async def get_note(note_id: int, http_request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve a specific note by its ID.
+    
+    Responses carry an ETag and Last-Modified, and matching If-None-Match or
+    If-Modified-Since headers get 304. Serialized responses are kept in an
+    in-process LRU, so repeat reads touch neither the database nor the
+    serializer.
     """
+    entry = note_service.read_cache.get(note_id)
+    if entry is not None:
+        return _cached_note_response(entry, http_request)
+    
     try:
-        note = db.query(models.Note).filter(models.Note.id == note_id).first()
+        note = await note_service.get_note(db, note_id)
         if note is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Note with id {note_id} not found"
             )
         
-        # Convert the SQLAlchemy model to a dictionary with proper metadata handling
-        note_dict = note.to_dict()
-        return NoteResponse(**note_dict)
+        body = encode_note(note)
+        entry = note_service.read_cache.put(note_id, body, note.updated_at or note.created_at)
+        return _cached_note_response(entry, http_request)
         
     except SQLAlchemyError as e:
         logger.error(f"Database error retrieving note: {str(e)}")
@@ -153,36 +830,180 @@ async def get_note(note_id: int, db: Session = Depends(get_db)):
             detail="Internal server error"
         )
 
+def _check_section(section: str) -> None:
+    """Rejects section names outside the fixed note structure with 404"""
+    if section not in SECTION_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown section {section}; expected one of: {', '.join(SECTION_KEYS)}"
+        )
+
+async def _load_section(db: AsyncSession, note_id: int, section: str) -> Tuple[models.Note, Dict[str, Any]]:
+    """Loads a note and one of its sections, or raises 404"""
+    _check_section(section)
+    note = await note_service.get_note(db, note_id)
+    if note is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Note with id {note_id} not found"
+        )
+    current = note_service.get_section(note, section)
+    if current is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Note {note_id} has no {section} section"
+        )
+    return note, current
+
+@app.get("/notes/{note_id}/sections/{section}")
+async def get_note_section(note_id: int, section: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Retrieve one section of a note: introduction, main_concepts,
+    detailed_explanations, key_points or practice.
+    
+    The content is the section body without its heading, which is
+    returned separately.
+    """
+    try:
+        _, current = await _load_section(db, note_id, section)
+        return FastJSONResponse(current)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error retrieving note section: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+@app.post("/notes/{note_id}/sections/{section}/regenerate")
+async def regenerate_note_section(
+    note_id: int,
+    section: str,
+    http_request: Request,
+    request: Optional[RegenerateSectionRequest] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Regenerate one section of a note with Ollama and save it in place.
+    
+    The rest of the note is sent as context, and only the section is
+    generated, capped at OLLAMA_SECTION_NUM_PREDICT tokens, so this costs a
+    fraction of regenerating the whole note. Optional instructions steer
+    the rewrite. Admission control applies as for POST /notes.
+    """
+    _check_section(section)
+    try:
+        admission.check_rate(_client_key(http_request))
+    except AdmissionRejected as e:
+        raise _rejected(e)
+    
+    try:
+        note, current = await _load_section(db, note_id, section)
+        offsets = note.section_offsets
+        if offsets is None:
+            # Notes saved before offsets were stored are located by parsing
+            offsets = parse_sections(note.content)
+        start, end = offsets[section]
+        context = note.content[:start] + note.content[end:]
+        
+        result = await ollama_service.regenerate_section(
+            topic=note.topic,
+            level=note.level,
+            learning_style=note.learning_style,
+            section=section,
+            context=context,
+            title=note.title,
+            instructions=request.instructions if request else None,
+            slot=admission.slot
+        )
+        
+        updated = await note_service.update_section(db, note, section, result["content"], result["metadata"])
+        embedding_service.schedule_index(
+            note.id,
+            embedding_service.note_text(note.title, note.topic, note.content)
+        )
+        return FastJSONResponse({**updated, "metadata": result["metadata"]})
+        
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise _rejected(e)
+    except CircuitOpenError as e:
+        raise _unavailable(e)
+    except Exception as e:
+        logger.error(f"Error regenerating section {section} of note {note_id}: {str(e)}")
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to regenerate section: {str(e)}"
+        )
+
+@app.get("/notes/{note_id}/related")
+async def related_notes(
+    note_id: int,
+    k: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Find the notes most semantically similar to an existing note.
+    """
+    try:
+        note = await note_service.get_note(db, note_id)
+        if note is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Note with id {note_id} not found"
+            )
+        
+        matches = await embedding_service.related(note, k=k)
+        return {"note_id": note_id, "results": await _scored_summaries(db, matches)}
+        
+    except SQLAlchemyError as e:
+        logger.error(f"Database error finding related notes: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
 @app.get("/notes")
 async def list_notes(
-    skip: int = 0,
-    limit: int = 10,
-    db: Session = Depends(get_db)
+    skip: int = Query(0, ge=0, description="Offset for page-number clients; ignored with a cursor"),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: str = Query("full", pattern="^(full|summary)$",
+                        description="summary leaves out note content"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     List all notes with pagination support.
+    
+    Pass the returned next_cursor to fetch the following page; cursor
+    pagination stays fast at any depth. The total may be an estimate on
+    large tables, as indicated by total_is_estimate.
     """
     try:
-        notes = db.query(models.Note)\
-                  .order_by(models.Note.created_at.desc())\
-                  .offset(skip)\
-                  .limit(limit)\
-                  .all()
-        
-        # Ensure metadata is a dictionary for each note
-        for note in notes:
-            if note.metadata is None:
-                note.metadata = {}
-        
-        total = db.query(models.Note).count()
+        notes, next_cursor = await note_service.list_notes_page(
+            db,
+            limit=limit,
+            cursor=cursor,
+            skip=skip,
+            summary=fields == "summary"
+        )
+        total, total_is_estimate = await note_service.count_notes(db)
         
-        return {
+        return FastJSONResponse({
             "total": total,
+            "total_is_estimate": total_is_estimate,
             "notes": notes,
             "skip": skip,
-            "limit": limit
-        }
+            "limit": limit,
+            "next_cursor": next_cursor
+        })
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except SQLAlchemyError as e:
         logger.error(f"Database error listing notes: {str(e)}")
         raise HTTPException(
@@ -190,18 +1011,64 @@ async def list_notes(
             detail="Internal server error"
         )
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Report the status of a queued generation job.
+    
+    Status is one of queued, running, done or failed. Queued jobs include
+    their position in the queue and an estimated time to completion.
+    """
+    try:
+        job = await job_queue.get_status(job_id)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error retrieving job: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+    
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with id {job_id} not found"
+        )
+    return job
+
 # Add startup event while keeping all existing routes and configuration
 @app.on_event("startup")
 async def startup_event():
     """Verify configuration on startup."""
     try:
+        # Open the shared Ollama connection pool and start the health prober
+        await ollama_service.start()
+        
+        # Resume unfinished generation jobs and start the queue workers
+        await job_queue.start()
+        
+        # Precompute popular notes whenever generation is idle
+        await precompute_scheduler.start()
+        
+        # Embed notes saved before embeddings existed or for another model
+        embedding_service.schedule_backfill()
+        
         # Check Ollama connection and model availability
         model_available = await ollama_service.check_model_availability()
         if not model_available:
             logging.warning(
-                f"Model {ollama_service.model} not available on server {ollama_service.base_url}"
+                f"Model {ollama_service.model} not available on any of {', '.join(ollama_service.urls)}"
             )
             logging.warning("Application will continue, but note generation may fail")
     except Exception as e:
         logging.error(f"Startup check failed: {str(e)}")
-        logging.warning("Application will start, but Ollama service may be unavailable")
\ No newline at end of file
+        logging.warning("Application will start, but Ollama service may be unavailable")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release long-lived resources on shutdown."""
+    await precompute_scheduler.close()
+    await embedding_service.close()
+    await job_queue.close()
+    await note_writer.close()
+    await ollama_service.close()
+    await async_engine.dispose()
@@ -0,0 +1,138 @@
+# backend/app/metrics.py
+"""
+Prometheus metrics, exposed in text format by GET /metrics.
+
+Metric objects are module-level singletons on the default registry.
+Recording a sample is a lock-protected float update, so instrumentation
+adds no measurable latency to the code it observes.
+"""
+
+from typing import Any, Dict, Iterable
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets for the full request and generation path, which ranges from
+# sub-millisecond cache hits to multi-minute generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Buckets for short waits such as pool checkouts
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time to complete an HTTP request, by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+GENERATION_STAGE_SECONDS = Histogram(
+    "note_generation_stage_seconds",
+    "Time spent in each stage of producing a note: prompt_build, admission_wait, "
+    "ollama_queue_wait, generation and db_commit",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection from the pool",
+    ["engine"],
+    buckets=WAIT_BUCKETS
+)
+
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Database connections currently checked out of the pool",
+    ["engine"]
+)
+
+OLLAMA_EVAL_TOKENS = Counter(
+    "ollama_eval_tokens_total",
+    "Tokens generated by Ollama (eval_count)"
+)
+
+OLLAMA_PROMPT_TOKENS = Counter(
+    "ollama_prompt_eval_tokens_total",
+    "Prompt tokens processed by Ollama (prompt_eval_count)"
+)
+
+OLLAMA_DURATION_SECONDS = Histogram(
+    "ollama_duration_seconds",
+    "Durations reported by Ollama per generation: eval, prompt_eval and load",
+    ["phase"],
+    buckets=LATENCY_BUCKETS
+)
+
+OLLAMA_TOKENS_PER_SECOND = Histogram(
+    "ollama_eval_tokens_per_second",
+    "Generation throughput reported by Ollama (eval_count / eval_duration)",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+)
+
+NOTE_WRITE_GROUP_SIZE = Histogram(
+    "note_write_group_size",
+    "Notes committed together by the group-commit writer",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+NOTE_TRANSFER_RECORDS = Counter(
+    "note_transfer_records_total",
+    "Notes written by bulk exports or inserted by bulk imports",
+    ["direction"]
+)
+
+PRECOMPUTE_GENERATIONS = Counter(
+    "note_precompute_generations_total",
+    "Generation cache entries precomputed during idle time, by outcome: "
+    "generated, preempted or failed",
+    ["outcome"]
+)
+
+# Fields of a final Ollama response that describe the generation
+OLLAMA_STAT_FIELDS = (
+    "eval_count",
+    "eval_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "load_duration",
+    "total_duration",
+)
+
+def generation_stats(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extracts Ollama's generation statistics from a final response object.
+
+    Durations are kept in nanoseconds, as Ollama reports them, and
+    tokens_per_second is derived when possible.
+
+    Returns:
+        The statistics present in the payload; empty if there are none
+    """
+    stats = {field: payload[field] for field in OLLAMA_STAT_FIELDS if field in payload}
+    if stats.get("eval_count") and stats.get("eval_duration"):
+        stats["tokens_per_second"] = round(stats["eval_count"] / stats["eval_duration"] * 1e9, 2)
+    return stats
+
+def combine_generation_stats(parts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Sums the statistics of several generations that together produced one
+    note, e.g. its sections. tokens_per_second is derived from the sums.
+    """
+    combined: Dict[str, Any] = {}
+    for stats in parts:
+        for field in OLLAMA_STAT_FIELDS:
+            if field in stats:
+                combined[field] = combined.get(field, 0) + stats[field]
+    return generation_stats(combined)
+
+def observe_generation_stats(stats: Dict[str, Any]) -> None:
+    """Records the statistics of one Ollama generation."""
+    if "eval_count" in stats:
+        OLLAMA_EVAL_TOKENS.inc(stats["eval_count"])
+    if "prompt_eval_count" in stats:
+        OLLAMA_PROMPT_TOKENS.inc(stats["prompt_eval_count"])
+    for phase in ("eval", "prompt_eval", "load"):
+        duration = stats.get(f"{phase}_duration")
+        if duration is not None:
+            OLLAMA_DURATION_SECONDS.labels(phase).observe(duration / 1e9)
+    if "tokens_per_second" in stats:
+        OLLAMA_TOKENS_PER_SECOND.observe(stats["tokens_per_second"])
@@ -0,0 +1,92 @@
+# backend/app/middleware.py
+"""
+ASGI middleware for response compression and request metrics.
+
+Starlette's GZipMiddleware compresses streamed bodies without flushing, so
+server-sent events and NDJSON records would sit in the compressor until it
+fills up. CompressionMiddleware leaves those media types uncompressed and
+gzips everything else above a size threshold.
+"""
+
+import time
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import HTTP_REQUEST_SECONDS
+
+# Streamed incrementally; compressing them would delay every record.
+# application/gzip bodies are compressed already.
+STREAMING_MEDIA_TYPES = {"text/event-stream", "application/x-ndjson", "application/gzip"}
+
+class CompressionMiddleware:
+    """
+    GZip middleware that never buffers streaming responses.
+
+    Each response is run through Starlette's GZipMiddleware, except that
+    once the response start shows a streaming media type, its messages go
+    straight to the client instead.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 9) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def app(scope: Scope, receive: Receive, send_with_gzip: Send) -> None:
+            target = send_with_gzip
+
+            async def send_by_media_type(message: Message) -> None:
+                nonlocal target
+                if message["type"] == "http.response.start":
+                    media_type = Headers(raw=message["headers"]).get("content-type", "")
+                    if media_type.split(";")[0].strip() in STREAMING_MEDIA_TYPES:
+                        target = send
+                await target(message)
+
+            await self.app(scope, receive, send_by_media_type)
+
+        gzip = GZipMiddleware(app, minimum_size=self.minimum_size, compresslevel=self.compresslevel)
+        await gzip(scope, receive, send)
+
+
+class MetricsMiddleware:
+    """
+    Records the duration of every HTTP request, labelled with the matched
+    route template (e.g. /notes/{note_id}) so label cardinality stays bounded.
+    Streamed responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code)
+            ).observe(time.perf_counter() - started)
@@ -1,22 +1,68 @@
 # backend/app/models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Index, LargeBinary, event
+from sqlalchemy import inspect as inspect_instance
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from .database import Base
+from .compression import compress_text, decompress_text
+from .schema import write_search_index
+from .topics import canonical_topic
+from .sections import parse_sections
+
+def utc_now():
+    """Current time in UTC, used as a client-side column default"""
+    return datetime.now(timezone.utc)
+
+def _default_canonical_topic(context):
+    """Canonical topic of the row being inserted, for ORM and Core inserts alike"""
+    return canonical_topic(context.get_current_parameters().get("topic") or "")
 
 class Note(Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        # Backs keyset pagination over (created_at, id) in list_notes
+        Index("ix_notes_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     topic = Column(String(255), nullable=False, index=True)
-    content = Column(Text, nullable=False)
+    # Normalized topic (see app.topics) for finding notes on the same
+    # subject; Postgres also gets a trigram index on it for fuzzy lookups
+    canonical_topic = Column(String(255), nullable=True, index=True, default=_default_canonical_topic)
+    # Content is stored compressed in content_compressed. The original Text
+    # column keeps the content of rows written before compression and is
+    # empty for new rows. Both are deferred and only load when content is
+    # requested, e.g. with undefer_group("content").
+    legacy_content = deferred(Column("content", Text, nullable=False, default=""), group="content")
+    content_compressed = deferred(Column(LargeBinary, nullable=True), group="content")
+    # Character offsets of each section in content (see app.sections), set
+    # whenever content is written; NULL for notes saved before sections
+    # were tracked
+    section_offsets = deferred(Column(JSON, nullable=True), group="content")
     level = Column(String(50), nullable=False)
     learning_style = Column(String(50), nullable=False)
     # Changed from 'metadata' to 'note_metadata' to avoid SQLAlchemy conflicts
     note_metadata = Column(JSON, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set on the client as well, so the value is known at insert time with a
+    # precision that keyset cursors can compare exactly on every backend
+    created_at = Column(DateTime(timezone=True), default=utc_now, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    @property
+    def content(self):
+        """Note content, decompressed from whichever column holds it"""
+        if self.content_compressed is not None:
+            return decompress_text(self.content_compressed)
+        return self.legacy_content
+
+    @content.setter
+    def content(self, value):
+        self.content_compressed = compress_text(value) if value is not None else None
+        self.legacy_content = ""
+        self.section_offsets = parse_sections(value) if value is not None else None
+
     def to_dict(self):
         """Convert the model instance to a dictionary"""
         return {
@@ -29,4 +75,72 @@ class Note(Base):
             "metadata": self.note_metadata if self.note_metadata else {},
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+# Search structures that cannot index compressed bytes are written by the
+# application whenever the ORM inserts or changes a note; bulk inserts call
+# write_search_index themselves
+@event.listens_for(Note, "after_insert")
+def _index_inserted_note(mapper, connection, note):
+    write_search_index(connection, [(note.id, note.title, note.topic, note.content)])
+
+@event.listens_for(Note, "before_update")
+def _update_canonical_topic(mapper, connection, note):
+    if inspect_instance(note).attrs["topic"].history.has_changes():
+        note.canonical_topic = canonical_topic(note.topic)
+
+@event.listens_for(Note, "after_update")
+def _index_updated_note(mapper, connection, note):
+    state = inspect_instance(note)
+    if any(state.attrs[name].history.has_changes()
+           for name in ("title", "topic", "content_compressed")):
+        write_search_index(connection, [(note.id, note.title, note.topic, note.content)])
+
+class GenerationCacheEntry(Base):
+    """Durable tier of the generation cache, keyed by a normalized request hash"""
+    __tablename__ = "generation_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    content = Column(Text, nullable=False)
+    cache_metadata = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class GenerationJob(Base):
+    """A note generation request processed in the background by the job queue"""
+    __tablename__ = "generation_jobs"
+
+    id = Column(String(36), primary_key=True)
+    # One of: queued, running, done, failed
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    priority = Column(Integer, nullable=False, default=0)
+    request_data = Column(JSON, nullable=False)
+    note_id = Column(Integer, ForeignKey("notes.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def to_dict(self):
+        """Convert the model instance to a dictionary"""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "note_id": self.note_id,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class NoteEmbedding(Base):
+    """Embedding vector of a note, stored as packed float32 bytes"""
+    __tablename__ = "note_embeddings"
+
+    note_id = Column(Integer, ForeignKey("notes.id", ondelete="CASCADE"), primary_key=True)
+    model = Column(String(100), nullable=False, index=True)
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utc_now, server_default=func.now())
@@ -0,0 +1,244 @@
+# backend/app/schema.py
+"""
+Idempotent schema upgrades for existing databases.
+
+Base.metadata.create_all only creates missing tables, so columns and
+indexes added to tables that already exist would never be built.
+upgrade_schema fills in those gaps on startup and is safe to run
+repeatedly. It also maintains the dialect-specific full-text search
+structures that the models cannot declare portably, and write_search_index
+keeps them current as notes are saved.
+"""
+
+import logging
+from typing import Optional, Sequence, Tuple
+from sqlalchemy import Column, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from .database import Base
+from .compression import decompress_text
+from .topics import canonical_topic
+
+logger = logging.getLogger(__name__)
+
+# Postgres: a weighted tsvector over title, topic and content with a GIN
+# index. Content is stored compressed, so the column cannot be generated
+# from it; write_search_index fills it in when notes are saved.
+POSTGRES_SEARCH_DDL = [
+    "ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_notes_search_vector ON notes USING GIN (search_vector)",
+]
+
+POSTGRES_SEARCH_VECTOR = """
+    setweight(to_tsvector('english', coalesce({title}, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce({topic}, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce({content}, '')), 'C')
+"""
+
+# Databases created before compression used a generated column; dropping
+# the expression keeps the stored vectors and makes the column writable
+POSTGRES_IS_GENERATED = """
+    SELECT is_generated FROM information_schema.columns
+    WHERE table_name = 'notes' AND column_name = 'search_vector'
+"""
+
+# Rows written before compression still have their text in notes.content
+POSTGRES_BACKFILL = (
+    "UPDATE notes SET search_vector = "
+    + POSTGRES_SEARCH_VECTOR.format(title="title", topic="topic", content="content")
+    + " WHERE search_vector IS NULL"
+)
+
+POSTGRES_INDEX_NOTE = text(
+    "UPDATE notes SET search_vector = "
+    + POSTGRES_SEARCH_VECTOR.format(title=":title", topic=":topic", content=":content")
+    + " WHERE id = :id"
+)
+
+# SQLite: an FTS5 table holding its own copy of the searchable text, since
+# it cannot read compressed content from notes. Deletes cascade by trigger;
+# inserts and updates come from write_search_index.
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        title, topic, content, tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        DELETE FROM notes_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+# Pre-compression databases used an external-content table fed by triggers
+SQLITE_LEGACY_SEARCH_DDL = [
+    "DROP TRIGGER IF EXISTS notes_fts_insert",
+    "DROP TRIGGER IF EXISTS notes_fts_update",
+    "DROP TRIGGER IF EXISTS notes_fts_delete",
+    "DROP TABLE IF EXISTS notes_fts",
+]
+
+# Postgres: trigram index for fuzzy topic lookups. Creating the extension
+# needs sufficient privileges; without it lookups fall back to Python.
+POSTGRES_TOPIC_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_notes_canonical_topic_trgm "
+    "ON notes USING GIN (canonical_topic gin_trgm_ops)",
+]
+
+SQLITE_DELETE_NOTE = text("DELETE FROM notes_fts WHERE rowid = :id")
+SQLITE_INDEX_NOTE = text(
+    "INSERT INTO notes_fts(rowid, title, topic, content) VALUES (:id, :title, :topic, :content)"
+)
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Adds any columns and indexes declared on the models that are missing
+    from the database, fills in canonical topics, then builds the
+    full-text search structures and the trigram topic index.
+    
+    Args:
+        engine: Sync engine connected to the application database
+    """
+    inspector = inspect(engine)
+    
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                _add_column(engine, table.name, column)
+        
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info(f"Creating missing index {index.name} on {table.name}")
+                index.create(bind=engine)
+    
+    _backfill_canonical_topics(engine)
+    _upgrade_search_index(engine)
+    _upgrade_topic_index(engine)
+
+def _add_column(engine: Engine, table_name: str, column: Column) -> None:
+    """Adds a nullable column to an existing table."""
+    if not column.nullable:
+        logger.warning(f"Cannot add required column {column.name} to {table_name} automatically")
+        return
+    
+    column_type = column.type.compile(dialect=engine.dialect)
+    logger.info(f"Adding missing column {column.name} to {table_name}")
+    with engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}"))
+
+def _backfill_canonical_topics(engine: Engine, batch_size: int = 500) -> None:
+    """Computes canonical_topic for notes saved before the column existed."""
+    if not inspect(engine).has_table("notes"):
+        return
+    
+    filled = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(text(
+                "SELECT id, topic FROM notes WHERE canonical_topic IS NULL ORDER BY id LIMIT :limit"
+            ), {"limit": batch_size}).all()
+            if not rows:
+                break
+            connection.execute(
+                text("UPDATE notes SET canonical_topic = :canonical WHERE id = :id"),
+                [{"id": row.id, "canonical": canonical_topic(row.topic)} for row in rows]
+            )
+            filled += len(rows)
+    if filled:
+        logger.info(f"Filled in canonical topics for {filled} notes")
+
+def _upgrade_topic_index(engine: Engine) -> None:
+    """Creates the trigram index on canonical_topic where pg_trgm is available."""
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as connection:
+            for statement in POSTGRES_TOPIC_DDL:
+                connection.execute(text(statement))
+    except Exception as e:
+        logger.warning(f"pg_trgm is not available, fuzzy topic lookups will run in Python: {str(e)}")
+
+def _upgrade_search_index(engine: Engine) -> None:
+    """Creates the full-text search column or table for the current dialect."""
+    dialect = engine.dialect.name
+    
+    if dialect == "postgresql":
+        with engine.begin() as connection:
+            is_generated = connection.execute(text(POSTGRES_IS_GENERATED)).scalar()
+            if is_generated == "ALWAYS":
+                connection.execute(text("ALTER TABLE notes ALTER COLUMN search_vector DROP EXPRESSION"))
+                logger.info("Converted notes.search_vector to an application-maintained column")
+            for statement in POSTGRES_SEARCH_DDL:
+                connection.execute(text(statement))
+            if is_generated is None:
+                # The column is new: index the notes that already exist
+                connection.execute(text(POSTGRES_BACKFILL))
+    
+    elif dialect == "sqlite":
+        with engine.begin() as connection:
+            definition = connection.execute(text(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'"
+            )).scalar()
+            if definition is not None and "content='notes'" in definition:
+                for statement in SQLITE_LEGACY_SEARCH_DDL:
+                    connection.execute(text(statement))
+                definition = None
+            
+            for statement in SQLITE_SEARCH_DDL:
+                connection.execute(text(statement))
+            if definition is None:
+                # Index notes that existed before the FTS table
+                _rebuild_sqlite_index(connection)
+                logger.info("Built notes_fts full-text index")
+    
+    else:
+        logger.warning(f"Full-text search is not available on {dialect}")
+
+def _rebuild_sqlite_index(connection: Connection, batch_size: int = 500) -> None:
+    """Fills notes_fts from every row in notes, decompressing content."""
+    rows = connection.execute(text(
+        "SELECT id, title, topic, content, content_compressed FROM notes"
+    ))
+    while True:
+        batch = rows.fetchmany(batch_size)
+        if not batch:
+            break
+        write_search_index(connection, [
+            (row.id, row.title, row.topic,
+             decompress_text(row.content_compressed) if row.content_compressed is not None
+             else row.content)
+            for row in batch
+        ])
+
+def write_search_index(
+    connection: Connection,
+    notes: Sequence[Tuple[int, str, str, Optional[str]]]
+) -> None:
+    """
+    Writes the full-text index entries for saved notes.
+    
+    Args:
+        connection: Connection inside the transaction that saved the notes
+        notes: (id, title, topic, content) for each note
+    """
+    if not notes:
+        return
+    
+    params = [
+        {"id": note_id, "title": title, "topic": topic, "content": content or ""}
+        for note_id, title, topic, content in notes
+    ]
+    dialect = connection.dialect.name
+    
+    if dialect == "postgresql":
+        connection.execute(POSTGRES_INDEX_NOTE, params)
+    elif dialect == "sqlite":
+        connection.execute(SQLITE_DELETE_NOTE, [{"id": param["id"]} for param in params])
+        connection.execute(SQLITE_INDEX_NOTE, params)
@@ -0,0 +1,107 @@
+# backend/app/sections.py
+"""
+The five-section structure of generated study notes.
+
+Notes are generated as one markdown document, but its sections can be
+addressed on their own: parse_sections finds them by their headings and
+returns character offsets, which are stored with each note so one section
+can be served or replaced without touching the rest.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Sections of a study note in document order: key, heading (None means the
+# note title) and what the section should contain
+NOTE_SECTIONS = (
+    ("introduction", None, "a brief introduction to the topic"),
+    ("main_concepts", "Main Concepts",
+     "the core principles and fundamental ideas, adapted to the student's level"),
+    ("detailed_explanations", "Detailed Explanations",
+     "complex ideas broken down with examples, analogies and real-world examples"),
+    ("key_points", "Key Points to Remember",
+     "a summary of the crucial information, with memory hooks and mnemonics"),
+    ("practice", "Practice and Application",
+     "3-5 practice questions with answers, and real-world applications of the concepts"),
+)
+SECTION_KEYS = tuple(key for key, _, _ in NOTE_SECTIONS)
+
+# Level one or two headings; models do not always keep to level one
+_HEADING = re.compile(r"^#{1,2}[ \t]+(.+?)[ \t]*#*[ \t]*$", re.MULTILINE)
+
+# Section key by normalized heading, for every section but the introduction
+_KEYS_BY_HEADING = {
+    heading.lower(): key for key, heading, _ in NOTE_SECTIONS if heading is not None
+}
+
+def assemble_sections(title: str, sections: Dict[str, str]) -> str:
+    """
+    Joins section bodies into one markdown note, in NOTE_SECTIONS order.
+
+    Args:
+        title: Heading of the introduction section
+        sections: Section bodies keyed by section key
+    """
+    return "\n\n".join(
+        f"# {heading or title}\n{sections[key].strip()}"
+        for key, heading, _ in NOTE_SECTIONS
+    )
+
+def _normalize_heading(heading: str) -> str:
+    return heading.strip().strip("*_:").strip().lower()
+
+def parse_sections(content: str) -> Dict[str, List[int]]:
+    """
+    Locates the sections of a note by their headings.
+
+    The introduction runs from the start of the note to the first known
+    section heading, whatever its own heading is. Each other section runs
+    from its heading line to the next known section heading. Headings that
+    are not section headings stay part of the section they appear in, and
+    sections the note does not have are left out.
+
+    Returns:
+        [start, end) character offsets into content, by section key
+    """
+    starts: List[Tuple[int, str]] = []
+    for match in _HEADING.finditer(content):
+        key = _KEYS_BY_HEADING.get(_normalize_heading(match.group(1)))
+        # Only the first occurrence of a section counts
+        if key is not None and key not in (found for _, found in starts):
+            starts.append((match.start(), key))
+
+    offsets: Dict[str, List[int]] = {}
+    introduction_end = starts[0][0] if starts else len(content)
+    if content[:introduction_end].strip():
+        offsets["introduction"] = [0, introduction_end]
+    for index, (start, key) in enumerate(starts):
+        end = starts[index + 1][0] if index + 1 < len(starts) else len(content)
+        offsets[key] = [start, end]
+    return offsets
+
+def split_section(text: str) -> Tuple[Optional[str], str]:
+    """
+    Splits a section's text into its heading and body.
+
+    Returns:
+        (heading or None if the text has no leading heading, body)
+    """
+    text = text.strip()
+    match = _HEADING.match(text)
+    if match is None:
+        return None, text
+    return match.group(1).strip(), text[match.end():].strip()
+
+def replace_section(content: str, offsets: Dict[str, List[int]], section: str, text: str) -> str:
+    """
+    Replaces the text of one section, keeping everything around it as is.
+
+    Args:
+        content: The whole note
+        offsets: Section offsets of content, from parse_sections
+        section: Key of a section present in offsets
+        text: New section text, including its heading line
+    """
+    start, end = offsets[section]
+    separator = "\n\n" if end < len(content) else ""
+    return content[:start] + text.strip() + separator + content[end:].lstrip("\n")
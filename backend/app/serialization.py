@@ -0,0 +1,96 @@
+# backend/app/serialization.py
+"""
+JSON encoding of note responses.
+
+Note responses are built straight from ORM rows into the response shape,
+with datetimes left as they are, and encoded once with orjson. The older
+path formatted datetimes in to_dict, parsed them back into NoteResponse
+and had FastAPI validate and encode the result again through
+jsonable_encoder, which is a measurable cost for large markdown content.
+orjson is optional; without it the json module writes the same documents,
+more slowly.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the json module is always available
+    orjson = None
+
+def _default(value: Any) -> Any:
+    """Encodes the non-JSON types orjson handles natively."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(data: Any) -> bytes:
+    """Encodes data as compact UTF-8 JSON; datetimes become ISO 8601 strings."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded with dumps. Returning one from a route skips
+    FastAPI's response model validation and jsonable_encoder, so content
+    must already have the documented shape.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def note_response(note, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    A Note in the NoteResponse shape.
+
+    Args:
+        note: Note with its content columns loaded
+        metadata: Replaces the stored metadata, e.g. to flag a reused note
+    """
+    return {
+        "id": note.id,
+        "title": note.title,
+        "topic": note.topic,
+        "content": note.content,
+        "level": note.level,
+        "learning_style": note.learning_style,
+        "created_at": note.created_at,
+        "metadata": metadata if metadata is not None else note.note_metadata or {}
+    }
+
+def note_item(note) -> Dict[str, Any]:
+    """A Note as a full list page item, in the shape of Note.to_dict."""
+    return {
+        "id": note.id,
+        "title": note.title,
+        "topic": note.topic,
+        "content": note.content,
+        "level": note.level,
+        "learning_style": note.learning_style,
+        "metadata": note.note_metadata or {},
+        "created_at": note.created_at,
+        "updated_at": note.updated_at
+    }
+
+def summary_item(row) -> Dict[str, Any]:
+    """A summary projection row (note_service.SUMMARY_COLUMNS) as a list page item."""
+    return {
+        "id": row.id,
+        "title": row.title,
+        "topic": row.topic,
+        "level": row.level,
+        "learning_style": row.learning_style,
+        "metadata": row.note_metadata or {},
+        "created_at": row.created_at
+    }
+
+def encode_note(note, metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """Encodes a Note as a NoteResponse body in one pass."""
+    return dumps(note_response(note, metadata))
@@ -6,6 +6,20 @@ service classes needed for the application.
 """
 
 from .ollama_service import OllamaService
+from .ollama_pool import OllamaBackendPool, NoAvailableNodeError
+from .resilience import CircuitBreaker, CircuitOpenError
+from .admission import AdmissionController, AdmissionRejected
+from .cache_service import GenerationCache, TTLCache
+from .job_queue import JobQueue, QueueFullError
+from .embedding_service import EmbeddingService, EmbeddingIndex
+from .note_writer import GroupCommitWriter
+from .precompute import PrecomputeScheduler
+from . import note_service, transfer_service, topic_service
 
 # This allows you to import the service directly from the package
-__all__ = ['OllamaService']
\ No newline at end of file
+__all__ = ['OllamaService', 'OllamaBackendPool', 'NoAvailableNodeError',
+           'CircuitBreaker', 'CircuitOpenError', 'AdmissionController',
+           'AdmissionRejected', 'GenerationCache', 'TTLCache', 'JobQueue',
+           'QueueFullError', 'EmbeddingService', 'EmbeddingIndex',
+           'GroupCommitWriter', 'PrecomputeScheduler', 'note_service', 'transfer_service',
+           'topic_service']
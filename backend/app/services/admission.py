@@ -0,0 +1,243 @@
+# backend/app/services/admission.py
+
+import os
+import math
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from ..metrics import GENERATION_STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Longest Retry-After hint, e.g. for a rate of zero whose bucket never refills
+MAX_RETRY_AFTER = 3600.0
+
+class AdmissionRejected(RuntimeError):
+    """
+    Raised when a generation request is shed instead of admitted.
+
+    Attributes:
+        status_code: 429 for a client over its rate limit, 503 when the
+            server as a whole is saturated
+        retry_after: Seconds the client should wait before retrying
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate tokens per second."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float = 1.0) -> Tuple[bool, float]:
+        """
+        Takes cost tokens if available. A cost above the burst size is
+        admitted from a full bucket and leaves it in debt, so large batches
+        are possible but delay the client's next requests accordingly.
+
+        Returns:
+            (taken, seconds until enough tokens will be available, at most
+            MAX_RETRY_AFTER)
+        """
+        self._refill(time.monotonic())
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return True, 0.0
+        if self.rate <= 0:
+            return False, MAX_RETRY_AFTER
+        return False, min((needed - self.tokens) / self.rate, MAX_RETRY_AFTER)
+
+    def is_full(self, now: float) -> bool:
+        """True if the bucket has refilled completely, i.e. holds no state."""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class AdmissionController:
+    """
+    Admission control for note generation.
+
+    Generation is bounded by a global number of concurrent slots, since
+    Ollama works through one generation at a time per GPU. Requests beyond
+    that wait in a bounded queue; once the queue is full, or a request has
+    waited too long, it is rejected with 503. Each client additionally has
+    a token bucket, and requests over that rate are rejected with 429.
+    Retry-After hints are derived from a running average of generation time.
+    """
+
+    # Buckets are pruned once more than this many clients are tracked
+    MAX_TRACKED_CLIENTS = 10000
+
+    def __init__(self):
+        """Initialize limits from environment variables."""
+        self.max_concurrent = int(os.getenv("GENERATION_MAX_CONCURRENCY", "2"))
+        self.max_waiting = int(os.getenv("GENERATION_MAX_QUEUE", "8"))
+        self.queue_timeout = float(os.getenv("GENERATION_QUEUE_TIMEOUT", "120"))
+        self.rate = float(os.getenv("GENERATION_RATE_PER_MINUTE", "10")) / 60.0
+        self.burst = float(os.getenv("GENERATION_RATE_BURST", "5"))
+
+        # Running average of generation durations, used for Retry-After
+        self.average_duration = float(os.getenv("GENERATION_INITIAL_DURATION_ESTIMATE", "60"))
+
+        self.active = 0
+        self.waiting = 0
+        # When a request last asked for or released a slot, for idle-time
+        # background work
+        self.last_active = time.monotonic()
+        self._demand_listeners: List[Callable[[], None]] = []
+        self.rejected = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Semaphore holding the global generation slots, created on first use."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    def add_demand_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Registers a callback run synchronously whenever a request asks for a
+        generation slot, before it waits, so idle-time work can yield at once.
+        """
+        self._demand_listeners.append(listener)
+
+    def idle_for(self) -> float:
+        """Seconds since generation was last requested or running; 0 while it is."""
+        if self.active or self.waiting:
+            return 0.0
+        return time.monotonic() - self.last_active
+
+    def check_rate(self, client_key: str, cost: float = 1.0) -> None:
+        """
+        Charges a client's token bucket.
+
+        Args:
+            client_key: API key or IP address identifying the client
+            cost: Number of generations the request will run
+
+        Raises:
+            AdmissionRejected: With status 429 if the client is over its rate
+        """
+        bucket = self._buckets.get(client_key)
+        if bucket is None:
+            self._prune_buckets()
+            bucket = self._buckets[client_key] = TokenBucket(self.rate, self.burst)
+
+        taken, wait = bucket.take(cost)
+        if not taken:
+            self.rejected["rate_limited"] += 1
+            raise AdmissionRejected(429, "Generation rate limit exceeded, please retry later", wait)
+
+    def check_capacity(self) -> None:
+        """
+        Rejects up front when the wait queue is already full, for callers
+        that must decide on a status code before they start waiting.
+
+        Raises:
+            AdmissionRejected: With status 503 if the queue is full
+        """
+        if self.semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected["queue_full"] += 1
+            raise AdmissionRejected(
+                503, "Note generation is at capacity, please retry later", self.estimated_wait()
+            )
+
+    @asynccontextmanager
+    async def slot(self, shed: bool = True) -> AsyncIterator[None]:
+        """
+        Holds one global generation slot for the duration of the block.
+
+        Args:
+            shed: Reject with 503 when the wait queue is full or the wait
+                exceeds queue_timeout. Background work that bounds its own
+                concurrency (queued jobs, batch items) passes False and
+                simply waits its turn.
+
+        Raises:
+            AdmissionRejected: With status 503 if the request is shed
+        """
+        queued = self.last_active = time.monotonic()
+        for listener in self._demand_listeners:
+            listener()
+        await self._acquire(shed)
+        started = time.monotonic()
+        GENERATION_STAGE_SECONDS.labels("admission_wait").observe(started - queued)
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.semaphore.release()
+            self.last_active = time.monotonic()
+            duration = self.last_active - started
+            self.average_duration = 0.8 * self.average_duration + 0.2 * duration
+
+    async def _acquire(self, shed: bool) -> None:
+        """Waits for a free slot, shedding load when the queue is saturated."""
+        if not self.semaphore.locked() and self.waiting == 0:
+            await self.semaphore.acquire()
+            return
+
+        if shed and self.waiting >= self.max_waiting:
+            self.rejected["queue_full"] += 1
+            raise AdmissionRejected(
+                503, "Note generation is at capacity, please retry later", self.estimated_wait()
+            )
+
+        self.waiting += 1
+        try:
+            if shed:
+                await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+            else:
+                await self.semaphore.acquire()
+        except asyncio.TimeoutError:
+            self.rejected["queue_timeout"] += 1
+            raise AdmissionRejected(
+                503, "Timed out waiting for a generation slot, please retry later", self.estimated_wait()
+            )
+        finally:
+            self.waiting -= 1
+
+    def estimated_wait(self) -> float:
+        """Seconds until a newly queued request would likely get a slot."""
+        rounds = self.waiting // max(self.max_concurrent, 1) + 1
+        return rounds * self.average_duration
+
+    def _prune_buckets(self) -> None:
+        """Forgets clients whose buckets have refilled, bounding memory use."""
+        if len(self._buckets) < self.MAX_TRACKED_CLIENTS:
+            return
+        now = time.monotonic()
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if not bucket.is_full(now)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns admission state for /health."""
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "average_generation_seconds": round(self.average_duration, 1),
+            "rejected": dict(self.rejected)
+        }
@@ -0,0 +1,259 @@
+# backend/app/services/cache_service.py
+
+import copy
+import hashlib
+import logging
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy.orm import Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    A small in-process LRU cache whose entries also expire after a fixed TTL.
+    Not thread-safe; it is meant to be used from the event loop only.
+    """
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Stores a value, evicting the least recently used entry if full."""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def age(self, key: str) -> Optional[float]:
+        """Seconds since the entry was stored, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        remaining = entry[0] - time.monotonic()
+        if remaining < 0:
+            return None
+        return self.ttl_seconds - remaining
+
+    def invalidate(self, key: str) -> None:
+        """Removes a single entry if present."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class GenerationCache:
+    """
+    Two-tier cache for generated study notes.
+    
+    The memory tier is a TTL-bounded LRU that answers repeat requests in
+    microseconds. The durable tier lives in the generation_cache table so
+    entries survive restarts and are shared between workers.
+    """
+    
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        """
+        Initialize the cache with limits from environment variables.
+        
+        Args:
+            session_factory: Callable returning a new database session for the
+                durable tier. The durable tier is disabled when omitted.
+        """
+        self.memory = TTLCache(
+            max_size=int(os.getenv("GENERATION_CACHE_SIZE", "256")),
+            ttl_seconds=float(os.getenv("GENERATION_CACHE_TTL", "3600"))
+        )
+        self.durable_ttl = timedelta(
+            seconds=float(os.getenv("GENERATION_CACHE_DURABLE_TTL", str(7 * 24 * 3600)))
+        )
+        self.session_factory = session_factory
+        
+        # Counters exposed through /health
+        self.memory_hits = 0
+        self.durable_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        topic: str,
+        level: str,
+        learning_style: str,
+        model: str,
+        temperature: float,
+        section: Optional[str] = None
+    ) -> str:
+        """
+        Builds the cache key for a generation request, or for one section of
+        it. The topic is normalized for case and whitespace so trivially
+        different spellings share a key.
+        
+        Returns:
+            Hex-encoded SHA-256 digest of the normalized request
+        """
+        normalized_topic = " ".join(topic.lower().split())
+        raw_key = "|".join([
+            normalized_topic,
+            level.lower(),
+            learning_style.lower(),
+            model,
+            f"{temperature:.2f}"
+        ] + ([section] if section else []))
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up a generation result in the memory tier, then the durable tier.
+        Durable hits are promoted into the memory tier.
+        
+        Returns:
+            A copy of the cached result with a "cache_hit" marker in its
+            metadata, or None on a miss
+        """
+        result = self.memory.get(key)
+        if result is not None:
+            self.memory_hits += 1
+            return self._mark_hit(result, "memory")
+        
+        if self.session_factory is not None:
+            try:
+                result = await asyncio.to_thread(self._load_durable, key)
+            except Exception as e:
+                logger.error(f"Error reading durable generation cache: {str(e)}")
+                result = None
+            
+            if result is not None:
+                self.durable_hits += 1
+                self.memory.set(key, result)
+                return self._mark_hit(result, "durable")
+        
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Stores a generation result in both tiers."""
+        result = copy.deepcopy(result)
+        self.memory.set(key, result)
+        
+        if self.session_factory is not None:
+            try:
+                await asyncio.to_thread(self._store_durable, key, result)
+            except Exception as e:
+                logger.error(f"Error writing durable generation cache: {str(e)}")
+
+    async def age(self, key: str) -> Optional[float]:
+        """
+        Seconds since the entry for key was generated, without counting a
+        lookup. The durable tier is authoritative when configured, since
+        promotion into the memory tier restarts the memory entry's clock.
+        
+        Returns:
+            The age in seconds, or None if no tier holds a live entry
+        """
+        if self.session_factory is None:
+            return self.memory.age(key)
+        
+        try:
+            created_at = await asyncio.to_thread(self._load_created_at, key)
+        except Exception as e:
+            logger.error(f"Error reading durable generation cache: {str(e)}")
+            return self.memory.age(key)
+        if created_at is None:
+            return self.memory.age(key)
+        
+        age = (datetime.now(timezone.utc) - created_at).total_seconds()
+        return None if age > self.durable_ttl.total_seconds() else age
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit and miss counters for monitoring."""
+        lookups = self.memory_hits + self.durable_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "durable_hits": self.durable_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.durable_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory)
+        }
+
+    @staticmethod
+    def _mark_hit(result: Dict[str, Any], tier: str) -> Dict[str, Any]:
+        """Returns a copy of a cached result annotated with the tier that served it."""
+        result = copy.deepcopy(result)
+        result["metadata"]["cache_hit"] = tier
+        return result
+
+    def _load_durable(self, key: str) -> Optional[Dict[str, Any]]:
+        """Reads a non-expired entry from the generation_cache table."""
+        db = self.session_factory()
+        try:
+            entry = db.get(models.GenerationCacheEntry, key)
+            if entry is None:
+                return None
+            
+            created_at = entry.created_at
+            if created_at is not None:
+                if created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+                if created_at + self.durable_ttl < datetime.now(timezone.utc):
+                    return None
+            
+            return {"content": entry.content, "metadata": entry.cache_metadata or {}}
+        finally:
+            db.close()
+
+    def _load_created_at(self, key: str) -> Optional[datetime]:
+        """Reads when an entry in the generation_cache table was stored."""
+        db = self.session_factory()
+        try:
+            created_at = db.query(models.GenerationCacheEntry.created_at)\
+                           .filter(models.GenerationCacheEntry.cache_key == key)\
+                           .scalar()
+            if created_at is not None and created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            return created_at
+        finally:
+            db.close()
+
+    def _store_durable(self, key: str, result: Dict[str, Any]) -> None:
+        """Inserts or replaces an entry in the generation_cache table."""
+        db = self.session_factory()
+        try:
+            entry = db.get(models.GenerationCacheEntry, key)
+            if entry is None:
+                entry = models.GenerationCacheEntry(cache_key=key)
+                db.add(entry)
+            entry.content = result["content"]
+            entry.cache_metadata = result["metadata"]
+            entry.created_at = datetime.now(timezone.utc)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
@@ -0,0 +1,409 @@
+# backend/app/services/embedding_service.py
+
+import os
+import re
+import asyncio
+import hashlib
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer_group
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+# Notes read per query while embedding notes that have no embedding yet
+BACKFILL_BATCH_SIZE = 100
+
+def hash_embedding(text: str, dim: int = 256) -> List[float]:
+    """
+    Computes a deterministic bag-of-words embedding by feature hashing.
+
+    This is the local stand-in used when no Ollama embedding model is
+    configured (OLLAMA_EMBED_MODEL=local), e.g. in tests. Texts sharing words
+    get similar vectors, which is enough to exercise the search paths.
+
+    Args:
+        text: Text to embed
+        dim: Number of dimensions
+
+    Returns:
+        L2-normalized embedding vector
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[bucket] += sign
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector.tolist()
+
+def to_blob(vector) -> bytes:
+    """Packs an embedding as float32 bytes for storage."""
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+def from_blob(blob: bytes) -> np.ndarray:
+    """Unpacks an embedding stored by to_blob."""
+    return np.frombuffer(blob, dtype=np.float32)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes rows so dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IVFIndex:
+    """
+    Approximate inverted-file index over a normalized embedding matrix.
+
+    Rows are clustered with spherical k-means; a query only scores the rows
+    in its nprobe closest clusters instead of the whole matrix.
+    """
+
+    def __init__(self, matrix: np.ndarray, lists: int, probes: int, iterations: int = 8):
+        self.probes = probes
+        rng = np.random.default_rng(0)
+
+        # Train centroids on a sample to keep build time bounded
+        sample_size = min(len(matrix), lists * 64)
+        sample = matrix[rng.choice(len(matrix), size=sample_size, replace=False)]
+        self.centroids = sample[rng.choice(len(sample), size=lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ self.centroids.T, axis=1)
+            for index in range(lists):
+                members = sample[assignment == index]
+                if len(members):
+                    self.centroids[index] = members.sum(axis=0)
+            self.centroids = _normalize(self.centroids)
+
+        self.lists: List[List[int]] = [[] for _ in range(lists)]
+        for row, cluster in enumerate(np.argmax(matrix @ self.centroids.T, axis=1)):
+            self.lists[cluster].append(row)
+        self.built_size = len(matrix)
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        """Assigns a newly appended row to its nearest cluster."""
+        self.lists[int(np.argmax(self.centroids @ vector))].append(row)
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """Returns the row numbers in the clusters closest to the query."""
+        closest = np.argsort(self.centroids @ query)[::-1][:self.probes]
+        rows = [row for cluster in closest for row in self.lists[cluster]]
+        return np.fromiter(rows, dtype=np.int64, count=len(rows))
+
+
+class EmbeddingIndex:
+    """
+    Memory-resident matrix of note embeddings with vectorized top-k search.
+
+    Rows are kept L2-normalized, so cosine similarity for a query is a single
+    matrix-vector product. The matrix grows by doubling its capacity, making
+    incremental inserts amortized O(1). Above ann_min_rows an optional IVF
+    index narrows the candidates scored per query.
+    """
+
+    def __init__(self):
+        self.use_ann = os.getenv("EMBEDDING_ANN", "false").lower() == "true"
+        self.ann_min_rows = int(os.getenv("EMBEDDING_ANN_MIN_ROWS", "20000"))
+        self.ann_probes = int(os.getenv("EMBEDDING_ANN_PROBES", "8"))
+
+        self._matrix: Optional[np.ndarray] = None
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._positions: Dict[int, int] = {}
+        self._ann: Optional[IVFIndex] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def load(self, ids: List[int], vectors: List[np.ndarray]) -> None:
+        """Replaces the index contents with the given embeddings."""
+        self._matrix = None
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._positions = {}
+        self._ann = None
+
+        if vectors:
+            matrix = _normalize(np.vstack(vectors).astype(np.float32))
+            self._matrix = matrix
+            self._ids = np.asarray(ids, dtype=np.int64)
+            self._size = len(ids)
+            self._positions = {note_id: row for row, note_id in enumerate(ids)}
+
+    def add(self, note_id: int, vector) -> None:
+        """Inserts or replaces the embedding for a note."""
+        vector = _normalize(np.asarray(vector, dtype=np.float32))
+
+        row = self._positions.get(note_id)
+        if row is not None:
+            self._matrix[row] = vector
+            return
+
+        if self._matrix is None:
+            self._matrix = np.zeros((16, len(vector)), dtype=np.float32)
+            self._ids = np.zeros(16, dtype=np.int64)
+        elif self._size == len(self._matrix):
+            self._matrix = np.vstack([self._matrix, np.zeros_like(self._matrix)])
+            self._ids = np.concatenate([self._ids, np.zeros_like(self._ids)])
+
+        row = self._size
+        self._matrix[row] = vector
+        self._ids[row] = note_id
+        self._positions[note_id] = row
+        self._size += 1
+
+        if self._ann is not None:
+            self._ann.add(row, vector)
+
+    def get(self, note_id: int) -> Optional[np.ndarray]:
+        """Returns the stored embedding for a note, if any."""
+        row = self._positions.get(note_id)
+        return None if row is None else self._matrix[row]
+
+    def search(
+        self,
+        query,
+        k: int = 10,
+        exclude: Optional[Set[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Finds the k notes most similar to a query embedding.
+
+        Args:
+            query: Query embedding
+            k: Number of results
+            exclude: Note ids to leave out of the results
+
+        Returns:
+            List of (note_id, cosine similarity), best match first
+        """
+        if self._size == 0:
+            return []
+
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        matrix = self._matrix[:self._size]
+
+        rows = None
+        ann = self._approximate_index()
+        if ann is not None:
+            rows = ann.candidates(query)
+            scores = matrix[rows] @ query
+        else:
+            scores = matrix @ query
+
+        if len(scores) == 0:
+            return []
+
+        wanted = min(k + len(exclude or ()), len(scores))
+        top = np.argpartition(-scores, wanted - 1)[:wanted]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for position in top:
+            row = rows[position] if rows is not None else position
+            note_id = int(self._ids[row])
+            if exclude and note_id in exclude:
+                continue
+            results.append((note_id, float(scores[position])))
+            if len(results) == k:
+                break
+        return results
+
+    def _approximate_index(self) -> Optional[IVFIndex]:
+        """Builds or rebuilds the IVF index when enabled and worthwhile."""
+        if not self.use_ann or self._size < self.ann_min_rows:
+            return None
+
+        # Rebuild once the matrix has doubled since the last build, so the
+        # clusters keep up with the data
+        if self._ann is None or self._size >= 2 * self._ann.built_size:
+            lists = max(int(np.sqrt(self._size)), 1)
+            self._ann = IVFIndex(self._matrix[:self._size], lists=lists, probes=self.ann_probes)
+            logger.info(f"Built IVF embedding index with {lists} lists over {self._size} notes")
+        return self._ann
+
+
+class EmbeddingService:
+    """
+    Computes, stores and searches note embeddings.
+
+    Embeddings are generated once per note when it is saved and persisted as
+    float32 blobs in the note_embeddings table. The in-memory index is loaded
+    from that table on first use and updated incrementally afterwards. Notes
+    that never got an embedding, such as imported notes, are embedded by a
+    background backfill.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], Any],
+        session_factory: Callable[[], AsyncSession],
+        model: str
+    ):
+        """
+        Args:
+            embed: Coroutine function returning the embedding of a text
+            session_factory: Callable returning a new async database session
+            model: Name of the embedding model, stored with each vector
+        """
+        self.embed = embed
+        self.session_factory = session_factory
+        self.model = model
+        self.index = EmbeddingIndex()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._pending: Set[asyncio.Task] = set()
+        self._backfill: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def note_text(title: str, topic: str, content: Optional[str]) -> str:
+        """Builds the text embedded for a note."""
+        return f"{title}\n{topic}\n{(content or '')[:2000]}"
+
+    def schedule_index(self, note_id: int, text: str) -> None:
+        """
+        Embeds and stores a newly saved note in the background, so saving a
+        note never waits for the embedding model.
+        """
+        task = asyncio.create_task(self.index_note(note_id, text))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def index_note(self, note_id: int, text: str) -> Optional[np.ndarray]:
+        """
+        Computes, persists and indexes the embedding for one note.
+
+        Returns:
+            The embedding, or None if it could not be computed
+        """
+        try:
+            vector = np.asarray(await self.embed(text), dtype=np.float32)
+
+            async with self.session_factory() as db:
+                row = await db.get(models.NoteEmbedding, note_id)
+                if row is None:
+                    row = models.NoteEmbedding(note_id=note_id)
+                    db.add(row)
+                row.model = self.model
+                row.dim = len(vector)
+                row.vector = to_blob(vector)
+                await db.commit()
+
+            if self._loaded:
+                self.index.add(note_id, vector)
+            return vector
+
+        except Exception as e:
+            logger.error(f"Error indexing embedding for note {note_id}: {str(e)}")
+            return None
+
+    async def ensure_loaded(self) -> None:
+        """Loads all stored embeddings for the current model into memory once."""
+        if self._loaded:
+            return
+
+        async with self._load_lock:
+            if self._loaded:
+                return
+
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    select(models.NoteEmbedding.note_id, models.NoteEmbedding.vector)
+                    .where(models.NoteEmbedding.model == self.model)
+                )
+                rows = result.all()
+
+            self.index.load([row.note_id for row in rows], [from_blob(row.vector) for row in rows])
+            self._loaded = True
+            logger.info(f"Loaded {len(rows)} note embeddings into memory")
+
+    def schedule_backfill(self) -> None:
+        """
+        Runs backfill in the background, e.g. at startup for notes saved
+        before embeddings existed, unless a scheduled backfill is running.
+        """
+        if self._backfill is not None and not self._backfill.done():
+            return
+        self._backfill = asyncio.create_task(self.backfill())
+
+    async def close(self) -> None:
+        """Stops a scheduled backfill."""
+        if self._backfill is None:
+            return
+        self._backfill.cancel()
+        await asyncio.gather(self._backfill, return_exceptions=True)
+        self._backfill = None
+
+    async def backfill(self) -> int:
+        """
+        Embeds, one at a time, the notes that have no embedding for the
+        current model, such as imported notes. Stops at the first note that
+        cannot be embedded, so an unavailable embedding model is not asked
+        once per note. Overlapping backfills may embed a note twice, which
+        only repeats work.
+
+        Returns:
+            Number of notes embedded
+        """
+        try:
+            return await self._backfill_missing()
+        except Exception as e:
+            logger.error(f"Embedding backfill failed: {str(e)}")
+            return 0
+
+    async def _backfill_missing(self) -> int:
+        """Runs backfill, raising database errors."""
+        stored = models.NoteEmbedding
+        indexed = 0
+        after_id = 0
+        while True:
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    select(models.Note)
+                    .outerjoin(stored, (stored.note_id == models.Note.id) & (stored.model == self.model))
+                    .where(stored.note_id.is_(None), models.Note.id > after_id)
+                    .order_by(models.Note.id)
+                    .limit(BACKFILL_BATCH_SIZE)
+                    .options(undefer_group("content"))
+                )
+                notes = [
+                    (note.id, self.note_text(note.title, note.topic, note.content))
+                    for note in result.scalars()
+                ]
+
+            for note_id, text in notes:
+                if await self.index_note(note_id, text) is None:
+                    return indexed
+                indexed += 1
+            if len(notes) < BACKFILL_BATCH_SIZE:
+                if indexed:
+                    logger.info(f"Embedded {indexed} notes that had no embedding")
+                return indexed
+            after_id = notes[-1][0]
+
+    async def search_text(self, text: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Finds the notes most similar to a free-text query."""
+        await self.ensure_loaded()
+        vector = await self.embed(text)
+        return self.index.search(vector, k=k)
+
+    async def related(self, note: models.Note, k: int = 10) -> List[Tuple[int, float]]:
+        """Finds the notes most similar to an existing note."""
+        await self.ensure_loaded()
+        vector = self.index.get(note.id)
+        if vector is None:
+            # Notes saved before embeddings existed are indexed on demand
+            vector = await self.index_note(note.id, self.note_text(note.title, note.topic, note.content))
+            if vector is None:
+                return []
+        return self.index.search(vector, k=k, exclude={note.id})
@@ -0,0 +1,257 @@
+# backend/app/services/job_queue.py
+
+import os
+import uuid
+import asyncio
+import logging
+import itertools
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class JobQueue:
+    """
+    In-process queue for background note generation.
+
+    Jobs are persisted in the generation_jobs table and consumed by a fixed
+    number of worker tasks, which bounds how many generations run at once.
+    Higher priority jobs run first; jobs with equal priority run in FIFO
+    order. Unfinished jobs are re-enqueued when the queue starts, so a
+    restart does not lose accepted work.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        handler: Callable[[Dict[str, Any]], Awaitable[int]]
+    ):
+        """
+        Initialize the queue with limits from environment variables.
+
+        Args:
+            session_factory: Callable returning a new database session
+            handler: Coroutine function that generates and saves a note for a
+                job's request data and returns the new note id
+        """
+        self.session_factory = session_factory
+        self.handler = handler
+        self.worker_count = int(os.getenv("JOB_WORKERS", "2"))
+        self.max_queued = int(os.getenv("JOB_QUEUE_SIZE", "1000"))
+
+        # Running average of job durations, used for ETA estimates
+        self.average_duration = float(os.getenv("JOB_INITIAL_DURATION_ESTIMATE", "60"))
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._queued: Dict[str, Tuple[int, int]] = {}
+        self._running: Dict[str, datetime] = {}
+        self._sequence = itertools.count()
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Re-enqueues unfinished jobs from the database and starts the workers."""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+
+        pending = await asyncio.to_thread(self._load_unfinished)
+        for job_id, priority in pending:
+            self._enqueue(job_id, priority)
+        if pending:
+            logger.info(f"Re-enqueued {len(pending)} unfinished generation jobs")
+
+        self._workers = [
+            asyncio.create_task(self._worker(index))
+            for index in range(self.worker_count)
+        ]
+        logger.info(f"Started job queue with {self.worker_count} workers")
+
+    async def close(self) -> None:
+        """
+        Stops the workers. Jobs that were running stay marked as running in the
+        database and are picked up again on the next start.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, request_data: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        """
+        Persists a new job and adds it to the queue.
+
+        Args:
+            request_data: Serialized note request to process
+            priority: Higher values run first
+
+        Returns:
+            The job status dictionary
+
+        Raises:
+            QueueFullError: If the queue already holds max_queued jobs
+        """
+        if len(self._queued) >= self.max_queued:
+            raise QueueFullError("Generation queue is full, please retry later")
+
+        job_id = str(uuid.uuid4())
+        job = await asyncio.to_thread(self._insert_job, job_id, request_data, priority)
+        self._enqueue(job_id, priority)
+
+        logger.info(f"Queued generation job {job_id} with priority {priority}")
+        return self._with_progress(job)
+
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up a job and annotates it with its queue position and ETA.
+
+        Returns:
+            The job status dictionary, or None if the job does not exist
+        """
+        job = await asyncio.to_thread(self._load_job, job_id)
+        if job is None:
+            return None
+        return self._with_progress(job)
+
+    def is_empty(self) -> bool:
+        """Returns True if no job is queued or running."""
+        return not self._queued and not self._running
+
+    def _enqueue(self, job_id: str, priority: int) -> None:
+        """Adds a job to the in-memory priority queue."""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        key = (-priority, next(self._sequence))
+        self._queued[job_id] = key
+        self._queue.put_nowait((key, job_id))
+
+    def _with_progress(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Adds queue_position and eta_seconds to a job status dictionary."""
+        job["queue_position"] = None
+        job["eta_seconds"] = None
+
+        if job["id"] in self._queued:
+            key = self._queued[job["id"]]
+            position = sum(1 for other in self._queued.values() if other < key)
+            job["queue_position"] = position
+            # Jobs ahead of this one drain worker_count at a time
+            rounds = position // max(self.worker_count, 1) + 1
+            job["eta_seconds"] = round(rounds * self.average_duration, 1)
+        elif job["id"] in self._running:
+            elapsed = (datetime.now(timezone.utc) - self._running[job["id"]]).total_seconds()
+            job["eta_seconds"] = round(max(self.average_duration - elapsed, 0.0), 1)
+
+        return job
+
+    async def _worker(self, index: int) -> None:
+        """Consumes jobs from the queue until cancelled."""
+        while True:
+            _, job_id = await self._queue.get()
+            self._queued.pop(job_id, None)
+            started_at = datetime.now(timezone.utc)
+            self._running[job_id] = started_at
+
+            try:
+                request_data = await asyncio.to_thread(self._mark_running, job_id, started_at)
+                if request_data is None:
+                    continue
+
+                note_id = await self.handler(request_data)
+                await asyncio.to_thread(self._mark_finished, job_id, "done", note_id, None)
+
+                duration = (datetime.now(timezone.utc) - started_at).total_seconds()
+                self.average_duration = 0.8 * self.average_duration + 0.2 * duration
+                logger.info(f"Worker {index} finished job {job_id} in {duration:.1f}s")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Generation job {job_id} failed: {str(e)}")
+                try:
+                    await asyncio.to_thread(self._mark_finished, job_id, "failed", None, str(e))
+                except Exception as db_error:
+                    logger.error(f"Could not record failure of job {job_id}: {str(db_error)}")
+            finally:
+                self._running.pop(job_id, None)
+                self._queue.task_done()
+
+    def _load_unfinished(self) -> List[Tuple[str, int]]:
+        """Resets interrupted jobs to queued and returns all queued jobs in order."""
+        db = self.session_factory()
+        try:
+            jobs = db.query(models.GenerationJob)\
+                     .filter(models.GenerationJob.status.in_(["queued", "running"]))\
+                     .order_by(models.GenerationJob.priority.desc(),
+                               models.GenerationJob.created_at)\
+                     .all()
+            for job in jobs:
+                job.status = "queued"
+                job.started_at = None
+            db.commit()
+            return [(job.id, job.priority) for job in jobs]
+        finally:
+            db.close()
+
+    def _insert_job(self, job_id: str, request_data: Dict[str, Any], priority: int) -> Dict[str, Any]:
+        """Creates the database row for a new job."""
+        db = self.session_factory()
+        try:
+            job = models.GenerationJob(
+                id=job_id,
+                status="queued",
+                priority=priority,
+                request_data=request_data
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            return job.to_dict()
+        finally:
+            db.close()
+
+    def _load_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Reads a job's status dictionary."""
+        db = self.session_factory()
+        try:
+            job = db.get(models.GenerationJob, job_id)
+            return job.to_dict() if job is not None else None
+        finally:
+            db.close()
+
+    def _mark_running(self, job_id: str, started_at: datetime) -> Optional[Dict[str, Any]]:
+        """Marks a job as running and returns its request data."""
+        db = self.session_factory()
+        try:
+            job = db.get(models.GenerationJob, job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return None
+            job.status = "running"
+            job.started_at = started_at
+            db.commit()
+            return dict(job.request_data)
+        finally:
+            db.close()
+
+    def _mark_finished(
+        self,
+        job_id: str,
+        status: str,
+        note_id: Optional[int],
+        error: Optional[str]
+    ) -> None:
+        """Records the outcome of a job."""
+        db = self.session_factory()
+        try:
+            job = db.get(models.GenerationJob, job_id)
+            job.status = status
+            job.note_id = note_id
+            job.error = error
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+        finally:
+            db.close()
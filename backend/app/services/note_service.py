@@ -0,0 +1,416 @@
+# backend/app/services/note_service.py
+
+import os
+import json
+import base64
+import time
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, func, insert, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer_group
+
+from .. import models
+from ..compression import compress_text
+from ..metrics import GENERATION_STAGE_SECONDS
+from ..schema import write_search_index
+from ..sections import NOTE_SECTIONS, parse_sections, replace_section, split_section
+from ..serialization import note_item, summary_item
+from .cache_service import TTLCache
+from .read_cache import NoteReadCache
+from .single_flight import SingleFlight
+from .note_writer import GroupCommitWriter
+
+logger = logging.getLogger(__name__)
+
+# Columns returned by list pages in summary mode; content is left out
+SUMMARY_COLUMNS = (
+    models.Note.id,
+    models.Note.title,
+    models.Note.topic,
+    models.Note.level,
+    models.Note.learning_style,
+    models.Note.note_metadata,
+    models.Note.created_at,
+)
+
+# Below this many rows an exact count is cheap enough, and planner statistics
+# on small tables are too coarse to be useful
+ESTIMATE_MIN_ROWS = int(os.getenv("NOTES_COUNT_ESTIMATE_MIN_ROWS", "100000"))
+
+_total_cache = TTLCache(max_size=1, ttl_seconds=float(os.getenv("NOTES_COUNT_CACHE_TTL", "30")))
+
+# Maps generation ids and titles to the note saved for them, so callers that
+# shared one generation under the same title can also share one note row
+_shared_note_ids = TTLCache(max_size=1024, ttl_seconds=600)
+_shared_saves = SingleFlight()
+
+# Serialized GET /notes/{id} responses; anything that changes a note must
+# call invalidate_note
+read_cache = NoteReadCache()
+
+async def save_generated_note(
+    db: AsyncSession,
+    title: str,
+    topic: str,
+    level: str,
+    learning_style: str,
+    generation_result: Dict[str, Any],
+    share_rows: bool = False,
+    writer: Optional[GroupCommitWriter] = None,
+    session_factory: Optional[Callable[[], AsyncSession]] = None
+) -> models.Note:
+    """
+    Persists a generated note and returns the refreshed database row.
+    
+    Args:
+        db: Active async database session
+        title: Title of the study notes
+        topic: The main subject of the notes
+        level: Student's proficiency level
+        learning_style: Preferred learning style
+        generation_result: Dictionary with "content" and "metadata" as returned
+            by OllamaService
+        share_rows: Return the note already saved for the same generation
+            and title instead of inserting another row
+        writer: Commit the insert together with other completed
+            generations instead of on db
+        session_factory: Callable returning a new async session, used for
+            the insert shared by every caller with share_rows; defaults to
+            new sessions on db's engine
+            
+    Returns:
+        The saved Note instance with its generated id and timestamps
+    """
+    generation_id = generation_result["metadata"].get("generation_id")
+    
+    if not (share_rows and generation_id):
+        return await _insert_note(db, title, topic, level, learning_style, generation_result, writer)
+    
+    share_key = f"{generation_id}|{title}"
+    note_id = _shared_note_ids.get(share_key)
+    if note_id is None:
+        async def insert_shared() -> int:
+            # The insert outlives the caller that started it, so it must not
+            # use that caller's request-scoped session
+            factory = session_factory or (lambda: AsyncSession(db.bind, expire_on_commit=False))
+            async with factory() as shared_db:
+                note = await _insert_note(shared_db, title, topic, level, learning_style,
+                                          generation_result, writer)
+            _shared_note_ids.set(share_key, note.id)
+            return note.id
+        
+        # Callers saving the same generation concurrently wait for one insert
+        note_id, _ = await _shared_saves.do(share_key, insert_shared)
+    
+    note = await get_note(db, note_id)
+    if note is None:
+        return await _insert_note(db, title, topic, level, learning_style, generation_result, writer)
+    
+    logger.info(f"Using note {note.id} for shared generation {generation_id}")
+    return note
+
+async def get_note(db: AsyncSession, note_id: int) -> Optional[models.Note]:
+    """
+    Loads a note together with its deferred content columns.
+    
+    Returns:
+        The note, or None if it does not exist
+    """
+    return await db.get(models.Note, note_id, options=[undefer_group("content")])
+
+def invalidate_note(note_id: int) -> None:
+    """Drops cached copies of a note after it changed or was deleted."""
+    read_cache.invalidate(note_id)
+
+def get_section(note: models.Note, section: str) -> Optional[Dict[str, Any]]:
+    """
+    Extracts one section from a note loaded with its content.
+    
+    Notes saved before section offsets were stored are parsed on the fly.
+    
+    Returns:
+        Dictionary with note_id, section, heading and content (the body
+        without the heading line), or None if the note has no such section
+    """
+    content = note.content or ""
+    offsets = note.section_offsets if note.section_offsets is not None else parse_sections(content)
+    if section not in offsets:
+        return None
+    start, end = offsets[section]
+    heading, body = split_section(content[start:end])
+    return {"note_id": note.id, "section": section, "heading": heading, "content": body}
+
+async def update_section(
+    db: AsyncSession,
+    note: models.Note,
+    section: str,
+    body: str,
+    section_metadata: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Replaces the body of one section of a note, keeping its heading and
+    every other section, and commits the change. The search index follows
+    through the ORM update event; cached responses are dropped.
+    
+    Args:
+        db: Session the note was loaded with
+        note: Note loaded with its content
+        section: Key of a section the note has
+        body: New section body, without heading
+        section_metadata: Stored under metadata["sections"][section]
+        
+    Returns:
+        The new section, as returned by get_section
+    """
+    content = note.content or ""
+    offsets = note.section_offsets if note.section_offsets is not None else parse_sections(content)
+    heading, _ = split_section(content[slice(*offsets[section])])
+    if heading is None:
+        heading = dict((key, heading) for key, heading, _ in NOTE_SECTIONS)[section] or note.title
+    
+    note.content = replace_section(content, offsets, section, f"# {heading}\n{body.strip()}")
+    # A new dict, so the JSON column is seen as changed
+    metadata = dict(note.note_metadata or {})
+    metadata["sections"] = {**(metadata.get("sections") or {}), section: section_metadata}
+    note.note_metadata = metadata
+    
+    started = time.perf_counter()
+    await db.commit()
+    GENERATION_STAGE_SECONDS.labels("db_commit").observe(time.perf_counter() - started)
+    invalidate_note(note.id)
+    
+    logger.info(f"Replaced section {section} of note {note.id}")
+    return get_section(note, section)
+
+async def _insert_note(
+    db: AsyncSession,
+    title: str,
+    topic: str,
+    level: str,
+    learning_style: str,
+    generation_result: Dict[str, Any],
+    writer: Optional[GroupCommitWriter] = None
+) -> models.Note:
+    """Inserts a single note row and commits it."""
+    note = models.Note(
+        title=title,
+        topic=topic,
+        content=generation_result["content"],
+        level=level,
+        learning_style=learning_style,
+        note_metadata=generation_result["metadata"]
+    )
+    
+    if writer is not None:
+        # The returned note is detached, with everything a response needs
+        note.id, note.created_at = await writer.submit({
+            "title": title,
+            "topic": topic,
+            "level": level,
+            "learning_style": learning_style,
+            "generation_result": generation_result
+        })
+        logger.info(f"Saved note {note.id} for topic: {topic} in a group commit")
+        return note
+    
+    db.add(note)
+    started = time.perf_counter()
+    await db.commit()
+    GENERATION_STAGE_SECONDS.labels("db_commit").observe(time.perf_counter() - started)
+    # Reload server-side values only; the content just written stays loaded
+    await db.refresh(note, attribute_names=["id", "created_at", "updated_at"])
+    
+    logger.info(f"Saved note {note.id} for topic: {topic}")
+    return note
+
+async def bulk_save_generated_notes(
+    db: AsyncSession,
+    notes: List[Dict[str, Any]]
+) -> List[int]:
+    """
+    Inserts many generated notes with a single multi-row INSERT ... RETURNING
+    and one commit.
+    
+    Args:
+        db: Active async database session
+        notes: Dictionaries with title, topic, level, learning_style and
+            generation_result keys
+            
+    Returns:
+        The new note ids, in the same order as notes
+    """
+    saved = await insert_notes(db, notes)
+    if saved:
+        logger.info(f"Saved {len(saved)} notes in one batch")
+    return [note_id for note_id, _ in saved]
+
+async def insert_notes(
+    db: AsyncSession,
+    notes: List[Dict[str, Any]]
+) -> List[Tuple[int, datetime]]:
+    """
+    Inserts generated notes with one multi-row INSERT ... RETURNING and
+    commits them. Bulk inserts bypass ORM events, so the search index is
+    written here in the same transaction.
+    
+    Args:
+        db: Active async database session
+        notes: Dictionaries as for bulk_save_generated_notes
+        
+    Returns:
+        (id, created_at) of each new note, in the same order as notes
+    """
+    if not notes:
+        return []
+    
+    rows = [
+        {
+            "title": note["title"],
+            "topic": note["topic"],
+            "content_compressed": compress_text(note["generation_result"]["content"]),
+            "legacy_content": "",
+            "section_offsets": parse_sections(note["generation_result"]["content"]),
+            "level": note["level"],
+            "learning_style": note["learning_style"],
+            "note_metadata": note["generation_result"]["metadata"]
+        }
+        for note in notes
+    ]
+    
+    started = time.perf_counter()
+    result = await db.execute(
+        insert(models.Note).returning(
+            models.Note.id, models.Note.created_at, sort_by_parameter_order=True
+        ),
+        rows
+    )
+    saved = [(row.id, row.created_at) for row in result.all()]
+    
+    entries = [
+        (note_id, note["title"], note["topic"], note["generation_result"]["content"])
+        for (note_id, _), note in zip(saved, notes)
+    ]
+    await db.run_sync(lambda session: write_search_index(session.connection(), entries))
+    await db.commit()
+    GENERATION_STAGE_SECONDS.labels("db_commit").observe(time.perf_counter() - started)
+    return saved
+
+def encode_cursor(created_at: datetime, note_id: int) -> str:
+    """Encodes the position after a note as an opaque pagination cursor."""
+    raw = json.dumps([created_at.isoformat(), note_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decodes a cursor produced by encode_cursor.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, note_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(note_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+async def list_notes_page(
+    db: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    summary: bool = False
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Loads one page of notes, newest first.
+    
+    With a cursor the page is located by keyset on (created_at, id), which
+    uses ix_notes_created_at_id and costs the same at any depth. Without one,
+    skip is applied as an offset for older clients.
+    
+    Args:
+        db: Active async database session
+        limit: Maximum number of notes to return
+        cursor: Cursor returned as next_cursor by the previous page
+        skip: Offset used when no cursor is given
+        summary: Leave out the content column
+        
+    Returns:
+        Tuple of (notes as list page items, with datetimes not yet
+        formatted, and the cursor for the next page or None)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if summary:
+        query = select(*SUMMARY_COLUMNS)
+    else:
+        query = select(models.Note).options(undefer_group("content"))
+    
+    query = query.order_by(models.Note.created_at.desc(), models.Note.id.desc())
+    
+    if cursor:
+        created_at, note_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(models.Note.created_at, models.Note.id) < tuple_(created_at, note_id)
+        )
+    elif skip:
+        query = query.offset(skip)
+    
+    # Fetch one extra row to learn whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    if summary:
+        rows = [summary_item(row) for row in result.all()]
+    else:
+        rows = [note_item(note) for note in result.scalars().all()]
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    
+    return rows, next_cursor
+
+async def count_notes(db: AsyncSession) -> Tuple[int, bool]:
+    """
+    Returns the number of notes without counting the table on every call.
+    
+    On Postgres, large tables use the planner's row estimate from pg_class.
+    Otherwise an exact count is taken and cached for NOTES_COUNT_CACHE_TTL
+    seconds.
+    
+    Returns:
+        Tuple of (total, whether the total is an estimate)
+    """
+    cached = _total_cache.get("notes")
+    if cached is not None:
+        return cached
+    
+    total = None
+    if db.bind.dialect.name == "postgresql":
+        estimate = await db.scalar(text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = 'notes'::regclass"
+        ))
+        if estimate is not None and estimate >= ESTIMATE_MIN_ROWS:
+            total = (int(estimate), True)
+    
+    if total is None:
+        exact = await db.scalar(select(func.count()).select_from(models.Note))
+        total = (exact, False)
+    
+    _total_cache.set("notes", total)
+    return total
+
+async def get_note_summaries(db: AsyncSession, note_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Loads the summary projection for a set of notes.
+    
+    Returns:
+        Dictionary mapping note id to its summary; missing notes are left out
+    """
+    if not note_ids:
+        return {}
+    result = await db.execute(select(*SUMMARY_COLUMNS).where(models.Note.id.in_(note_ids)))
+    return {row.id: summary_item(row) for row in result.all()}
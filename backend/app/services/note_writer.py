@@ -0,0 +1,158 @@
+# backend/app/services/note_writer.py
+
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..metrics import NOTE_WRITE_GROUP_SIZE
+
+logger = logging.getLogger(__name__)
+
+class GroupCommitWriter:
+    """
+    Write-behind path for note inserts.
+
+    Callers hand their rows to a single writer task, which collects them
+    into groups of up to max_group rows, waiting at most max_wait after the
+    first one, and writes each group with one multi-row INSERT ... RETURNING
+    and one commit. A caller gets its result only once its group has
+    committed, so a returned note is as durable as with its own commit,
+    while concurrent completions share one round trip, one fsync and one
+    pooled connection.
+
+    If a group fails, its rows are retried one at a time, so a single bad
+    row only fails its own caller.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        write: Callable[[AsyncSession, List[Any]], Awaitable[List[Any]]]
+    ):
+        """
+        Initialize the writer with limits from environment variables.
+
+        Args:
+            session_factory: Callable returning a new async session
+            write: Coroutine function that inserts and commits a list of
+                rows and returns one result per row, in order
+        """
+        self.session_factory = session_factory
+        self.write = write
+        self.enabled = os.getenv("NOTE_GROUP_COMMIT", "false").lower() == "true"
+        self.max_group = int(os.getenv("NOTE_GROUP_COMMIT_SIZE", "32"))
+        self.max_wait = float(os.getenv("NOTE_GROUP_COMMIT_WAIT_MS", "5")) / 1000.0
+
+        self.groups = 0
+        self.rows = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, row: Any) -> Any:
+        """
+        Queues a row for the next group and waits until it is committed.
+
+        Returns:
+            The result write returned for the row
+
+        Raises:
+            Exception: Whatever write raised for the row
+        """
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            # Started on first use, on the loop of its callers
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+        future = loop.create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def close(self) -> None:
+        """Commits whatever is still queued, then stops the writer task."""
+        if self._task is None:
+            return
+        if self._task.get_loop() is asyncio.get_running_loop() and not self._task.done():
+            # The writer stops once it reaches this marker
+            await self._queue.put(None)
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._queue = None
+
+    async def _run(self) -> None:
+        """Collects and commits groups until close() is called."""
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            first = await self._queue.get()
+            if first is None:
+                return
+            group = [first]
+            deadline = loop.time() + self.max_wait
+
+            while len(group) < self.max_group and not closing:
+                while not self._queue.empty() and len(group) < self.max_group:
+                    item = self._queue.get_nowait()
+                    if item is None:
+                        closing = True
+                        break
+                    group.append(item)
+                remaining = deadline - loop.time()
+                if closing or len(group) >= self.max_group or remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    closing = True
+                else:
+                    group.append(item)
+
+            await self._commit(group)
+
+    async def _commit(self, group: List[Tuple[Any, asyncio.Future]]) -> None:
+        """Writes one group and resolves its callers' futures."""
+        # Callers that went away no longer need their row written
+        group = [(row, future) for row, future in group if not future.done()]
+        if not group:
+            return
+
+        NOTE_WRITE_GROUP_SIZE.observe(len(group))
+        try:
+            async with self.session_factory() as db:
+                results = await self.write(db, [row for row, _ in group])
+        except Exception as e:
+            if len(group) == 1:
+                self._resolve(group[0][1], error=e)
+                return
+            logger.error(f"Group commit of {len(group)} notes failed, retrying one by one: {str(e)}")
+            for item in group:
+                await self._commit([item])
+            return
+
+        self.groups += 1
+        self.rows += len(group)
+        for (_, future), result in zip(group, results):
+            self._resolve(future, result=result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, error: Optional[Exception] = None) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns writer state for /health."""
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "groups": self.groups,
+            "rows": self.rows,
+            "average_group_size": round(self.rows / self.groups, 2) if self.groups else 0.0
+        }
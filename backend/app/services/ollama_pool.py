@@ -0,0 +1,221 @@
+# backend/app/services/ollama_pool.py
+
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class NoAvailableNodeError(RuntimeError):
+    """Raised when every Ollama node is ejected or excluded."""
+
+
+class OllamaNode:
+    """
+    State of one Ollama backend: its health, recent failures and the number
+    of requests currently routed to it.
+    """
+
+    def __init__(self, url: str, max_concurrency: int):
+        self.url = url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.total_requests = 0
+        self.total_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_checked: Optional[datetime] = None
+        # time.monotonic() of the last successful call, used to spot idle nodes
+        self.last_used: Optional[float] = None
+
+        # None means the node has not been probed yet; it is routable until
+        # a probe or a request says otherwise
+        self.healthy: Optional[bool] = None
+
+    @property
+    def available(self) -> bool:
+        """True unless the node has been ejected."""
+        return self.healthy is not False
+
+    @property
+    def has_capacity(self) -> bool:
+        """True if the node can take another request without queueing."""
+        return self.in_flight < self.max_concurrency
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the node state reported by /health."""
+        return {
+            "url": self.url,
+            "state": {None: "unknown", True: "healthy", False: "ejected"}[self.healthy],
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "consecutive_failures": self.consecutive_failures,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+            "last_error": self.last_error,
+            "last_checked": self.last_checked.isoformat() if self.last_checked else None
+        }
+
+
+class OllamaBackendPool:
+    """
+    Routes requests across several Ollama nodes.
+
+    Each request goes to the available node with the fewest outstanding
+    requests. Ollama works through one generation per model at a time, so
+    every node has a concurrency cap; when all nodes are at their cap,
+    callers wait for a slot instead of piling more work onto a busy GPU.
+    A node is ejected after failure_threshold consecutive failures and
+    readmitted by the next successful health probe.
+    """
+
+    def __init__(self, urls: List[str], max_concurrency: int = 1, failure_threshold: int = 3):
+        """
+        Args:
+            urls: Base URLs of the Ollama nodes
+            max_concurrency: Maximum concurrent requests per node
+            failure_threshold: Consecutive failures that eject a node
+        """
+        if not urls:
+            raise ValueError("At least one Ollama node URL is required")
+        self.nodes = [OllamaNode(url, max_concurrency) for url in urls]
+        self.failure_threshold = failure_threshold
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        """Condition signalled whenever a slot frees up or a node changes state."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def has_available(self) -> bool:
+        """True if at least one node has not been ejected."""
+        return any(node.available for node in self.nodes)
+
+    def is_healthy(self) -> Optional[bool]:
+        """
+        Aggregated health: True if any node probed healthy, None if no node
+        has been probed yet, False if every node is ejected.
+        """
+        states = [node.healthy for node in self.nodes]
+        if True in states:
+            return True
+        if all(state is None for state in states):
+            return None
+        return self.has_available()
+
+    async def acquire(self, exclude: Optional[Set[str]] = None) -> OllamaNode:
+        """
+        Reserves a slot on the least loaded available node, waiting while
+        every candidate is at its concurrency cap.
+
+        Args:
+            exclude: URLs of nodes to skip, e.g. ones that already failed
+                this request
+
+        Returns:
+            The reserved node; pass it to release() when done
+
+        Raises:
+            NoAvailableNodeError: If no candidate node is available
+        """
+        exclude = exclude or set()
+        async with self.condition:
+            while True:
+                candidates = [
+                    node for node in self.nodes
+                    if node.available and node.url not in exclude
+                ]
+                if not candidates:
+                    raise NoAvailableNodeError("No healthy Ollama node is available")
+
+                free = [node for node in candidates if node.has_capacity]
+                if free:
+                    # min() keeps list order on ties, so idle nodes fill in order
+                    node = min(free, key=lambda candidate: candidate.in_flight)
+                    node.in_flight += 1
+                    node.total_requests += 1
+                    return node
+
+                await self.condition.wait()
+
+    async def release(self, node: OllamaNode) -> None:
+        """Frees a slot reserved by acquire() and wakes waiting callers."""
+        async with self.condition:
+            node.in_flight -= 1
+            self.condition.notify_all()
+
+    def least_loaded(self) -> OllamaNode:
+        """
+        Returns the available node with the fewest outstanding requests
+        without reserving a slot on it.
+
+        Raises:
+            NoAvailableNodeError: If every node is ejected
+        """
+        candidates = [node for node in self.nodes if node.available]
+        if not candidates:
+            raise NoAvailableNodeError("No healthy Ollama node is available")
+        return min(candidates, key=lambda node: node.in_flight)
+
+    @asynccontextmanager
+    async def lease(self, exclude: Optional[Set[str]] = None) -> AsyncIterator[OllamaNode]:
+        """Context manager form of acquire() and release()."""
+        node = await self.acquire(exclude)
+        try:
+            yield node
+        finally:
+            await self.release(node)
+
+    def record_success(self, node: OllamaNode) -> None:
+        """Resets a node's failure count after a successful call and marks it used."""
+        node.last_used = time.monotonic()
+        self._record_healthy(node)
+
+    def _record_healthy(self, node: OllamaNode) -> None:
+        """Resets a node's failure count and readmits it if it was ejected."""
+        node.consecutive_failures = 0
+        if node.healthy is not True:
+            self._set_health(node, True)
+
+    async def record_failure(self, node: OllamaNode, error: str) -> None:
+        """
+        Counts a failed call or probe and ejects the node once it reaches
+        failure_threshold consecutive failures.
+        """
+        node.consecutive_failures += 1
+        node.total_failures += 1
+        node.last_error = error
+        if node.consecutive_failures >= self.failure_threshold and node.healthy is not False:
+            self._set_health(node, False)
+            # Waiters may have nowhere left to go and must re-evaluate
+            async with self.condition:
+                self.condition.notify_all()
+
+    async def record_probe(self, node: OllamaNode, healthy: bool, error: Optional[str] = None) -> None:
+        """Applies the result of a background health probe to a node."""
+        node.last_checked = datetime.utcnow()
+        if healthy:
+            was_ejected = node.healthy is False
+            # Probes do not touch the model, so they leave last_used alone
+            # and idle nodes still get their keep-alive refresh
+            self._record_healthy(node)
+            if was_ejected:
+                async with self.condition:
+                    self.condition.notify_all()
+        else:
+            await self.record_failure(node, error or "health probe failed")
+
+    def _set_health(self, node: OllamaNode, healthy: bool) -> None:
+        """Updates a node's health, logging transitions only."""
+        if healthy != node.healthy:
+            logger.info(f"Ollama node {node.url} marked {'healthy' if healthy else 'ejected'}")
+        node.healthy = healthy
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Returns the state of every node."""
+        return [node.to_dict() for node in self.nodes]
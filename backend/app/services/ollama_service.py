@@ -1,13 +1,41 @@
 # backend/app/services/ollama_service.py
 
 import os
+import copy
+import uuid
+import hashlib
 import httpx
 import json
 import logging
-from typing import Dict, Any, Optional
+import time
+from contextlib import asynccontextmanager
+from typing import (
+    Any, AsyncContextManager, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, Union
+)
 import asyncio
 from datetime import datetime
-from tenacity import retry, stop_after_attempt, wait_exponential
+
+from ..metrics import (
+    GENERATION_STAGE_SECONDS,
+    combine_generation_stats,
+    generation_stats,
+    observe_generation_stats
+)
+from ..sections import NOTE_SECTIONS, SECTION_KEYS, assemble_sections
+from .admission import AdmissionRejected
+from .cache_service import GenerationCache
+from .embedding_service import hash_embedding
+from .ollama_pool import NoAvailableNodeError, OllamaBackendPool, OllamaNode
+from .resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Deadline,
+    DeadlineExceededError,
+    full_jitter_backoff,
+    is_outage,
+    is_transient
+)
+from .single_flight import SingleFlight
 
 # Set up logging with a consistent format for better debugging
 logging.basicConfig(
@@ -16,6 +44,153 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Instructions per learning style. All of them are part of the shared prompt
+# prefix; the request-specific tail only names the style to apply.
+LEARNING_STYLE_GUIDANCE = {
+    "visual": """
+- Using descriptive visual language
+- Including diagram descriptions
+- Creating mental images and visual analogies
+- Using spatial organization and visual hierarchies
+- Incorporating visual metaphors and comparisons""",
+    "auditory": """
+- Using rhythmic and memorable phrases
+- Creating verbal analogies and mnemonics
+- Including discussion points and verbal explanations
+- Using sound-based memory techniques
+- Incorporating dialogue and question-answer formats""",
+    "reading": """
+- Providing detailed written explanations
+- Including reference materials and citations
+- Using structured text formats and outlines
+- Creating comprehensive written summaries
+- Using text-based examples and case studies""",
+    "kinesthetic": """
+- Including hands-on exercises and activities
+- Providing interactive examples and simulations
+- Describing physical demonstrations
+- Including step-by-step procedures
+- Creating practice scenarios and role-play situations""",
+}
+
+# Instructions shared by every study-notes prompt. They come first and never
+# vary, so Ollama can reuse the evaluated prefix from its prompt cache and
+# only evaluate the short request-specific tail.
+STUDY_NOTES_PREFIX = """As an educational AI assistant, create comprehensive study notes for the topic, level and learning style given at the end.
+
+Please structure the notes following this format:
+
+# [Title given at the end]
+[Brief introduction to the topic]
+
+# Main Concepts
+[Core principles and fundamental ideas, adapted to the student's level]
+
+# Detailed Explanations
+[Break down complex ideas with examples]
+[Include visuals and diagrams for visual learners]
+[Use analogies and real-world examples]
+
+# Key Points to Remember
+[Summarize crucial information]
+[Include memory hooks and mnemonics]
+
+# Practice and Application
+[3-5 practice questions with answers]
+[Real-world applications of concepts]
+
+Adapt the content to the requested learning style:
+""" + "".join(
+    f"\nFor {style} learners, by:{guidance}\n"
+    for style, guidance in LEARNING_STYLE_GUIDANCE.items()
+)
+
+# "single" asks for the whole note in one completion; "sections" generates
+# every section with its own concurrent request
+GENERATION_MODES = ("single", "sections")
+
+def parse_keep_alive(value: str) -> Union[str, float]:
+    """
+    Converts OLLAMA_KEEP_ALIVE into the form Ollama expects: plain numbers
+    are seconds and must be sent as JSON numbers, anything else ("30m",
+    "1h") is passed through as a duration string.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+# Returns a context manager holding a generation slot, e.g.
+# AdmissionController.slot. Only calls that reach Ollama take one, so cache
+# hits and callers joining a shared generation never wait for a slot
+SlotFactory = Callable[[], AsyncContextManager[None]]
+
+@asynccontextmanager
+async def _holding(slot: Optional[SlotFactory]) -> AsyncIterator[None]:
+    """Holds a slot from slot() for the block, or nothing if slot is None."""
+    if slot is None:
+        yield
+        return
+    async with slot():
+        yield
+
+def _retitle(content: str, title: Optional[str]) -> str:
+    """
+    Replaces the leading level-one heading of generated notes with title.
+    Notes are generated and cached under their topic, so one cache entry
+    serves requests with any title.
+    """
+    if not title:
+        return content
+    first_line, newline, rest = content.lstrip().partition("\n")
+    if not first_line.startswith("# "):
+        return content
+    return f"# {title}{newline}{rest}"
+
+async def _retitled(chunks: AsyncIterator[str], title: Optional[str]) -> AsyncIterator[str]:
+    """Streams chunks through _retitle, holding back only the first line."""
+    head: Optional[str] = "" if title else None
+    async for chunk in chunks:
+        if head is None:
+            yield chunk
+            continue
+        head += chunk
+        if "\n" in head:
+            yield _retitle(head, title)
+            head = None
+    if head:
+        yield _retitle(head, title)
+
+class _SharedSlot:
+    """
+    Slot factory for the concurrent section requests of one note. The first
+    section to reach Ollama takes a slot, and it is released once no section
+    is generating, so a sectioned note holds one slot like a single
+    generation does.
+    """
+
+    def __init__(self, slot: SlotFactory):
+        self.slot = slot
+        self.users = 0
+        self._held: Optional[AsyncContextManager[None]] = None
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def __call__(self) -> AsyncIterator[None]:
+        async with self._lock:
+            if self.users == 0:
+                held = self.slot()
+                await held.__aenter__()
+                self._held = held
+            self.users += 1
+        try:
+            yield
+        finally:
+            self.users -= 1
+            if self.users == 0:
+                held, self._held = self._held, None
+                await held.__aexit__(None, None, None)
+
 class OllamaService:
     """
     Service class for handling all interactions with the Ollama API.
@@ -23,79 +198,798 @@ class OllamaService:
     Includes comprehensive error handling and retry logic for robust operation.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[GenerationCache] = None
+    ):
         """
         Initialize the Ollama service with configuration from environment variables.
         Validates required environment variables and sets up logging configuration.
         Raises ValueError if required environment variables are missing.
+
+        Args:
+            transport: Optional httpx transport for the shared client, mainly
+                used to plug in a mock transport during tests
+            cache: Optional generation cache consulted before calling the model
         """
-        # Load configuration from environment variables
-        self.base_url = os.getenv("OLLAMA_API_URL")
+        # Load configuration from environment variables. OLLAMA_API_URLS lists
+        # several nodes separated by commas; OLLAMA_API_URL configures one
+        urls = os.getenv("OLLAMA_API_URLS") or os.getenv("OLLAMA_API_URL") or ""
+        self.urls = [url.strip().rstrip("/") for url in urls.split(",") if url.strip()]
+        self.base_url = self.urls[0] if self.urls else None
         self.model = os.getenv("OLLAMA_MODEL")
         
         # Log configuration details for debugging purposes
-        logger.info(f"Initializing OllamaService with URL: {self.base_url}")
+        logger.info(f"Initializing OllamaService with URLs: {', '.join(self.urls)}")
         logger.info(f"Using model: {self.model}")
         
         # Validate configuration
-        if not self.base_url or not self.model:
+        if not self.urls or not self.model:
             raise ValueError(
-                "OLLAMA_API_URL and OLLAMA_MODEL must be set in environment variables"
+                "OLLAMA_API_URL (or OLLAMA_API_URLS) and OLLAMA_MODEL must be set in environment variables"
             )
         
+        # Load-aware routing across the nodes; Ollama runs one generation per
+        # model at a time, so each node defaults to a single in-flight request
+        self.pool = OllamaBackendPool(
+            self.urls,
+            max_concurrency=int(os.getenv("OLLAMA_NODE_CONCURRENCY", "1")),
+            failure_threshold=int(os.getenv("OLLAMA_NODE_FAILURE_THRESHOLD", "3"))
+        )
+        
+        # Retry policy: attempts are capped by count and by an end-to-end
+        # deadline, and backoff delays are drawn with full jitter
+        self.max_attempts = int(os.getenv("OLLAMA_MAX_ATTEMPTS", "3"))
+        self.request_deadline = float(os.getenv("OLLAMA_REQUEST_DEADLINE", "240"))
+        self.retry_backoff_base = float(os.getenv("OLLAMA_RETRY_BACKOFF_BASE", "1"))
+        self.retry_backoff_cap = float(os.getenv("OLLAMA_RETRY_BACKOFF_CAP", "20"))
+        
+        # Fails generation fast while Ollama as a whole keeps failing
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("OLLAMA_BREAKER_FAILURE_THRESHOLD", "5")),
+            recovery_timeout=float(os.getenv("OLLAMA_BREAKER_RECOVERY_TIMEOUT", "30"))
+        )
+        
+        # Embedding model for semantic search; "local" uses a hashing stand-in
+        # that needs no server, e.g. for tests
+        self.embedding_model = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+        
+        # Sampling temperature; part of the generation cache key
+        self.temperature = float(os.getenv("OLLAMA_TEMPERATURE", "0.7"))
+        
+        # Default generation mode, and the token budget of each section in
+        # "sections" mode
+        self.generation_mode = os.getenv("GENERATION_MODE", "single")
+        if self.generation_mode not in GENERATION_MODES:
+            raise ValueError(f"GENERATION_MODE must be one of: {', '.join(GENERATION_MODES)}")
+        self.section_num_predict = int(os.getenv("OLLAMA_SECTION_NUM_PREDICT", "768"))
+        self.cache = cache
+        
+        # Identical concurrent generations share one Ollama call
+        self.generations = SingleFlight()
+        
+        # Connection pool limits for the shared, long-lived HTTP client, which
+        # serves every node
+        self.pool_limits = httpx.Limits(
+            max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10")),
+            max_keepalive_connections=int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "5")),
+            keepalive_expiry=float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "300"))
+        )
+        
+        # Timeouts for generation requests, sized for long completions
+        self.timeout = httpx.Timeout(
+            connect=30.0,
+            read=180.0,
+            write=30.0,
+            pool=30.0
+        )
+        
+        # How often the background probers refresh each node's health state
+        self.health_check_interval = float(os.getenv("OLLAMA_HEALTH_CHECK_INTERVAL", "15"))
+        
+        # How long Ollama keeps the model loaded after a request, sent with
+        # every call. Nodes idle for keep_alive_refresh_interval seconds get a
+        # load-only request so the model is not unloaded between notes;
+        # 0 disables the refresher
+        self.keep_alive = parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "30m"))
+        self.keep_alive_refresh_interval = float(os.getenv("OLLAMA_KEEP_ALIVE_REFRESH_INTERVAL", "600"))
+        
+        # Load the model and evaluate the shared prompt prefix at startup
+        self.warm_up_on_start = os.getenv("OLLAMA_WARM_UP", "true").lower() == "true"
+        
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._health_tasks: List[asyncio.Task] = []
+        self._keep_alive_task: Optional[asyncio.Task] = None
+        
         logger.info(f"Initialized OllamaService with model: {self.model}")
 
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Returns the shared keep-alive HTTP client, creating it on first use.
+        The client is normally created by start(), but lazy creation keeps the
+        service usable from scripts and tests that never run the app lifecycle.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.pool_limits,
+                transport=self._transport
+            )
+        return self._client
+
+    async def start(self) -> None:
+        """
+        Opens the shared connection pool, starts one background health
+        prober per node and the task that warms up the model and keeps it
+        loaded. Called once from the application startup event.
+        """
+        _ = self.client
+        await self._probe_health()
+        if not self._health_tasks:
+            self._health_tasks = [
+                asyncio.create_task(self._health_probe_loop(node))
+                for node in self.pool.nodes
+            ]
+        if self._keep_alive_task is None:
+            # Runs in the background: loading a large model can take minutes
+            self._keep_alive_task = asyncio.create_task(self._keep_alive_loop())
+        logger.info(f"OllamaService started with {len(self.pool.nodes)} node(s)")
+
+    async def close(self) -> None:
+        """
+        Stops the background health probers and closes the shared connection pool.
+        Called once from the application shutdown event.
+        """
+        tasks = self._health_tasks + ([self._keep_alive_task] if self._keep_alive_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._health_tasks = []
+        self._keep_alive_task = None
+        
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        logger.info("OllamaService closed")
+
+    async def _probe_health(self) -> bool:
+        """
+        Probes every node once and records the results in the pool.
+        
+        Returns:
+            True if at least one node is available, False otherwise
+        """
+        await asyncio.gather(*[self._probe_node(node) for node in self.pool.nodes])
+        return self.pool.has_available()
+
+    async def _probe_node(self, node: OllamaNode) -> bool:
+        """
+        Probes one node's /api/tags endpoint.
+        
+        Returns:
+            True if the node responded successfully, False otherwise
+        """
+        try:
+            response = await self.client.get(f"{node.url}/api/tags", timeout=10.0)
+            response.raise_for_status()
+            await self.pool.record_probe(node, True)
+            return True
+        except Exception as e:
+            logger.error(f"Ollama node {node.url} health check failed: {str(e)}")
+            await self.pool.record_probe(node, False, str(e))
+            return False
+
+    async def _health_probe_loop(self, node: OllamaNode) -> None:
+        """Refreshes a node's health state every health_check_interval seconds."""
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self._probe_node(node)
+
+    async def warm_up(self) -> None:
+        """
+        Preloads the model on every available node with a one-token
+        generation over the shared prompt prefix, so the first note neither
+        waits for the model to load nor evaluates the prefix from scratch.
+        """
+        await asyncio.gather(*[
+            self._load_model(node, prompt=STUDY_NOTES_PREFIX)
+            for node in self.pool.nodes if node.available
+        ])
+
+    async def _load_model(self, node: OllamaNode, prompt: str = "") -> bool:
+        """
+        Loads the model on a node and resets its keep_alive timer. An empty
+        prompt only loads the model; otherwise the prompt is evaluated too.
+        
+        Returns:
+            True if the request succeeded, False otherwise
+        """
+        payload: Dict[str, Any] = {"model": self.model, "keep_alive": self.keep_alive}
+        if prompt:
+            payload.update(prompt=prompt, stream=False, options={"num_predict": 1})
+        try:
+            response = await self.client.post(
+                f"{node.url}/api/generate", json=payload, timeout=self.timeout
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Could not load {self.model} on {node.url}: {str(e)}")
+            return False
+        
+        self.pool.record_success(node)
+        load_duration = response.json().get("load_duration", 0) / 1e9
+        logger.info(f"Loaded {self.model} on {node.url} (load took {load_duration:.2f}s)")
+        return True
+
+    async def _keep_alive_loop(self) -> None:
+        """
+        Warms up the model once, then keeps it loaded on nodes that have not
+        served a request for keep_alive_refresh_interval seconds.
+        """
+        if self.warm_up_on_start:
+            await self.warm_up()
+        if self.keep_alive_refresh_interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.keep_alive_refresh_interval)
+            idle_since = time.monotonic() - self.keep_alive_refresh_interval
+            for node in self.pool.nodes:
+                if node.available and node.in_flight == 0 and (node.last_used or 0) <= idle_since:
+                    await self._load_model(node)
+
     async def generate_study_notes(
         self, 
         topic: str, 
         level: str, 
         learning_style: str,
-        title: Optional[str] = None
+        title: Optional[str] = None,
+        bypass_cache: bool = False,
+        refresh_cache: bool = False,
+        generation_mode: Optional[str] = None,
+        slot: Optional[SlotFactory] = None
     ) -> Dict[str, Any]:
         """
         Generates comprehensive study notes using the Ollama model.
+        Results are served from and stored in the generation cache when one
+        is configured.
         
         Args:
             topic: The main subject area to create notes for
             level: Student's proficiency level (beginner, intermediate, expert)
             learning_style: Preferred learning style
-            title: Optional specific title for the notes
+            title: Optional specific title for the notes, used as their
+                heading; it does not change the cache entry
+            bypass_cache: Neither read nor write the generation cache
+            refresh_cache: Skip the cache lookup but store the fresh result
+            generation_mode: "single" or "sections"; defaults to GENERATION_MODE
+            slot: Generation slot held while Ollama is called; cache hits
+                and coalesced callers do not take one
             
         Returns:
             Dictionary containing the generated content and metadata
             
         Raises:
+            AdmissionRejected: If slot() sheds the generation
+            CircuitOpenError: If the circuit breaker is rejecting calls
             RuntimeError: If note generation fails
         """
         logger.info(f"Generating study notes for topic: {topic}, level: {level}")
         
-        # Construct a detailed prompt for the AI model
-        prompt = self._create_study_notes_prompt(topic, level, learning_style, title)
+        if (generation_mode or self.generation_mode) == "sections":
+            return await self.generate_sectioned_notes(
+                topic, level, learning_style, title, bypass_cache, refresh_cache, slot
+            )
         
-        try:
+        use_cache = self.cache is not None and not bypass_cache
+        cache_key = self.cache_key(topic, level, learning_style)
+        
+        if use_cache and not refresh_cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Serving study notes for topic: {topic} from cache")
+                cached["content"] = _retitle(cached["content"], title)
+                # Only callers of one in-flight generation may share a note row
+                cached["metadata"]["generation_id"] = uuid.uuid4().hex
+                return cached
+        
+        # Construct a detailed prompt for the AI model. The title is left
+        # out, like from the cache key, and put in place of the heading once
+        # the notes are generated
+        started = time.perf_counter()
+        prompt = self._create_study_notes_prompt(topic, level, learning_style)
+        GENERATION_STAGE_SECONDS.labels("prompt_build").observe(time.perf_counter() - started)
+        
+        async def generate() -> Dict[str, Any]:
             # Generate content using the Ollama model
-            content = await self._make_request(prompt)
+            async with _holding(slot):
+                content, stats = await self._make_request(prompt, temperature=self.temperature)
             
             # Return structured response with content and metadata
-            return {
+            result = {
                 "content": content,
-                "metadata": {
-                    "topic": topic,
-                    "level": level,
-                    "learning_style": learning_style,
-                    "model_used": self.model,
-                    "generated_at": datetime.utcnow().isoformat(),
-                    "generation_parameters": {
-                        "temperature": 0.7,
-                        "format": "markdown"
-                    }
-                }
+                "metadata": self.build_metadata(topic, level, learning_style, stats)
             }
             
+            if use_cache:
+                await self.cache.set(cache_key, result)
+            
+            return result
+        
+        try:
+            # Concurrent callers with the same prompt await one shared generation
+            result, shared = await self.generations.do(self._prompt_key(prompt), generate)
+            
+            # Every caller gets its own copy so metadata can be changed independently
+            result = copy.deepcopy(result)
+            result["content"] = _retitle(result["content"], title)
+            if shared:
+                result["metadata"]["coalesced"] = True
+            return result
+            
+        except (AdmissionRejected, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Error generating study notes: {str(e)}")
             raise RuntimeError(f"Error generating study notes: {str(e)}")
 
+    async def stream_study_notes(
+        self, 
+        topic: str, 
+        level: str, 
+        learning_style: str,
+        title: Optional[str] = None,
+        bypass_cache: bool = False,
+        refresh_cache: bool = False,
+        stats: Optional[Dict[str, Any]] = None,
+        generation_mode: Optional[str] = None,
+        slot: Optional[SlotFactory] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generates study notes like generate_study_notes, but yields the content
+        in chunks as the model produces them. A cache hit is yielded as a
+        single chunk.
+        
+        Args:
+            topic: The main subject area to create notes for
+            level: Student's proficiency level (beginner, intermediate, expert)
+            learning_style: Preferred learning style
+            title: Optional specific title for the notes, used as their
+                heading; it does not change the cache entry
+            bypass_cache: Neither read nor write the generation cache
+            refresh_cache: Skip the cache lookup but store the fresh result
+            stats: Optional dictionary that receives Ollama's generation
+                statistics once the stream completes
+            generation_mode: "single" or "sections"; in "sections" mode each
+                section is yielded whole, in document order, as soon as it
+                and every section before it are done
+            slot: Generation slot held while Ollama streams; a cache hit
+                does not take one
+            
+        Yields:
+            Content chunks in generation order
+            
+        Raises:
+            AdmissionRejected: If slot() sheds the generation
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            RuntimeError: If note generation fails
+        """
+        logger.info(f"Streaming study notes for topic: {topic}, level: {level}")
+        
+        if (generation_mode or self.generation_mode) == "sections":
+            async for chunk in self._stream_sections(
+                topic, level, learning_style, title, bypass_cache, refresh_cache, stats, slot
+            ):
+                yield chunk
+            return
+        
+        use_cache = self.cache is not None and not bypass_cache
+        cache_key = self.cache_key(topic, level, learning_style)
+        
+        if use_cache and not refresh_cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                yield _retitle(cached["content"], title)
+                return
+        
+        # Generated under the topic, as in generate_study_notes
+        prompt = self._create_study_notes_prompt(topic, level, learning_style)
+        stats = stats if stats is not None else {}
+        chunks = []
+        
+        async def record() -> AsyncIterator[str]:
+            async for chunk in self._stream_request(prompt, temperature=self.temperature, stats=stats):
+                chunks.append(chunk)
+                yield chunk
+        
+        try:
+            async with _holding(slot):
+                async for chunk in _retitled(record(), title):
+                    yield chunk
+            
+            if use_cache:
+                await self.cache.set(cache_key, {
+                    "content": "".join(chunks),
+                    "metadata": self.build_metadata(topic, level, learning_style, stats)
+                })
+        except (AdmissionRejected, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming study notes: {str(e)}")
+            raise RuntimeError(f"Error streaming study notes: {str(e)}")
+
+    async def generate_sectioned_notes(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        title: Optional[str] = None,
+        bypass_cache: bool = False,
+        refresh_cache: bool = False,
+        slot: Optional[SlotFactory] = None
+    ) -> Dict[str, Any]:
+        """
+        Generates study notes with one concurrent request per section and
+        assembles them in order. The requests spread over the free node
+        capacity, so with several nodes the note takes about as long as its
+        slowest section. Each section is cached on its own, and the sections
+        share one generation slot from slot().
+        
+        Returns:
+            Dictionary containing the assembled content and metadata, with
+            per-section cache hits and statistics under metadata["sections"]
+            
+        Raises:
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            RuntimeError: If a section fails to generate
+        """
+        shared = _SharedSlot(slot) if slot is not None else None
+        try:
+            results = await asyncio.gather(*[
+                self.generate_section(topic, level, learning_style, section, bypass_cache, refresh_cache, shared)
+                for section in SECTION_KEYS
+            ])
+        except (AdmissionRejected, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.error(f"Error generating study note sections: {str(e)}")
+            raise RuntimeError(f"Error generating study notes: {str(e)}")
+        
+        sections = dict(zip(SECTION_KEYS, results))
+        return {
+            "content": assemble_sections(
+                title or topic, {key: result["content"] for key, result in sections.items()}
+            ),
+            "metadata": self._sectioned_metadata(topic, level, learning_style, sections)
+        }
+
+    async def _stream_sections(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        title: Optional[str],
+        bypass_cache: bool,
+        refresh_cache: bool,
+        stats: Optional[Dict[str, Any]],
+        slot: Optional[SlotFactory] = None
+    ) -> AsyncIterator[str]:
+        """Streams a sectioned note one whole section at a time, in order."""
+        shared = _SharedSlot(slot) if slot is not None else None
+        tasks = [
+            asyncio.ensure_future(
+                self.generate_section(topic, level, learning_style, section, bypass_cache, refresh_cache, shared)
+            )
+            for section in SECTION_KEYS
+        ]
+        try:
+            parts = []
+            for index, (task, (_, heading, _)) in enumerate(zip(tasks, NOTE_SECTIONS)):
+                result = await task
+                parts.append(result["metadata"].get("ollama_stats", {}))
+                separator = "\n\n" if index else ""
+                yield f"{separator}# {heading or title or topic}\n{result['content'].strip()}"
+            if stats is not None:
+                stats.update(combine_generation_stats(parts))
+        except (AdmissionRejected, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming study note sections: {str(e)}")
+            raise RuntimeError(f"Error streaming study notes: {str(e)}")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def generate_section(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        section: str,
+        bypass_cache: bool = False,
+        refresh_cache: bool = False,
+        slot: Optional[SlotFactory] = None
+    ) -> Dict[str, Any]:
+        """
+        Generates the body of one note section, cached by (topic, level,
+        learning style, section).
+        
+        Args:
+            section: One of SECTION_KEYS
+            bypass_cache: Neither read nor write the section cache
+            refresh_cache: Regenerate and overwrite the cached section
+            slot: Generation slot held while Ollama is called
+            
+        Returns:
+            Dictionary with the section body (without heading) as "content"
+            and its metadata
+            
+        Raises:
+            ValueError: If the section is unknown
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            RuntimeError: If generation fails
+        """
+        if section not in SECTION_KEYS:
+            raise ValueError(f"Unknown section {section}; expected one of: {', '.join(SECTION_KEYS)}")
+        
+        use_cache = self.cache is not None and not bypass_cache
+        cache_key = self.cache_key(topic, level, learning_style, section)
+        
+        if use_cache and not refresh_cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        prompt = self._create_section_prompt(topic, level, learning_style, section)
+        
+        async def generate() -> Dict[str, Any]:
+            async with _holding(slot):
+                content, stats = await self._make_request(
+                    prompt, temperature=self.temperature, num_predict=self.section_num_predict
+                )
+            result = self._section_result(content, stats, section, topic)
+            if use_cache:
+                await self.cache.set(cache_key, result)
+            return result
+        
+        result, _ = await self.generations.do(self._prompt_key(prompt), generate)
+        return copy.deepcopy(result)
+
+    async def regenerate_section(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        section: str,
+        context: str,
+        title: Optional[str] = None,
+        instructions: Optional[str] = None,
+        slot: Optional[SlotFactory] = None
+    ) -> Dict[str, Any]:
+        """
+        Writes a new version of one section of an existing note.
+        
+        The rest of the note goes into the prompt, so the new section fits
+        the others without repeating them, while only the section itself is
+        generated (at most section_num_predict tokens). The result is never
+        cached, since asking again is a request for a different version.
+        
+        Args:
+            section: One of SECTION_KEYS
+            context: The note without the section being replaced
+            title: Note title, the heading of the introduction
+            instructions: What to change, e.g. "use simpler examples"
+            slot: Generation slot held while Ollama is called
+            
+        Returns:
+            Dictionary with the section body (without heading) as "content"
+            and its metadata
+            
+        Raises:
+            ValueError: If the section is unknown
+            AdmissionRejected: If slot() sheds the generation
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            RuntimeError: If generation fails
+        """
+        if section not in SECTION_KEYS:
+            raise ValueError(f"Unknown section {section}; expected one of: {', '.join(SECTION_KEYS)}")
+        
+        prompt = self._create_regenerate_prompt(topic, level, learning_style, section, context, title, instructions)
+        try:
+            async with _holding(slot):
+                content, stats = await self._make_request(
+                    prompt, temperature=self.temperature, num_predict=self.section_num_predict
+                )
+        except (AdmissionRejected, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.error(f"Error regenerating section {section}: {str(e)}")
+            raise RuntimeError(f"Error regenerating section: {str(e)}")
+        
+        return {
+            "content": self._strip_section_heading(content, section, title or topic),
+            "metadata": {
+                "section": section,
+                "model_used": self.model,
+                "generated_at": datetime.utcnow().isoformat(),
+                "regenerated": True,
+                "ollama_stats": stats
+            }
+        }
+
+    async def precompute(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        section: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Generates one generation cache entry ahead of demand: the whole note
+        as generate_study_notes would, or one section as generate_section
+        would, stored under the same key so later requests are cache hits.
+        
+        Unlike those methods this never starts or joins a shared generation,
+        so cancelling it aborts its Ollama call immediately.
+        
+        Args:
+            section: One of SECTION_KEYS, or None for a "single" mode note
+            
+        Returns:
+            The cached result, marked as precomputed in its metadata
+            
+        Raises:
+            ValueError: If the section is unknown
+            RuntimeError: If no generation cache is configured
+            CircuitOpenError: If the circuit breaker is rejecting calls
+        """
+        if self.cache is None:
+            raise RuntimeError("Precomputing notes requires a generation cache")
+        
+        if section is None:
+            prompt = self._create_study_notes_prompt(topic, level, learning_style)
+            content, stats = await self._make_request(prompt, temperature=self.temperature)
+            result = {
+                "content": content,
+                "metadata": self.build_metadata(topic, level, learning_style, stats)
+            }
+        else:
+            if section not in SECTION_KEYS:
+                raise ValueError(f"Unknown section {section}; expected one of: {', '.join(SECTION_KEYS)}")
+            prompt = self._create_section_prompt(topic, level, learning_style, section)
+            content, stats = await self._make_request(
+                prompt, temperature=self.temperature, num_predict=self.section_num_predict
+            )
+            result = self._section_result(content, stats, section, topic)
+        
+        result["metadata"]["precomputed"] = True
+        await self.cache.set(self.cache_key(topic, level, learning_style, section), result)
+        return result
+
+    def _section_result(self, content: str, stats: Dict[str, Any], section: str, topic: str) -> Dict[str, Any]:
+        """Builds the cached result of one generated section."""
+        return {
+            "content": self._strip_section_heading(content, section, topic),
+            "metadata": {
+                "section": section,
+                "model_used": self.model,
+                "generated_at": datetime.utcnow().isoformat(),
+                "ollama_stats": stats
+            }
+        }
+
+    def _sectioned_metadata(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        sections: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Builds note metadata from the results of generate_section."""
+        stats = combine_generation_stats(
+            result["metadata"].get("ollama_stats", {}) for result in sections.values()
+        )
+        metadata = self.build_metadata(topic, level, learning_style, stats, generation_mode="sections")
+        metadata["sections"] = {
+            key: {
+                "cache_hit": result["metadata"].get("cache_hit"),
+                "generated_at": result["metadata"].get("generated_at"),
+                "ollama_stats": result["metadata"].get("ollama_stats", {})
+            }
+            for key, result in sections.items()
+        }
+        return metadata
+
+    @staticmethod
+    def _strip_section_heading(content: str, section: str, topic: str) -> str:
+        """Drops a leading heading line repeating the section heading, if the model wrote one."""
+        content = content.strip()
+        first_line, _, rest = content.partition("\n")
+        heading = dict((key, heading) for key, heading, _ in NOTE_SECTIONS)[section] or topic
+        if first_line.startswith("#") and first_line.lstrip("#").strip().lower() == heading.lower():
+            return rest.strip()
+        return content
+
+    async def is_cached(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        generation_mode: Optional[str] = None
+    ) -> bool:
+        """
+        True if the generation cache can serve the request without calling
+        Ollama: the whole note, or every section in "sections" mode. Does not
+        count as a cache lookup.
+        """
+        if self.cache is None:
+            return False
+        sections = SECTION_KEYS if (generation_mode or self.generation_mode) == "sections" else (None,)
+        for section in sections:
+            if await self.cache.age(self.cache_key(topic, level, learning_style, section)) is None:
+                return False
+        return True
+
+    def cache_key(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        section: Optional[str] = None
+    ) -> str:
+        """
+        Returns the generation cache key for a request on this service's
+        model, or for one section of it.
+        """
+        return GenerationCache.make_key(
+            topic, level, learning_style, self.model, self.temperature, section=section
+        )
+
+    def _prompt_key(self, prompt: str) -> str:
+        """Returns the key identifying identical generation requests."""
+        raw_key = f"{self.model}|{self.temperature}|{prompt}"
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def build_metadata(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        stats: Optional[Dict[str, Any]] = None,
+        generation_mode: str = "single"
+    ) -> Dict[str, Any]:
+        """
+        Builds the metadata stored alongside generated notes.
+        
+        Args:
+            topic: Main subject area
+            level: Student's proficiency level
+            learning_style: Preferred learning style
+            stats: Generation statistics reported by Ollama, if any
+            generation_mode: How the content was generated
+            
+        Returns:
+            Dictionary describing how the notes were generated
+        """
+        return {
+            # Shared by the callers of one in-flight model call; cache hits
+            # get a new one
+            "generation_id": uuid.uuid4().hex,
+            "topic": topic,
+            "level": level,
+            "learning_style": learning_style,
+            "model_used": self.model,
+            "generated_at": datetime.utcnow().isoformat(),
+            "generation_mode": generation_mode,
+            "generation_parameters": {
+                "temperature": self.temperature,
+                "format": "markdown"
+            },
+            "ollama_stats": dict(stats or {})
+        }
+
     def _create_study_notes_prompt(
         self, 
         topic: str, 
@@ -115,183 +1009,412 @@ class OllamaService:
         Returns:
             Formatted prompt string with learning style-specific adaptations
         """
-        # Base prompt structure with comprehensive learning objectives
-        prompt = f"""As an educational AI assistant, create comprehensive study notes for:
-        Topic: {topic}
-        Level: {level}
-        Learning Style: {learning_style}
-        
-        Please structure the notes following this format:
-        
-        # {title or topic}
-        [Brief introduction to the topic]
-        
-        # Main Concepts
-        [Core principles and fundamental ideas, adapted for {level} level]
-        
-        # Detailed Explanations
-        [Break down complex ideas with examples]
-        [Include visuals and diagrams for visual learners]
-        [Use analogies and real-world examples]
-        
-        # Key Points to Remember
-        [Summarize crucial information]
-        [Include memory hooks and mnemonics]
-        
-        # Practice and Application
-        [3-5 practice questions with answers]
-        [Real-world applications of concepts]
-        
-        Note: Adapt the content for {learning_style} learning style by:"""
-        
-        # Add learning style-specific instructions
-        if learning_style == "visual":
-            prompt += """
-            - Using descriptive visual language
-            - Including diagram descriptions
-            - Creating mental images and visual analogies
-            - Using spatial organization and visual hierarchies
-            - Incorporating visual metaphors and comparisons"""
-        elif learning_style == "auditory":
-            prompt += """
-            - Using rhythmic and memorable phrases
-            - Creating verbal analogies and mnemonics
-            - Including discussion points and verbal explanations
-            - Using sound-based memory techniques
-            - Incorporating dialogue and question-answer formats"""
-        elif learning_style == "reading":
-            prompt += """
-            - Providing detailed written explanations
-            - Including reference materials and citations
-            - Using structured text formats and outlines
-            - Creating comprehensive written summaries
-            - Using text-based examples and case studies"""
-        elif learning_style == "kinesthetic":
-            prompt += """
-            - Including hands-on exercises and activities
-            - Providing interactive examples and simulations
-            - Describing physical demonstrations
-            - Including step-by-step procedures
-            - Creating practice scenarios and role-play situations"""
-            
+        # The shared prefix comes first; everything specific to this request
+        # goes into the tail so the evaluated prefix can be reused
+        prompt = f"""{STUDY_NOTES_PREFIX}
+Topic: {topic}
+Title: {title or topic}
+Level: {level}
+Learning Style: {learning_style}
+"""
+        
         return prompt
 
-    @retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=2, min=4, max=20)  # Increased wait times
-)
-    async def _make_request(self, prompt: str, temperature: float = 0.7) -> str:
+    def _create_section_prompt(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        section: str
+    ) -> str:
+        """
+        Creates the prompt for a single section. It extends the shared
+        prompt with an instruction to write only that section, so the
+        evaluated prefix is reused across sections as well.
+        """
+        _, heading, contents = next(entry for entry in NOTE_SECTIONS if entry[0] == section)
+        prompt = self._create_study_notes_prompt(topic, level, learning_style)
+        return prompt + (
+            f"\nWrite only the {heading or 'introduction'} section: {contents}. "
+            "Leave out the section heading and all other sections.\n"
+        )
+
+    def _create_regenerate_prompt(
+        self,
+        topic: str,
+        level: str,
+        learning_style: str,
+        section: str,
+        context: str,
+        title: Optional[str],
+        instructions: Optional[str]
+    ) -> str:
+        """
+        Creates the prompt for rewriting one section of an existing note,
+        after the shared prefix like every other prompt.
+        """
+        _, heading, contents = next(entry for entry in NOTE_SECTIONS if entry[0] == section)
+        prompt = self._create_study_notes_prompt(topic, level, learning_style, title)
+        prompt += (
+            f"\nThe current notes, without their {heading or 'introduction'} section:\n\n"
+            f"{context.strip()}\n\n"
+            f"Write a new {heading or 'introduction'} section: {contents}. "
+            "Build on the other sections without repeating them. "
+            "Leave out the section heading and all other sections.\n"
+        )
+        if instructions:
+            prompt += f"Additional instructions for this section: {instructions.strip()}\n"
+        return prompt
+
+    async def _make_request(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        num_predict: int = 2048
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Sends a non-streaming generation request through the circuit breaker
+        and the node pool.
+        
+        Each attempt goes to the least loaded available node. Only transient
+        failures (connection errors, timeouts, 429/502/503/504) are retried:
+        first on a node that has not been tried yet, and once every node has
+        failed, after a full-jitter backoff. All attempts share one deadline,
+        which also bounds each attempt's timeouts, so a request never runs
+        longer than OLLAMA_REQUEST_DEADLINE. Only calls that reached Ollama
+        and failed with a transport error, a timeout or a 5xx status count
+        against the circuit breaker; waiting too long for a free node does not.
+        
+        Args:
+            prompt: The complete prompt to send
+            temperature: Sampling temperature
+            num_predict: Maximum number of tokens to generate
+            
+        Returns:
+            Tuple of (generated text, Ollama's generation statistics such as
+            eval_count and eval_duration)
+            
+        Raises:
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            RuntimeError: If the request fails or runs out of time
+        """
+        self.breaker.before_call()
+        deadline = Deadline(self.request_deadline)
+        
         try:
-            # Increased timeouts for longer operations
-            timeout = httpx.Timeout(
-                connect=30.0,     # Increased from 10.0
-                read=180.0,       # Increased from 60.0
-                write=30.0,       # Increased from 10.0
-                pool=30.0         # Increased from 10.0
+            result = await self._attempt_request(prompt, temperature, num_predict, deadline)
+        except Exception as e:
+            # Running out of time after failed attempts carries the last
+            # failed call as its cause
+            failed_call = e.__cause__ if isinstance(e, DeadlineExceededError) else e
+            if failed_call is not None and is_outage(failed_call):
+                self.breaker.record_failure()
+            elif isinstance(e, NoAvailableNodeError) and not self.pool.has_available():
+                # Every node has been ejected by probes or failed calls
+                self.breaker.record_failure()
+            elif isinstance(e, (NoAvailableNodeError, DeadlineExceededError)):
+                # The request only waited for or was excluded from local node
+                # capacity and never reached Ollama
+                pass
+            else:
+                # The server answered, it just rejected this request
+                self.breaker.record_success()
+            raise self._describe_error(e) from e
+        
+        self.breaker.record_success()
+        return result
+
+    async def _attempt_request(
+        self,
+        prompt: str,
+        temperature: float,
+        num_predict: int,
+        deadline: Deadline
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Runs the retry loop of _make_request within a deadline."""
+        tried: Set[str] = set()
+        last_error: Optional[Exception] = None
+        
+        for attempt in range(self.max_attempts):
+            # Liveness comes from the per-node state kept fresh by the background
+            # probers, so generation requests no longer pay for a preflight round trip
+            if not self.pool.has_available():
+                raise NoAvailableNodeError("Ollama server is not responding to health check")
+            
+            if not any(node.available and node.url not in tried for node in self.pool.nodes):
+                # Every node already failed this request: back off, then start over
+                delay = full_jitter_backoff(attempt, self.retry_backoff_base, self.retry_backoff_cap)
+                if delay >= deadline.remaining():
+                    raise DeadlineExceededError("Ollama request deadline exceeded") from last_error
+                await asyncio.sleep(delay)
+                tried = set()
+            
+            queued = time.perf_counter()
+            try:
+                node = await asyncio.wait_for(self.pool.acquire(exclude=tried), deadline.remaining())
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError("Timed out waiting for a free Ollama node") from last_error
+            GENERATION_STAGE_SECONDS.labels("ollama_queue_wait").observe(time.perf_counter() - queued)
+            
+            try:
+                return await self._request_node(node, prompt, temperature, num_predict, deadline)
+            except Exception as e:
+                if not is_transient(e) or attempt == self.max_attempts - 1 or deadline.expired:
+                    raise
+                tried.add(node.url)
+                last_error = e
+                logger.warning(f"Attempt {attempt + 1} on {node.url} failed, retrying: {str(e)}")
+            finally:
+                await self.pool.release(node)
+
+    async def _request_node(
+        self,
+        node: OllamaNode,
+        prompt: str,
+        temperature: float,
+        num_predict: int,
+        deadline: Deadline
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Sends one generation request to a specific node, recording node
+        failures in the pool.
+        
+        Returns:
+            Tuple of (generated text, generation statistics)
+        
+        Raises:
+            httpx.HTTPError: If the request fails; left unwrapped so the
+                caller can decide whether to retry
+            RuntimeError: If the response cannot be parsed
+        """
+        logger.info(f"Sending request to {node.url}/api/generate")
+        started = time.perf_counter()
+        
+        try:
+            response = await self.client.post(
+                f"{node.url}/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": prompt,
+                    "stream": False,
+                    "keep_alive": self.keep_alive,
+                    "options": {
+                        "temperature": temperature,
+                        "num_predict": num_predict
+                    }
+                },
+                timeout=deadline.timeout(self.timeout)
             )
+            logger.info(f"Received response with status: {response.status_code}")
+            response.raise_for_status()
             
-            logger.info(f"Attempting to connect to Ollama server at {self.base_url}")
+        except Exception as e:
+            if is_transient(e):
+                # Count the failure right away instead of waiting for the next probe
+                await self.pool.record_failure(node, f"{type(e).__name__}: {str(e)}")
+            raise
+        
+        self.pool.record_success(node)
+        GENERATION_STAGE_SECONDS.labels("generation").observe(time.perf_counter() - started)
+        response_text = response.text
+        
+        # Add response size logging
+        logger.info(f"Response size: {len(response_text)} characters")
+        
+        try:
+            response_lines = response_text.strip().split('\n')
             
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                # Add verification of server availability
-                try:
-                    health_check = await client.get(
-                        f"{self.base_url}/api/tags",
-                        timeout=10.0
-                    )
-                    health_check.raise_for_status()
-                    logger.info("Ollama server health check passed")
-                except Exception as e:
-                    logger.error(f"Ollama server health check failed: {str(e)}")
-                    raise RuntimeError("Ollama server is not responding to health check")
+            for line in response_lines:
+                if line.strip():
+                    try:
+                        parsed = json.loads(line)
+                        if 'response' in parsed:
+                            return parsed['response'], self._record_stats(parsed)
+                    except json.JSONDecodeError:
+                        continue
+            
+            parsed = response.json()
+            return parsed["response"], self._record_stats(parsed)
+            
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse response. Text: {response_text[:200]}...")
+            raise RuntimeError(f"Failed to parse Ollama response: {str(e)}")
 
-                logger.info(f"Sending request to {self.base_url}/api/generate")
+    def _record_stats(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Extracts the generation statistics of a final response and records them."""
+        stats = generation_stats(payload)
+        observe_generation_stats(stats)
+        return stats
+
+    def _describe_error(self, error: Exception) -> Exception:
+        """Converts a failed Ollama call into the error raised to callers."""
+        if isinstance(error, (CircuitOpenError, RuntimeError)):
+            return error
+        if isinstance(error, httpx.TimeoutException) and not isinstance(error, httpx.ConnectTimeout):
+            logger.error("Request timed out with detailed timeout settings:")
+            logger.error(f"Connect timeout: {self.timeout.connect}")
+            logger.error(f"Read timeout: {self.timeout.read}")
+            logger.error(f"Write timeout: {self.timeout.write}")
+            return RuntimeError("Request timed out. The Ollama server took too long to respond.")
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return RuntimeError(f"Could not connect to Ollama server: {str(error)}")
+        logger.error(f"Unexpected error in make_request: {type(error).__name__}: {str(error)}")
+        return RuntimeError(f"Ollama request failed: {str(error)}")
+
+    async def _stream_request(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        stats: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Sends a streaming generation request and yields response tokens as
+        Ollama emits them. The NDJSON body is consumed line by line, so the
+        full response is never buffered. Streams are not retried because
+        chunks may already have been forwarded to the client.
+        
+        Args:
+            prompt: The complete prompt to send
+            temperature: Sampling temperature
+            stats: Optional dictionary filled with the generation statistics
+                from Ollama's final line
+            
+        Yields:
+            Response text chunks
+            
+        Raises:
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            RuntimeError: If the request fails
+        """
+        self.breaker.before_call()
+        queued = time.perf_counter()
+        try:
+            node = await self.pool.acquire()
+        except NoAvailableNodeError:
+            self.breaker.record_failure()
+            raise RuntimeError("Ollama server is not responding to health check")
+        started = time.perf_counter()
+        GENERATION_STAGE_SECONDS.labels("ollama_queue_wait").observe(started - queued)
+        
+        logger.info(f"Sending streaming request to {node.url}/api/generate")
+        
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{node.url}/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": prompt,
+                    "stream": True,
+                    "keep_alive": self.keep_alive,
+                    "options": {
+                        "temperature": temperature,
+                        "num_predict": 2048
+                    }
+                }
+            ) as response:
+                response.raise_for_status()
+                self.pool.record_success(node)
+                self.breaker.record_success()
                 
-                try:
-                    response = await client.post(
-                        f"{self.base_url}/api/generate",
-                        json={
-                            "model": self.model,
-                            "prompt": prompt,
-                            "stream": False,
-                            "options": {
-                                "temperature": temperature,
-                                "num_predict": 2048
-                            }
-                        }
-                    )
-                    
-                    logger.info(f"Received response with status: {response.status_code}")
-                    response.raise_for_status()
-                    response_text = response.text
-                    
-                    # Add response size logging
-                    logger.info(f"Response size: {len(response_text)} characters")
-                    
-                    try:
-                        response_lines = response_text.strip().split('\n')
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    parsed = json.loads(line)
+                    if "error" in parsed:
+                        raise RuntimeError(f"Ollama returned an error: {parsed['error']}")
+                    if parsed.get("response"):
+                        yield parsed["response"]
+                    if parsed.get("done"):
+                        GENERATION_STAGE_SECONDS.labels("generation").observe(time.perf_counter() - started)
+                        if stats is not None:
+                            stats.update(self._record_stats(parsed))
+                        break
                         
-                        for line in response_lines:
-                            if line.strip():
-                                try:
-                                    parsed = json.loads(line)
-                                    if 'response' in parsed:
-                                        return parsed['response']
-                                except json.JSONDecodeError:
-                                    continue
-                        
-                        return response.json()["response"]
-                        
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Failed to parse response. Text: {response_text[:200]}...")
-                        raise RuntimeError(f"Failed to parse Ollama response: {str(e)}")
-                    
-                except httpx.ReadTimeout as e:
-                    logger.error("Request timed out with detailed timeout settings:")
-                    logger.error(f"Connect timeout: {timeout.connect}")
-                    logger.error(f"Read timeout: {timeout.read}")
-                    logger.error(f"Write timeout: {timeout.write}")
-                    raise RuntimeError("Request timed out. The Ollama server took too long to respond.")
-                    
-        except Exception as e:
-            logger.error(f"Unexpected error in make_request: {type(e).__name__}: {str(e)}")
-            raise
+        except httpx.HTTPError as e:
+            if is_transient(e):
+                await self.pool.record_failure(node, f"{type(e).__name__}: {str(e)}")
+            if is_outage(e):
+                self.breaker.record_failure()
+            raise self._describe_error(e) from e
+        finally:
+            await self.pool.release(node)
 
-        async def check_server_health(self) -> bool:
-            """
-            Verifies that the Ollama server is accessible and responding.
+    async def embed(self, text: str) -> List[float]:
+        """
+        Computes an embedding vector for a text.
+        
+        Args:
+            text: Text to embed
             
-            Returns:
-                True if server is healthy, False otherwise
-            """
-            try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(f"{self.base_url}/api/tags")
-                    return response.status_code == 200
-            except Exception as e:
-                logger.error(f"Health check failed: {str(e)}")
-                return False
+        Returns:
+            The embedding as a list of floats
+            
+        Raises:
+            RuntimeError: If the embedding request fails
+        """
+        if self.embedding_model == "local":
+            return hash_embedding(text)
+        
+        try:
+            # Embeddings are short and use their own model, so they go to the
+            # least loaded node without taking a generation slot
+            node = self.pool.least_loaded()
+            response = await self.client.post(
+                f"{node.url}/api/embeddings",
+                json={"model": self.embedding_model, "prompt": text, "keep_alive": self.keep_alive},
+                timeout=60.0
+            )
+            response.raise_for_status()
+            return response.json()["embedding"]
+        except Exception as e:
+            logger.error(f"Error computing embedding: {str(e)}")
+            raise RuntimeError(f"Error computing embedding: {str(e)}")
+
+    async def check_server_health(self) -> bool:
+        """
+        Reports whether at least one Ollama node is accessible and responding.
+        Uses the cached state maintained by the background probers and only
+        probes the nodes directly if none has ever been checked.
+        
+        Returns:
+            True if server is healthy, False otherwise
+        """
+        if self.pool.is_healthy() is None:
+            return await self._probe_health()
+        return self.pool.has_available()
 
-    # Add this method to your OllamaService class in ollama_service.py
     async def check_model_availability(self) -> bool:
         """
-        Verifies that the configured model is available on the Ollama server.
-        This method is used during application startup to ensure the model is ready.
+        Verifies that the configured model is installed on at least one
+        Ollama node. This method is used during application startup to
+        ensure the model is ready.
         
         Returns:
             bool: True if the model is available, False otherwise
         """
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                if response.status_code == 200:
-                    # Log available models for debugging
-                    logger.info(f"Successfully connected to Ollama server and checked model availability")
-                    return True
-                return False
-        except Exception as e:
-            logger.error(f"Error checking model availability: {str(e)}")
-            return False
+        available = False
+        for node in self.pool.nodes:
+            try:
+                response = await self.client.get(f"{node.url}/api/tags")
+                response.raise_for_status()
+                names = {model.get("name") for model in response.json().get("models", [])}
+                if self._model_installed(names):
+                    logger.info(f"Model {self.model} is available on Ollama node {node.url}")
+                    available = True
+                else:
+                    logger.warning(
+                        f"Model {self.model} is not installed on {node.url}; "
+                        f"installed models: {', '.join(sorted(filter(None, names))) or 'none'}"
+                    )
+            except Exception as e:
+                logger.error(f"Error checking model availability on {node.url}: {str(e)}")
+        return available
+
+    def _model_installed(self, names: Set[str]) -> bool:
+        """Matches the configured model against /api/tags names; no tag means :latest."""
+        model = self.model if ":" in self.model else f"{self.model}:latest"
+        return self.model in names or model in names
     
     async def test_connection(self) -> Dict[str, Any]:
         """
@@ -302,16 +1425,15 @@ class OllamaService:
             Dictionary containing connection test results and server information
         """
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                response.raise_for_status()
-                
-                return {
-                    "status": "success",
-                    "url": self.base_url,
-                    "response_code": response.status_code,
-                    "server_response": response.json()
-                }
+            response = await self.client.get(f"{self.base_url}/api/tags", timeout=5.0)
+            response.raise_for_status()
+            
+            return {
+                "status": "success",
+                "url": self.base_url,
+                "response_code": response.status_code,
+                "server_response": response.json()
+            }
         except Exception as e:
             return {
                 "status": "error",
@@ -0,0 +1,265 @@
+# backend/app/services/precompute.py
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+from ..metrics import PRECOMPUTE_GENERATIONS
+from ..sections import SECTION_KEYS
+from .admission import AdmissionController
+from .job_queue import JobQueue
+from .ollama_service import OllamaService
+from .resilience import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+async def popular_requests(
+    db: AsyncSession,
+    since: datetime,
+    limit: int,
+    min_requests: int = 1,
+    default_mode: str = "single"
+) -> List[Dict[str, Any]]:
+    """
+    Mines note history for the most requested (topic, level, learning
+    style) combinations.
+
+    Every generated note records the request that produced it, and its
+    metadata records the generation mode, which decides the cache entries
+    that serve the request. Topics are grouped like generation cache keys,
+    ignoring case and whitespace, and each group keeps its most common
+    spelling.
+
+    Args:
+        db: Active async database session
+        since: Only count notes created from this time on
+        limit: Maximum number of combinations
+        min_requests: Leave out combinations requested fewer times
+        default_mode: Generation mode of notes whose metadata has none
+
+    Returns:
+        Dictionaries with topic, level, learning_style, generation_mode and
+        requests, most requested first
+    """
+    mode = models.Note.note_metadata["generation_mode"].as_string()
+    requests = func.count(models.Note.id)
+    result = await db.execute(
+        select(
+            models.Note.topic,
+            models.Note.level,
+            models.Note.learning_style,
+            mode.label("generation_mode"),
+            requests.label("requests")
+        )
+        .where(models.Note.created_at >= since)
+        .group_by(models.Note.topic, models.Note.level, models.Note.learning_style, mode)
+        .order_by(requests.desc())
+        # Spellings of one topic are merged below, so read past the limit
+        .limit(limit * 10)
+    )
+
+    groups: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {}
+    for row in result.all():
+        generation_mode = row.generation_mode or default_mode
+        key = (" ".join(row.topic.lower().split()), row.level, row.learning_style, generation_mode)
+        group = groups.get(key)
+        if group is None:
+            # Rows come most requested first, so the first spelling is the most common
+            group = groups[key] = {
+                "topic": row.topic,
+                "level": row.level,
+                "learning_style": row.learning_style,
+                "generation_mode": generation_mode,
+                "requests": 0
+            }
+        group["requests"] += row.requests
+
+    ranked = sorted(
+        (group for group in groups.values() if group["requests"] >= min_requests),
+        key=lambda group: group["requests"],
+        reverse=True
+    )
+    return ranked[:limit]
+
+
+class PrecomputeScheduler:
+    """
+    Fills the generation cache with popular notes while Ollama is idle.
+
+    Every interval seconds the scheduler checks that generation is idle:
+    no request has held or awaited a generation slot for idle_seconds, the
+    job queue is empty, nothing is generating, and Ollama is healthy with
+    its circuit closed. If so, it ranks the (topic, level, learning style)
+    combinations requested most over the last history_days and generates,
+    one Ollama call at a time, the cache entries of those that are missing
+    or older than refresh_after. Requests for them during busy hours are
+    then cache hits.
+
+    Real traffic always wins: a request asking for a generation slot
+    cancels the precomputation in flight at once, which aborts its Ollama
+    call, and the pass stops until generation is idle again.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        ollama_service: OllamaService,
+        admission: AdmissionController,
+        job_queue: JobQueue
+    ):
+        """
+        Initialize the scheduler with limits from environment variables.
+
+        Args:
+            session_factory: Callable returning a new async session
+            ollama_service: Service whose generation cache is filled
+            admission: Admission controller of the generation endpoints,
+                whose slot requests preempt precomputation
+            job_queue: Queue of background generation jobs
+        """
+        self.session_factory = session_factory
+        self.ollama_service = ollama_service
+        self.admission = admission
+        self.job_queue = job_queue
+
+        self.enabled = os.getenv("PRECOMPUTE_ENABLED", "false").lower() == "true"
+        self.interval = float(os.getenv("PRECOMPUTE_INTERVAL", "60"))
+        self.idle_seconds = float(os.getenv("PRECOMPUTE_IDLE_SECONDS", "300"))
+        self.history = timedelta(days=float(os.getenv("PRECOMPUTE_HISTORY_DAYS", "30")))
+        self.top_n = int(os.getenv("PRECOMPUTE_TOP_N", "50"))
+        self.min_requests = int(os.getenv("PRECOMPUTE_MIN_REQUESTS", "2"))
+        # Refreshed a day before the default GENERATION_CACHE_DURABLE_TTL
+        self.refresh_after = float(os.getenv("PRECOMPUTE_REFRESH_AFTER", str(6 * 24 * 3600)))
+
+        self.totals = {"generated": 0, "preempted": 0, "failed": 0}
+        self.last_pass: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._current: Optional[asyncio.Task] = None
+
+        admission.add_demand_listener(self.preempt)
+
+    async def start(self) -> None:
+        """Starts the scheduling loop if PRECOMPUTE_ENABLED is set."""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info(
+            f"Started precomputation of the top {self.top_n} requests after "
+            f"{self.idle_seconds:.0f}s of idle generation"
+        )
+
+    async def close(self) -> None:
+        """Stops the loop, aborting any precomputation in flight."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def is_idle(self) -> bool:
+        """True if precomputation may use Ollama now."""
+        return (
+            self.admission.idle_for() >= self.idle_seconds
+            and self.job_queue.is_empty()
+            and self.ollama_service.generations.in_flight() == 0
+            and self.ollama_service.pool.is_healthy() is True
+            and self.ollama_service.breaker.state == CircuitBreaker.CLOSED
+        )
+
+    def preempt(self) -> None:
+        """Cancels the precomputation in flight, if any, so a request can have Ollama."""
+        if self._current is not None and not self._current.done():
+            self._current.cancel()
+            logger.info("Preempted precomputation for an incoming generation request")
+
+    async def _loop(self) -> None:
+        """Runs a pass whenever generation is found idle, until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.is_idle():
+                continue
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Precomputation pass failed: {str(e)}")
+
+    async def run_once(self) -> Dict[str, int]:
+        """
+        Runs one precomputation pass over the most requested combinations.
+        The pass stops as soon as generation is no longer idle.
+
+        Returns:
+            Numbers of cache entries generated, preempted, failed and found
+            still fresh during the pass
+        """
+        async with self.session_factory() as db:
+            candidates = await popular_requests(
+                db,
+                since=datetime.now(timezone.utc) - self.history,
+                limit=self.top_n,
+                min_requests=self.min_requests,
+                default_mode=self.ollama_service.generation_mode
+            )
+        self.last_pass = datetime.now(timezone.utc)
+
+        counts = {"generated": 0, "preempted": 0, "failed": 0, "fresh": 0}
+        for candidate in candidates:
+            # A sectioned note is served from one cache entry per section
+            sections = SECTION_KEYS if candidate["generation_mode"] == "sections" else (None,)
+            for section in sections:
+                key = self.ollama_service.cache_key(
+                    candidate["topic"], candidate["level"], candidate["learning_style"], section
+                )
+                age = await self.ollama_service.cache.age(key)
+                if age is not None and age < self.refresh_after:
+                    counts["fresh"] += 1
+                    continue
+                if not self.is_idle():
+                    return counts
+
+                outcome = await self._generate(candidate, section)
+                counts[outcome] += 1
+                if outcome == "preempted":
+                    return counts
+
+        if counts["generated"]:
+            logger.info(f"Precomputed {counts['generated']} generation cache entries")
+        return counts
+
+    async def _generate(self, candidate: Dict[str, Any], section: Optional[str]) -> str:
+        """Precomputes one cache entry as a task preempt() can cancel, returning its outcome."""
+        task = self._current = asyncio.ensure_future(self.ollama_service.precompute(
+            candidate["topic"], candidate["level"], candidate["learning_style"], section
+        ))
+        try:
+            await asyncio.wait([task])
+        finally:
+            self._current = None
+            # Shutdown cancels the pass while it waits
+            if not task.done():
+                task.cancel()
+
+        if task.cancelled():
+            outcome = "preempted"
+        elif task.exception() is not None:
+            logger.error(f"Precomputing {candidate['topic']} failed: {str(task.exception())}")
+            outcome = "failed"
+        else:
+            outcome = "generated"
+        self.totals[outcome] += 1
+        PRECOMPUTE_GENERATIONS.labels(outcome).inc()
+        return outcome
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns scheduler state for /health."""
+        return {
+            "enabled": self.enabled,
+            "running": self._current is not None,
+            **self.totals,
+            "last_pass": self.last_pass.isoformat() if self.last_pass else None
+        }
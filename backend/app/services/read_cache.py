@@ -0,0 +1,103 @@
+# backend/app/services/read_cache.py
+
+import os
+import gzip
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+from .cache_service import TTLCache
+
+class CachedNote:
+    """
+    A serialized note response together with its validators.
+
+    The gzip encoding is computed on first use and kept, so repeat reads
+    skip compression as well as the database and serialization.
+    """
+
+    __slots__ = ("body", "etag", "last_modified", "_gzipped")
+
+    def __init__(self, body: bytes, modified_at: Optional[datetime]):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        if modified_at is not None and modified_at.tzinfo is None:
+            # SQLite hands back naive datetimes; they are stored as UTC
+            modified_at = modified_at.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second precision
+        self.last_modified = modified_at.replace(microsecond=0) if modified_at else None
+        self._gzipped: Optional[bytes] = None
+
+    @property
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._gzipped
+
+    def headers(self) -> Dict[str, str]:
+        """Returns the ETag and Last-Modified response headers."""
+        headers = {"ETag": self.etag}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def is_not_modified(self, request_headers: Mapping[str, str]) -> bool:
+        """
+        Evaluates If-None-Match and If-Modified-Since. As in RFC 9110,
+        If-Modified-Since is ignored when If-None-Match is present.
+        """
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            # Weak comparison: W/ prefixes are ignored
+            return "*" in tags or self.etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since and self.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return since.tzinfo is not None and self.last_modified <= since
+        return False
+
+
+class NoteReadCache:
+    """
+    Bounded LRU of serialized GET /notes/{id} responses, keyed by note id.
+
+    Writers must call invalidate() whenever a note changes or is deleted.
+    """
+
+    def __init__(self):
+        """Initialize the cache with limits from environment variables."""
+        self.entries = TTLCache(
+            max_size=int(os.getenv("NOTE_READ_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("NOTE_READ_CACHE_TTL", "3600"))
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, note_id: int) -> Optional[CachedNote]:
+        """Returns the cached response for a note, if any."""
+        entry = self.entries.get(str(note_id))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, note_id: int, body: bytes, modified_at: Optional[datetime]) -> CachedNote:
+        """Caches a serialized note response and returns the entry."""
+        entry = CachedNote(body, modified_at)
+        self.entries.set(str(note_id), entry)
+        return entry
+
+    def invalidate(self, note_id: int) -> None:
+        """Drops the cached response for a note."""
+        self.entries.invalidate(str(note_id))
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit and miss counters for /health."""
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,179 @@
+# backend/app/services/resilience.py
+
+import time
+import random
+import logging
+from typing import Any, Dict, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses that signal an overloaded or restarting server rather than
+# a bad request
+TRANSIENT_STATUS_CODES = {429, 502, 503, 504}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Ollama while the circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Ollama is unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(RuntimeError):
+    """Raised when a request runs out of time before it could succeed."""
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Reports whether a failed Ollama call is worth retrying.
+
+    Connection failures, timeouts and overload statuses are transient;
+    anything else (bad requests, unknown models, malformed responses) would
+    fail the same way again.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in TRANSIENT_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, httpx.TimeoutException))
+
+
+def is_outage(error: BaseException) -> bool:
+    """
+    Reports whether a failed Ollama call counts against the circuit breaker.
+
+    Only calls that reached Ollama and failed at the transport level, timed
+    out or got a 5xx status count; rejected requests and local queueing say
+    nothing about Ollama's health.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, (httpx.TransportError, httpx.TimeoutException))
+
+
+def full_jitter_backoff(attempt: int, base: float, cap: float) -> float:
+    """
+    Returns a delay drawn uniformly from [0, min(cap, base * 2 ** attempt)].
+    Randomizing the whole interval keeps retries from many clients from
+    arriving in synchronized waves.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class Deadline:
+    """End-to-end time budget for one request, shared by all its attempts."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, timeout: httpx.Timeout) -> httpx.Timeout:
+        """Caps each phase of an httpx timeout at the remaining budget."""
+        remaining = self.remaining()
+        return httpx.Timeout(
+            connect=min(timeout.connect, remaining),
+            read=min(timeout.read, remaining),
+            write=min(timeout.write, remaining),
+            pool=min(timeout.pool, remaining)
+        )
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker.
+
+    While closed, calls pass through and consecutive failures are counted.
+    After failure_threshold failures the circuit opens and calls fail fast
+    for recovery_timeout seconds. The circuit then turns half-open and lets
+    a single trial call through: success closes it, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            recovery_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the timeout passes."""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_started_at = None
+            logger.info("Circuit breaker half-open, allowing a trial call")
+        return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit will allow another call."""
+        if self.state == self.OPEN:
+            return max(self.recovery_timeout - (time.monotonic() - self._opened_at), 1.0)
+        return self.recovery_timeout
+
+    def before_call(self) -> None:
+        """
+        Admits a call or rejects it.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with the
+                trial call still running
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN:
+            now = time.monotonic()
+            # A trial that never reported back (e.g. a cancelled request) does
+            # not keep the circuit half-open forever
+            if self._trial_started_at is None or now - self._trial_started_at >= self.recovery_timeout:
+                self._trial_started_at = now
+                return
+        raise CircuitOpenError(self.retry_after())
+
+    def record_success(self) -> None:
+        """Closes the circuit after a successful call."""
+        if self._state != self.CLOSED:
+            logger.info("Circuit breaker closed")
+        self._state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_started_at = None
+
+    def record_failure(self) -> None:
+        """Counts a failed call, opening the circuit at the threshold."""
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                logger.warning(
+                    f"Circuit breaker opened after {self.consecutive_failures} consecutive failures"
+                )
+                self.times_opened += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_started_at = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the breaker state reported by /health."""
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "retry_after": round(self.retry_after(), 1) if state == self.OPEN else None
+        }
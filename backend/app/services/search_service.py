@@ -0,0 +1,185 @@
+# backend/app/services/search_service.py
+
+import re
+import html
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..compression import decompress_text
+
+logger = logging.getLogger(__name__)
+
+# Markers wrapped around matched terms in result snippets
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+
+# Note content is model-generated markdown that may contain HTML, so the
+# database highlights matches with control characters instead; snippets are
+# escaped before these are swapped for the markers above
+_MATCH_START = "\x02"
+_MATCH_STOP = "\x03"
+
+class SearchNotSupportedError(RuntimeError):
+    """Raised when the database backend has no full-text index."""
+
+
+async def search_notes(
+    db: AsyncSession,
+    query: str,
+    level: Optional[str] = None,
+    learning_style: Optional[str] = None,
+    limit: int = 10,
+    offset: int = 0
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Runs a ranked full-text search over note titles, topics and content.
+    
+    Postgres uses the GIN-indexed search_vector column, SQLite the notes_fts
+    FTS5 table. Both are created by upgrade_schema and written by
+    write_search_index as notes are saved.
+    
+    Args:
+        db: Active async database session
+        query: Free-text search query
+        level: Optional proficiency level filter
+        learning_style: Optional learning style filter
+        limit: Maximum number of results
+        offset: Number of results to skip
+        
+    Returns:
+        Tuple of (results with score and highlighted snippet, whether more
+        results exist)
+        
+    Raises:
+        SearchNotSupportedError: If the database backend is not supported
+    """
+    dialect = db.bind.dialect.name
+    params = {"level": level, "learning_style": learning_style,
+              "limit": limit + 1, "offset": offset}
+    
+    if dialect == "postgresql":
+        params["query"] = query
+        statement = _POSTGRES_SEARCH
+    elif dialect == "sqlite":
+        match = _fts5_match_expression(query)
+        if not match:
+            return [], False
+        params.update(query=match, match_start=_MATCH_START, match_stop=_MATCH_STOP)
+        statement = _SQLITE_SEARCH
+    else:
+        raise SearchNotSupportedError(f"Full-text search is not available on {dialect}")
+    
+    result = await db.execute(statement, params)
+    rows = result.mappings().all()
+    page = rows[:limit]
+    
+    if dialect == "postgresql":
+        snippets = await _postgres_snippets(db, query, page)
+    else:
+        snippets = [row["snippet"] for row in page]
+    
+    results = [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "topic": row["topic"],
+            "level": row["level"],
+            "learning_style": row["learning_style"],
+            "created_at": _isoformat(row["created_at"]),
+            "score": round(float(row["score"]), 6),
+            "snippet": _highlight(snippet)
+        }
+        for row, snippet in zip(page, snippets)
+    ]
+    return results, len(rows) > limit
+
+async def _postgres_snippets(db: AsyncSession, query: str, rows) -> List[str]:
+    """
+    Highlights matches in the content of one result page. Content is stored
+    compressed, so it is decompressed here and sent back to ts_headline in a
+    single round trip.
+    """
+    if not rows:
+        return []
+    contents = [
+        decompress_text(row["content_compressed"]) if row["content_compressed"] is not None
+        else row["legacy_content"]
+        for row in rows
+    ]
+    options = (
+        f"MaxFragments=2, MaxWords=30, MinWords=10, "
+        f"StartSel={_MATCH_START}, StopSel={_MATCH_STOP}"
+    )
+    result = await db.execute(
+        _POSTGRES_HEADLINES, {"query": query, "contents": contents, "options": options}
+    )
+    return list(result.scalars().all())
+
+def _highlight(snippet: Optional[str]) -> Optional[str]:
+    """
+    Escapes a snippet for HTML and only then turns the database's match
+    delimiters into highlight markers, so note text cannot inject markup.
+    """
+    if snippet is None:
+        return None
+    return (
+        html.escape(snippet)
+        .replace(_MATCH_START, HIGHLIGHT_START)
+        .replace(_MATCH_STOP, HIGHLIGHT_STOP)
+    )
+
+def _fts5_match_expression(query: str) -> str:
+    """
+    Turns free text into a safe FTS5 MATCH expression: every word becomes a
+    quoted term and all terms must match.
+    """
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"' for term in terms)
+
+def _isoformat(value) -> Optional[str]:
+    """Formats datetimes; SQLite may already return strings for raw queries."""
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+# The inner query ranks and pages using only the index and search_vector;
+# snippets are then computed for the returned page only
+_POSTGRES_SEARCH = text("""
+    SELECT n.id, n.title, n.topic, n.level, n.learning_style, n.created_at,
+           ranked.score, n.content AS legacy_content, n.content_compressed
+    FROM (
+        SELECT notes.id, ts_rank_cd(notes.search_vector, q) AS score
+        FROM notes, websearch_to_tsquery('english', :query) AS q
+        WHERE notes.search_vector @@ q
+          AND (CAST(:level AS TEXT) IS NULL OR notes.level = :level)
+          AND (CAST(:learning_style AS TEXT) IS NULL OR notes.learning_style = :learning_style)
+        ORDER BY score DESC, notes.id DESC
+        LIMIT :limit OFFSET :offset
+    ) AS ranked
+    JOIN notes n ON n.id = ranked.id
+    ORDER BY ranked.score DESC, n.id DESC
+""")
+
+_POSTGRES_HEADLINES = text("""
+    SELECT ts_headline('english', page.content, websearch_to_tsquery('english', :query),
+                       :options)
+    FROM unnest(CAST(:contents AS TEXT[])) WITH ORDINALITY AS page(content, position)
+    ORDER BY page.position
+""")
+
+# bm25() returns lower values for better matches, so the score is negated;
+# title and topic matches weigh more than content matches
+_SQLITE_SEARCH = text("""
+    SELECT n.id, n.title, n.topic, n.level, n.learning_style, n.created_at,
+           -bm25(notes_fts, 10.0, 5.0, 1.0) AS score,
+           snippet(notes_fts, 2, :match_start, :match_stop, '...', 24) AS snippet
+    FROM notes_fts
+    JOIN notes n ON n.id = notes_fts.rowid
+    WHERE notes_fts MATCH :query
+      AND (:level IS NULL OR n.level = :level)
+      AND (:learning_style IS NULL OR n.learning_style = :learning_style)
+    ORDER BY bm25(notes_fts, 10.0, 5.0, 1.0), n.id DESC
+    LIMIT :limit OFFSET :offset
+""")
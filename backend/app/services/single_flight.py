@@ -0,0 +1,59 @@
+# backend/app/services/single_flight.py
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+    
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task. Every caller awaits through
+    asyncio.shield, so cancelling one waiter never cancels the shared work,
+    and an exception raised by the work propagates to all waiters.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Runs fn once per key among concurrent callers.
+        
+        Args:
+            key: Identifies calls that may share one execution
+            fn: Zero-argument coroutine function performing the work
+            
+        Returns:
+            Tuple of (result, shared) where shared is True if this caller
+            joined an execution started by another caller
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        
+        if shared:
+            self.coalesced += 1
+            logger.info(f"Joining in-flight call for key {key[:12]}")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        
+        return await asyncio.shield(task), shared
+
+    def in_flight(self) -> int:
+        """Returns the number of executions currently running."""
+        return len(self._calls)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        """Drops a finished execution so later calls start fresh work."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
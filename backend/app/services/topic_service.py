@@ -0,0 +1,135 @@
+# backend/app/services/topic_service.py
+
+import os
+import logging
+from typing import List, Optional, Tuple
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+from ..topics import canonical_topic, trigram_similarity
+
+logger = logging.getLogger(__name__)
+
+# Minimum trigram similarity between canonical topics for a note to count
+# as covering a requested topic
+TOPIC_REUSE_THRESHOLD = float(os.getenv("TOPIC_REUSE_THRESHOLD", "0.8"))
+
+# Most notes scored in Python when pg_trgm is not available
+MAX_CANDIDATES = int(os.getenv("TOPIC_MATCH_MAX_CANDIDATES", "2000"))
+
+# Whether the database has pg_trgm, looked up once per process
+_pg_trgm: Optional[bool] = None
+
+async def find_topic_matches(
+    db: AsyncSession,
+    topic: str,
+    level: Optional[str] = None,
+    learning_style: Optional[str] = None,
+    threshold: float = TOPIC_REUSE_THRESHOLD,
+    limit: int = 5
+) -> List[Tuple[int, float]]:
+    """
+    Finds notes whose canonical topic equals or closely resembles that of
+    topic.
+
+    Exact canonical matches come from the B-tree index on canonical_topic
+    and score 1.0. Otherwise topics are compared by trigram similarity:
+    on Postgres with pg_trgm through the trigram index, elsewhere in Python
+    over the notes sharing a word prefix with the topic.
+
+    Args:
+        db: Active async database session
+        topic: Topic as requested
+        level: Only match notes for this level
+        learning_style: Only match notes for this learning style
+        threshold: Minimum similarity, between 0 and 1
+        limit: Maximum number of matches
+
+    Returns:
+        (note id, similarity) pairs, best first, newest first among equals
+    """
+    canonical = canonical_topic(topic)
+    if not canonical:
+        return []
+
+    filters = []
+    if level:
+        filters.append(models.Note.level == level)
+    if learning_style:
+        filters.append(models.Note.learning_style == learning_style)
+
+    exact = await db.execute(
+        select(models.Note.id)
+        .where(models.Note.canonical_topic == canonical, *filters)
+        .order_by(models.Note.created_at.desc(), models.Note.id.desc())
+        .limit(limit)
+    )
+    matches = [(note_id, 1.0) for note_id in exact.scalars().all()]
+    if matches or threshold > 1.0:
+        return matches
+
+    if await _has_pg_trgm(db):
+        return await _trigram_matches_postgres(db, canonical, filters, threshold, limit)
+    return await _trigram_matches_python(db, canonical, filters, threshold, limit)
+
+async def _has_pg_trgm(db: AsyncSession) -> bool:
+    global _pg_trgm
+    if db.bind.dialect.name != "postgresql":
+        return False
+    if _pg_trgm is None:
+        _pg_trgm = bool(await db.scalar(text(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+        )))
+    return _pg_trgm
+
+async def _trigram_matches_postgres(
+    db: AsyncSession,
+    canonical: str,
+    filters: list,
+    threshold: float,
+    limit: int
+) -> List[Tuple[int, float]]:
+    """Uses the GIN trigram index through the % operator."""
+    # % compares against this setting; SET LOCAL ends with the transaction
+    await db.execute(text(f"SET LOCAL pg_trgm.similarity_threshold = {float(threshold)}"))
+    similarity = func.similarity(models.Note.canonical_topic, canonical)
+    result = await db.execute(
+        select(models.Note.id, similarity.label("similarity"))
+        .where(models.Note.canonical_topic.op("%")(canonical), *filters)
+        .order_by(similarity.desc(), models.Note.created_at.desc())
+        .limit(limit)
+    )
+    return [(row.id, round(float(row.similarity), 4)) for row in result.all()]
+
+async def _trigram_matches_python(
+    db: AsyncSession,
+    canonical: str,
+    filters: list,
+    threshold: float,
+    limit: int
+) -> List[Tuple[int, float]]:
+    """
+    Scores candidate notes with the pure-Python trigram similarity.
+    Candidates must share the first three letters of a word with the
+    topic, which any close match does, and are capped at MAX_CANDIDATES.
+    """
+    prefixes = {word[:3] for word in canonical.split()}
+    result = await db.execute(
+        select(models.Note.id, models.Note.canonical_topic)
+        .where(
+            or_(*[models.Note.canonical_topic.like(f"%{prefix}%") for prefix in prefixes]),
+            *filters
+        )
+        .order_by(models.Note.created_at.desc(), models.Note.id.desc())
+        .limit(MAX_CANDIDATES)
+    )
+
+    scored = []
+    for row in result.all():
+        similarity = trigram_similarity(canonical, row.canonical_topic)
+        if similarity >= threshold:
+            scored.append((row.id, round(similarity, 4)))
+    # Stable sort keeps newer notes first among equal scores
+    scored.sort(key=lambda match: match[1], reverse=True)
+    return scored[:limit]
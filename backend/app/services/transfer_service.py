@@ -0,0 +1,461 @@
+# backend/app/services/transfer_service.py
+"""
+Bulk export and import of notes as newline-delimited JSON.
+
+Exports read the table through a server-side cursor in id order, so memory
+use stays flat however many notes there are, and interleave progress
+records with the notes. Imports parse the request body as it arrives and
+write it in batches, each committed on its own; on Postgres every batch is
+staged with COPY and inserted with a single INSERT ... SELECT that also
+computes the search vector.
+
+Notes keep their ids by default and notes that already exist are skipped,
+so an interrupted import can simply be sent again, or resumed from the
+last committed id with after_id.
+"""
+
+import os
+import json
+import time
+import zlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, select, func, text
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models
+from ..compression import compress_text, decompress_text
+from ..metrics import NOTE_TRANSFER_RECORDS
+from ..schema import POSTGRES_SEARCH_VECTOR, write_search_index
+from ..sections import parse_sections
+from ..topics import canonical_topic
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+# At most this many invalid lines are reported back in detail
+MAX_REPORTED_ERRORS = 20
+
+# Columns read by exports; content is decompressed per row
+EXPORT_COLUMNS = (
+    models.Note.id,
+    models.Note.title,
+    models.Note.topic,
+    models.Note.legacy_content,
+    models.Note.content_compressed,
+    models.Note.level,
+    models.Note.learning_style,
+    models.Note.note_metadata,
+    models.Note.created_at,
+    models.Note.updated_at,
+)
+
+REQUIRED_FIELDS = ("title", "topic", "content", "level", "learning_style")
+
+# Postgres: each batch is copied into a temporary table that disappears
+# with the transaction, then moved into notes in one statement
+POSTGRES_STAGING_DDL = """
+    CREATE TEMP TABLE notes_import (
+        position integer,
+        id integer,
+        title text,
+        topic text,
+        canonical_topic text,
+        content text,
+        content_compressed bytea,
+        section_offsets text,
+        level text,
+        learning_style text,
+        note_metadata text,
+        created_at timestamptz,
+        updated_at timestamptz
+    ) ON COMMIT DROP
+"""
+
+POSTGRES_STAGING_COLUMNS = (
+    "position", "id", "title", "topic", "canonical_topic", "content", "content_compressed",
+    "section_offsets", "level", "learning_style", "note_metadata", "created_at", "updated_at"
+)
+
+POSTGRES_INSERT_STAGED = (
+    """
+    INSERT INTO notes (id, title, topic, canonical_topic, content, content_compressed,
+                       section_offsets, level, learning_style, note_metadata, created_at,
+                       updated_at, search_vector)
+    SELECT COALESCE(id, nextval(pg_get_serial_sequence('notes', 'id'))), title, topic,
+           canonical_topic, '', content_compressed, section_offsets::json, level,
+           learning_style, note_metadata::json, created_at, updated_at,
+    """
+    + POSTGRES_SEARCH_VECTOR.format(title="title", topic="topic", content="content")
+    + """
+    FROM notes_import ORDER BY position
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id
+    """
+)
+
+# Explicit ids bypass the sequence, which must then be moved past them
+POSTGRES_ADVANCE_SEQUENCE = """
+    SELECT setval(pg_get_serial_sequence('notes', 'id'),
+                  GREATEST((SELECT max(id) FROM notes), 1))
+"""
+
+class InvalidRecordError(ValueError):
+    """Raised when an imported line is not a valid note record."""
+
+
+def export_record(row) -> Dict[str, Any]:
+    """Converts a row selected with EXPORT_COLUMNS to a note record."""
+    if row.content_compressed is not None:
+        content = decompress_text(row.content_compressed)
+    else:
+        content = row.legacy_content
+    return {
+        "type": "note",
+        "id": row.id,
+        "title": row.title,
+        "topic": row.topic,
+        "content": content,
+        "level": row.level,
+        "learning_style": row.learning_style,
+        "metadata": row.note_metadata or {},
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None
+    }
+
+async def export_notes(
+    db: AsyncSession,
+    after_id: int = 0,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yields every note with an id above after_id, in id order.
+
+    Rows are fetched batch_size at a time from a server-side cursor. A
+    "progress" record follows each batch and an "end" record closes the
+    export; its last_id can be passed as after_id to resume a broken
+    download.
+
+    Args:
+        db: Async session owned by the caller for the whole export
+        after_id: Only export notes with a greater id
+        batch_size: Rows fetched per round trip
+
+    Yields:
+        "note", "progress" and "end" records
+    """
+    total = await db.scalar(
+        select(func.count()).select_from(models.Note).where(models.Note.id > after_id)
+    )
+    result = await db.stream(
+        select(*EXPORT_COLUMNS)
+        .where(models.Note.id > after_id)
+        .order_by(models.Note.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    exported = 0
+    last_id = after_id
+    async for partition in result.partitions():
+        for row in partition:
+            yield export_record(row)
+            last_id = row.id
+        exported += len(partition)
+        NOTE_TRANSFER_RECORDS.labels("export").inc(len(partition))
+        yield {"type": "progress", "exported": exported, "total": total, "last_id": last_id}
+
+    logger.info(f"Exported {exported} notes after id {after_id}")
+    yield {"type": "end", "exported": exported, "last_id": last_id}
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """
+    Compresses a byte stream into a single gzip member as it is produced.
+    Each chunk is flushed, so it reaches the client without waiting for the
+    compressor to fill up. Every flush ends a deflate block, so callers pass
+    whole batches of records rather than single records.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+async def read_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Splits a request body into lines as it arrives, decompressing it first
+    when it starts with the gzip magic bytes.
+    """
+    decompressor = None
+    pending = b""
+    first = True
+
+    async for chunk in chunks:
+        if first and chunk:
+            first = False
+            if chunk[:2] == b"\x1f\x8b":
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+
+    if decompressor is not None:
+        pending += decompressor.flush()
+    for line in pending.split(b"\n"):
+        yield line.decode("utf-8")
+
+def _parse_timestamp(value: Any, field: str) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidRecordError(f"{field} is not an ISO 8601 timestamp")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def parse_record(data: Any, keep_ids: bool = True) -> Dict[str, Any]:
+    """
+    Validates an imported note record.
+
+    Args:
+        data: Decoded JSON line, in the format written by export_notes
+        keep_ids: Keep the record's id; otherwise a new one is assigned
+
+    Returns:
+        The column values for the note, with content still uncompressed
+
+    Raises:
+        InvalidRecordError: If a field is missing or has the wrong type
+    """
+    if not isinstance(data, dict):
+        raise InvalidRecordError("record is not a JSON object")
+    missing = [field for field in REQUIRED_FIELDS if not isinstance(data.get(field), str)]
+    if missing:
+        raise InvalidRecordError(f"missing or invalid fields: {', '.join(missing)}")
+
+    note_id = data.get("id") if keep_ids else None
+    if note_id is not None and (not isinstance(note_id, int) or isinstance(note_id, bool) or note_id < 1):
+        raise InvalidRecordError("id must be a positive integer")
+
+    metadata = data.get("metadata")
+    if metadata is not None and not isinstance(metadata, dict):
+        raise InvalidRecordError("metadata must be an object")
+
+    return {
+        "id": note_id,
+        "title": data["title"],
+        "topic": data["topic"],
+        "content": data["content"],
+        "level": data["level"],
+        "learning_style": data["learning_style"],
+        "note_metadata": metadata or None,
+        "created_at": _parse_timestamp(data.get("created_at"), "created_at") or models.utc_now(),
+        "updated_at": _parse_timestamp(data.get("updated_at"), "updated_at")
+    }
+
+async def import_notes(
+    session_factory: Callable[[], AsyncSession],
+    lines: AsyncIterator[str],
+    after_id: int = 0,
+    skip: int = 0,
+    keep_ids: bool = True,
+    batch_size: int = IMPORT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Imports note records from NDJSON lines in committed batches.
+
+    Blank lines and non-note records (e.g. an export's progress records)
+    are ignored. A batch that fails to commit stops the import; everything
+    before it stays committed and the summary says where to resume.
+
+    Args:
+        session_factory: Creates a session for each batch
+        lines: Lines of the body, as produced by read_lines
+        after_id: Skip records whose id is not above this, e.g. the
+            last_id of an earlier, interrupted import
+        skip: Skip this many note records first, for resuming imports of
+            records without ids
+        keep_ids: Keep record ids and skip notes that already exist;
+            otherwise every record becomes a new note
+        batch_size: Records per insert and commit
+
+    Returns:
+        Summary with counts, last_id and records (note records processed
+        by committed batches, for skip), and complete=False with an error
+        if a batch failed
+    """
+    summary: Dict[str, Any] = {
+        "imported": 0,
+        "existing": 0,
+        "skipped": 0,
+        "failed": 0,
+        "records": 0,
+        "last_id": after_id,
+        "complete": True,
+        "errors": []
+    }
+    batch: List[Dict[str, Any]] = []
+    seen = 0
+    started = time.perf_counter()
+
+    async def flush() -> None:
+        last_id = max((record["id"] for record in batch if record["id"] is not None),
+                      default=summary["last_id"])
+        async with session_factory() as db:
+            inserted = await _write_batch(db, batch)
+        summary["imported"] += inserted
+        summary["existing"] += len(batch) - inserted
+        summary["records"] = seen
+        summary["last_id"] = max(summary["last_id"], last_id)
+        NOTE_TRANSFER_RECORDS.labels("import").inc(inserted)
+        logger.info(
+            f"Imported {summary['imported']} notes ({summary['records']} records, "
+            f"last id {summary['last_id']}) in {time.perf_counter() - started:.1f}s"
+        )
+        batch.clear()
+
+    line_number = 0
+    try:
+        async for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                if isinstance(data, dict) and data.get("type", "note") != "note":
+                    continue
+                seen += 1
+                record = parse_record(data, keep_ids=keep_ids)
+            except (ValueError, InvalidRecordError) as e:
+                summary["failed"] += 1
+                if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                    summary["errors"].append({"line": line_number, "error": str(e)})
+                continue
+
+            if seen <= skip or (keep_ids and record["id"] is not None and record["id"] <= after_id):
+                summary["skipped"] += 1
+                continue
+
+            batch.append(record)
+            if len(batch) >= batch_size:
+                await flush()
+
+        if batch:
+            await flush()
+        summary["records"] = seen
+    except Exception as e:
+        logger.error(f"Import stopped after {summary['records']} records: {str(e)}")
+        summary["complete"] = False
+        summary["error"] = str(e)
+
+    return summary
+
+async def _write_batch(db: AsyncSession, records: List[Dict[str, Any]]) -> int:
+    """Inserts one batch of parsed records and commits it; returns the number inserted."""
+    dialect = db.bind.dialect
+    if dialect.name == "postgresql" and dialect.driver == "asyncpg":
+        inserted = await _copy_batch(db, records)
+    else:
+        inserted = await _insert_batch(db, records)
+    await db.commit()
+    return inserted
+
+async def _copy_batch(db: AsyncSession, records: List[Dict[str, Any]]) -> int:
+    """Stages the batch with COPY and moves it into notes with one statement."""
+    await db.execute(text(POSTGRES_STAGING_DDL))
+
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        "notes_import",
+        records=[
+            (
+                position,
+                record["id"],
+                record["title"],
+                record["topic"],
+                canonical_topic(record["topic"]),
+                record["content"],
+                compress_text(record["content"]),
+                json.dumps(parse_sections(record["content"])),
+                record["level"],
+                record["learning_style"],
+                json.dumps(record["note_metadata"]) if record["note_metadata"] is not None else None,
+                record["created_at"],
+                record["updated_at"]
+            )
+            for position, record in enumerate(records)
+        ],
+        columns=POSTGRES_STAGING_COLUMNS
+    )
+
+    result = await db.execute(text(POSTGRES_INSERT_STAGED))
+    inserted = len(result.all())
+    if any(record["id"] is not None for record in records):
+        await db.execute(text(POSTGRES_ADVANCE_SEQUENCE))
+    return inserted
+
+async def _insert_batch(db: AsyncSession, records: List[Dict[str, Any]]) -> int:
+    """
+    Inserts the batch with a multi-row INSERT ... RETURNING and writes the
+    search index for the rows that were actually inserted.
+    """
+    dialect = db.bind.dialect.name
+    inserted: List[Tuple[int, str, str, str]] = []
+
+    # Rows with and without ids are inserted separately, since a NULL id
+    # only draws from the sequence when the column is left out entirely
+    for with_ids in (True, False):
+        group = [record for record in records if (record["id"] is not None) == with_ids]
+        if not group:
+            continue
+        rows = [
+            {
+                **({"id": record["id"]} if with_ids else {}),
+                "title": record["title"],
+                "topic": record["topic"],
+                "legacy_content": "",
+                "content_compressed": compress_text(record["content"]),
+                "section_offsets": parse_sections(record["content"]),
+                "level": record["level"],
+                "learning_style": record["learning_style"],
+                "note_metadata": record["note_metadata"],
+                "created_at": record["created_at"],
+                "updated_at": record["updated_at"]
+            }
+            for record in group
+        ]
+
+        if with_ids and dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgres_insert if dialect == "postgresql" else sqlite_insert
+            statement = dialect_insert(models.Note).on_conflict_do_nothing(index_elements=["id"])
+            result = await db.execute(statement.returning(models.Note.id), rows)
+            by_id = {record["id"]: record for record in group}
+            matched = [by_id[note_id] for note_id in result.scalars().all()]
+            ids = [record["id"] for record in matched]
+        else:
+            result = await db.execute(
+                insert(models.Note).returning(models.Note.id, sort_by_parameter_order=True),
+                rows
+            )
+            ids = list(result.scalars().all())
+            matched = group
+
+        inserted.extend(
+            (note_id, record["title"], record["topic"], record["content"])
+            for note_id, record in zip(ids, matched)
+        )
+
+    await db.run_sync(lambda session: write_search_index(session.connection(), inserted))
+    if dialect == "postgresql" and any(record["id"] is not None for record in records):
+        await db.execute(text(POSTGRES_ADVANCE_SEQUENCE))
+    return len(inserted)
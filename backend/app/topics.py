@@ -0,0 +1,68 @@
+# backend/app/topics.py
+"""
+Canonical forms of note topics and trigram similarity between them.
+
+"Python Variables", "python variables " and "Variables in Python" all
+canonicalize to "python variables": the topic is case-folded, punctuation
+and function words are dropped, and the remaining words are sorted.
+Symbols that name something, as in "C++", "C#" or ".NET", are spelled out
+("cplusplus", "csharp", "dotnet") rather than dropped, so those topics stay
+apart from "C" and remain distinct words for pg_trgm, which ignores
+symbols. The
+canonical form is stored in notes.canonical_topic so that equal topics
+are found through an index, and trigram similarity catches near matches
+such as "Python Variable". trigram_similarity follows pg_trgm, so the
+Python fallback used on SQLite scores topics like Postgres does.
+"""
+
+import re
+import unicodedata
+from typing import FrozenSet
+
+# Function words, which do not change what a topic is about. Words such as
+# "introduction" or "basics" do, since they ask for a different note
+STOP_WORDS = frozenset("""
+    a about an and are as at by for from in into is of on or the to what with
+""".split())
+
+_WORD = re.compile(r"[^\W_]+")
+
+# A word, with a dot starting the word (".net") or a trailing "++" or "#"
+# ("c++", "f#"); dots inside words such as "node.js" or "3.5" separate words
+_TOKEN = re.compile(r"(?:(?<!\S)\.)?[^\W_]+(?:\+\+|#)?")
+
+def _spell_out(token: str) -> str:
+    """Spells out the symbols of a token: ".net" -> "dotnet", "c++" -> "cplusplus"."""
+    if token.startswith("."):
+        token = "dot" + token[1:]
+    if token.endswith("++"):
+        return token[:-2] + "plusplus"
+    if token.endswith("#"):
+        return token[:-1] + "sharp"
+    return token
+
+def canonical_topic(topic: str) -> str:
+    """
+    Canonical form of a topic: lower-case words without punctuation or stop
+    words, sorted and joined by single spaces. A topic made only of stop
+    words keeps them, so it never canonicalizes to an empty string.
+    """
+    folded = unicodedata.normalize("NFKC", topic or "").casefold()
+    words = [_spell_out(token) for token in _TOKEN.findall(folded)]
+    meaningful = [word for word in words if word not in STOP_WORDS]
+    return " ".join(sorted(set(meaningful or words)))
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Trigrams of each word padded as pg_trgm does: two spaces before, one after."""
+    grams = set()
+    for word in _WORD.findall(text.casefold()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+def trigram_similarity(first: str, second: str) -> float:
+    """Shared trigrams over all distinct trigrams, like pg_trgm's similarity()."""
+    a, b = trigrams(first), trigrams(second)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
@@ -0,0 +1,6 @@
+# backend/benchmarks/__init__.py
+"""
+Offline benchmarks. Each module runs as a script from the backend
+directory, e.g. python -m benchmarks.bench_api, and writes its results as
+JSON so runs from different commits can be compared.
+"""
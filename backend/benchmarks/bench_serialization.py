@@ -0,0 +1,148 @@
+# backend/benchmarks/bench_serialization.py
+"""
+Micro-benchmark of note response serialization.
+
+Compares the previous encoding path, Note.to_dict() parsed into
+NoteResponse and encoded by pydantic (single notes) or by FastAPI's
+jsonable_encoder and JSONResponse (list pages), with the single-pass
+encoding in app.serialization. Notes are built in memory, so only
+serialization is measured.
+
+    python -m benchmarks.bench_serialization --note-size 10240 --page-size 20
+"""
+
+import os
+import sys
+import json
+import timeit
+import tempfile
+import platform
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.bench_api import RESULTS_DIR, git_commit
+
+PARAGRAPH = (
+    "## Key Concepts\n\n"
+    "- **Photosynthesis** converts light energy into chemical energy stored in glucose.\n"
+    "- Chlorophyll absorbs mostly blue and red light; green light is reflected.\n\n"
+    "> Remember: 6CO₂ + 6H₂O → C₆H₁₂O₆ + 6O₂\n\n"
+)
+
+def make_content(size: int) -> str:
+    """Markdown study notes of roughly size bytes."""
+    repeats = size // len(PARAGRAPH.encode("utf-8")) + 1
+    return ("# Study Notes\n\n" + PARAGRAPH * repeats)[:size]
+
+def make_notes(count: int, size: int):
+    """Transient Note rows shaped like generated notes."""
+    from app import models
+
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    return [
+        models.Note(
+            id=index + 1,
+            title=f"Photosynthesis {index}",
+            topic="Biology",
+            content=make_content(size),
+            level="intermediate",
+            learning_style="visual",
+            note_metadata={"model": "phi4:14b", "generation_id": f"gen-{index}",
+                           "ollama_stats": {"eval_count": 2048, "tokens_per_second": 31.4}},
+            created_at=created_at,
+            updated_at=created_at.replace(tzinfo=timezone.utc) if index % 2 else None
+        )
+        for index in range(count)
+    ]
+
+def measure(call: Callable[[], bytes], iterations: int, repeat: int) -> Dict[str, Any]:
+    """Best-of-repeat time per call, in microseconds."""
+    best = min(timeit.repeat(call, number=iterations, repeat=repeat)) / iterations
+    return {"us_per_call": round(best * 1e6, 2), "calls_per_second": round(1 / best, 1)}
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Times both encoding paths for a single note and for a list page."""
+    os.environ.setdefault(
+        "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_serialization.db')}"
+    )
+    # Importing app.main needs an Ollama configuration, though nothing calls it
+    os.environ.setdefault("OLLAMA_API_URL", "http://fake-ollama:11434")
+    os.environ.setdefault("OLLAMA_MODEL", "phi4:14b")
+    os.environ.setdefault("OLLAMA_EMBED_MODEL", "local")
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app import serialization
+    from app.main import NoteResponse
+
+    note = make_notes(1, args.note_size)[0]
+    page = make_notes(args.page_size, args.note_size)
+
+    def page_document(notes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"total": len(notes), "total_is_estimate": False, "notes": notes,
+                "skip": 0, "limit": len(notes), "next_cursor": None}
+
+    cases = {
+        "note": {
+            "previous": lambda: NoteResponse(**note.to_dict()).model_dump_json().encode("utf-8"),
+            "current": lambda: serialization.encode_note(note)
+        },
+        "list_page": {
+            "previous": lambda: JSONResponse(
+                jsonable_encoder(page_document([item.to_dict() for item in page]))
+            ).body,
+            "current": lambda: serialization.FastJSONResponse(
+                page_document([serialization.note_item(item) for item in page])
+            ).body
+        }
+    }
+
+    results: Dict[str, Any] = {"orjson": serialization.orjson is not None}
+    for name, paths in cases.items():
+        # Both paths must produce the same document before they are compared
+        previous, current = (json.loads(path()) for path in paths.values())
+        if previous != current:
+            raise AssertionError(f"{name}: encodings differ")
+
+        timings = {label: measure(path, args.iterations, args.repeat) for label, path in paths.items()}
+        timings["bytes"] = len(paths["current"]())
+        timings["speedup"] = round(
+            timings["previous"]["us_per_call"] / timings["current"]["us_per_call"], 2
+        )
+        results[name] = timings
+        print(f"{name:10} previous {timings['previous']['us_per_call']:>9.2f} us  "
+              f"current {timings['current']['us_per_call']:>9.2f} us  "
+              f"speedup {timings['speedup']:.2f}x")
+    return results
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark note response serialization")
+    parser.add_argument("--note-size", type=int, default=10240, help="Content size in bytes")
+    parser.add_argument("--page-size", type=int, default=20, help="Notes per list page")
+    parser.add_argument("--iterations", type=int, default=2000, help="Calls per timing")
+    parser.add_argument("--repeat", type=int, default=5, help="Timings per path; the best is kept")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/serialization-<commit>.json)")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    results = run(args)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"serialization-{commit or 'bench'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+    print(f"\nResults written to {output}")
+    return report
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,53 @@
+# backend/tests/conftest.py
+
+import os
+import tempfile
+
+# Provide defaults so the app can be imported without a .env file.
+# These must be set before app modules are imported.
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test_notes.db')}"
+)
+os.environ.setdefault("OLLAMA_API_URL", "http://ollama.test:11434")
+os.environ.setdefault("OLLAMA_MODEL", "phi4:14b")
+os.environ.setdefault("OLLAMA_EMBED_MODEL", "local")
+# The suite sends many generation requests from one client
+os.environ.setdefault("GENERATION_RATE_BURST", "1000")
+
+import httpx
+import pytest
+
+from fake_ollama import FakeOllama
+
+
+@pytest.fixture
+def fake_ollama():
+    """A fake Ollama server that answers instantly and never fails."""
+    return FakeOllama(models=[os.environ["OLLAMA_MODEL"]])
+
+
+@pytest.fixture
+def mock_ollama(fake_ollama):
+    """Routes the app's Ollama client through the fake Ollama server."""
+    from app.main import ollama_service
+    ollama_service._transport = httpx.MockTransport(fake_ollama.handler)
+    ollama_service._client = None
+    # TestClient runs every request on a new event loop
+    ollama_service.pool._condition = None
+    for node in ollama_service.pool.nodes:
+        node.healthy = True
+        node.consecutive_failures = 0
+    yield ollama_service
+    ollama_service._transport = None
+    ollama_service._client = None
+
+
+@pytest.fixture(scope="session", autouse=True)
+def dispose_engines():
+    """Closes pooled connections so driver threads do not outlive the tests."""
+    yield
+    import asyncio
+    from app.database import async_engine, engine
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
@@ -0,0 +1,246 @@
+# backend/tests/fake_ollama.py
+"""
+A local stand-in for the Ollama API, for tests and benchmarks.
+
+Serves /api/tags, /api/generate (streaming and non-streaming) and
+/api/embeddings with configurable latency, token rate and error rate.
+Like Ollama, it loads the model on demand, unloads it once keep_alive
+expires, and only evaluates the part of a prompt that does not share a
+prefix with the previous one; both show up in the reported statistics. It
+can be mounted in-process through httpx.MockTransport(fake.handler), or
+run as a real server:
+
+    python -m tests.fake_ollama --port 11434 --tokens-per-second 40
+"""
+
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import AsyncIterator, Dict, Any, List, Optional, Sequence
+
+import httpx
+
+# Canned content, emitted one chunk per token
+DEFAULT_CHUNKS = ("# Study Notes\n", "Some ", "content.")
+
+# Length of the vectors returned by /api/embeddings
+EMBEDDING_DIMENSIONS = 64
+
+# Ollama's default keep_alive, in seconds
+DEFAULT_KEEP_ALIVE = 300.0
+
+def keep_alive_seconds(value: Any) -> float:
+    """Parses a keep_alive value: seconds, a "30s"/"5m"/"1h" string, or negative for forever."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, str) and value[-1:] in ("s", "m", "h"):
+        value = float(value[:-1]) * {"s": 1, "m": 60, "h": 3600}[value[-1]]
+    seconds = float(value)
+    return float("inf") if seconds < 0 else seconds
+
+class FakeOllama:
+    """
+    Simulated Ollama server.
+
+    Attributes:
+        models: Model names listed by /api/tags
+        latency: Seconds before the first token (or any other response)
+        tokens_per_second: Pace at which generated tokens are emitted;
+            None emits them immediately
+        error_rate: Fraction of requests answered with 503
+        load_time: Seconds it takes to load the model when it is not loaded
+        chunks: Tokens making up every generated response
+        requests: Number of requests received per endpoint path
+        loads: Number of times the model was loaded
+    """
+
+    def __init__(
+        self,
+        models: Sequence[str] = ("phi4:14b",),
+        latency: float = 0.0,
+        tokens_per_second: Optional[float] = None,
+        error_rate: float = 0.0,
+        load_time: float = 0.0,
+        chunks: Sequence[str] = DEFAULT_CHUNKS,
+        seed: Optional[int] = None
+    ):
+        self.models = list(models)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.load_time = load_time
+        self.chunks = list(chunks)
+        self.requests: Dict[str, int] = {}
+        self.loads = 0
+        self._random = random.Random(seed)
+        # When the loaded model expires, and the tokens of the last prompt
+        self._loaded_until: Optional[float] = None
+        self._cached_prompt: List[str] = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        """Answers one request; pass to httpx.MockTransport."""
+        path = request.url.path
+        self.requests[path] = self.requests.get(path, 0) + 1
+        body = json.loads(request.content) if request.content else {}
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if path != "/api/tags" and self._random.random() < self.error_rate:
+            return httpx.Response(503, json={"error": "server busy"})
+
+        if path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": name} for name in self.models]})
+        if path == "/api/embeddings":
+            return httpx.Response(200, json={"embedding": self.embedding(body.get("prompt", ""))})
+        if path == "/api/generate":
+            if body.get("model") not in self.models:
+                return httpx.Response(404, json={"error": f"model '{body.get('model')}' not found"})
+            load_duration = await self._load(body.get("keep_alive"))
+            if not body.get("prompt"):
+                # A request without a prompt only loads the model
+                return httpx.Response(200, json={
+                    "model": body["model"], "response": "", "done": True,
+                    "done_reason": "load", "load_duration": load_duration
+                })
+            prompt_eval_count = self._evaluate_prompt(body["prompt"])
+            if body.get("stream", True):
+                return httpx.Response(200, content=self._stream_lines(body, load_duration, prompt_eval_count))
+            return httpx.Response(200, json=await self._generate(body, load_duration, prompt_eval_count))
+        return httpx.Response(404, json={"error": "not found"})
+
+    async def _load(self, keep_alive: Any) -> int:
+        """Loads the model if needed and extends its keep_alive; returns the load time in ns."""
+        now = time.monotonic()
+        load_duration = 0
+        if self._loaded_until is None or now > self._loaded_until:
+            self.loads += 1
+            self._cached_prompt = []
+            if self.load_time:
+                await asyncio.sleep(self.load_time)
+            load_duration = int(self.load_time * 1e9)
+        self._loaded_until = time.monotonic() + keep_alive_seconds(keep_alive)
+        return load_duration
+
+    def _evaluate_prompt(self, prompt: str) -> int:
+        """Number of prompt tokens (words) past the prefix shared with the previous prompt."""
+        tokens = prompt.split()
+        shared = 0
+        for cached, token in zip(self._cached_prompt, tokens):
+            if cached != token:
+                break
+            shared += 1
+        self._cached_prompt = tokens
+        return len(tokens) - shared
+
+    async def _tokens(self) -> AsyncIterator[str]:
+        """Yields the canned tokens at the configured rate."""
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        for chunk in self.chunks:
+            if delay:
+                await asyncio.sleep(delay)
+            yield chunk
+
+    def _final_stats(self, started: float, load_duration: int, prompt_eval_count: int) -> Dict[str, Any]:
+        """Statistics reported on the last response, in nanoseconds like Ollama."""
+        eval_duration = max(int((time.perf_counter() - started) * 1e9), 1)
+        # Prompt evaluation is simulated at 1000 tokens per second
+        prompt_eval_duration = prompt_eval_count * 1_000_000
+        return {
+            "done": True,
+            "eval_count": len(self.chunks),
+            "eval_duration": eval_duration,
+            "prompt_eval_count": prompt_eval_count,
+            "prompt_eval_duration": prompt_eval_duration,
+            "load_duration": load_duration,
+            "total_duration": load_duration + prompt_eval_duration + eval_duration
+        }
+
+    async def _generate(self, body: Dict[str, Any], load_duration: int, prompt_eval_count: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        content = "".join([chunk async for chunk in self._tokens()])
+        stats = self._final_stats(started, load_duration, prompt_eval_count)
+        return {"model": body["model"], "response": content, **stats}
+
+    async def _stream_lines(
+        self,
+        body: Dict[str, Any],
+        load_duration: int,
+        prompt_eval_count: int
+    ) -> AsyncIterator[bytes]:
+        started = time.perf_counter()
+        async for chunk in self._tokens():
+            line = {"model": body["model"], "response": chunk, "done": False}
+            yield (json.dumps(line) + "\n").encode()
+        stats = self._final_stats(started, load_duration, prompt_eval_count)
+        final = {"model": body["model"], "response": "", **stats}
+        yield (json.dumps(final) + "\n").encode()
+
+    @staticmethod
+    def embedding(text: str) -> List[float]:
+        """Deterministic unit-length vector derived from the text."""
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        values = [(digest[i % len(digest)] - 127.5) / 127.5 for i in range(EMBEDDING_DIMENSIONS)]
+        norm = sum(value * value for value in values) ** 0.5 or 1.0
+        return [value / norm for value in values]
+
+    def asgi_app(self):
+        """Wraps the handler in an ASGI application, for running under uvicorn."""
+        async def app(scope, receive, send):
+            if scope["type"] != "http":
+                return
+            body = b""
+            more_body = True
+            while more_body:
+                message = await receive()
+                body += message.get("body", b"")
+                more_body = message.get("more_body", False)
+
+            request = httpx.Request(
+                scope["method"],
+                f"http://fake-ollama{scope['path']}",
+                content=body
+            )
+            response = await self.handler(request)
+            media_type = response.headers.get("content-type", "application/x-ndjson")
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(b"content-type", media_type.encode())]
+            })
+            if response.is_stream_consumed:
+                # Built from bytes or JSON, so the body is already in memory
+                await send({"type": "http.response.body", "body": response.content})
+                return
+            async for chunk in response.aiter_raw():
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", action="append", dest="models", help="Model to list (repeatable)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--load-time", type=float, default=0.0, help="Seconds to load the model")
+    args = parser.parse_args()
+
+    import uvicorn
+    fake = FakeOllama(
+        models=args.models or ["phi4:14b"],
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        load_time=args.load_time
+    )
+    uvicorn.run(fake.asgi_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# backend/tests/test_admission.py
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.services.admission import MAX_RETRY_AFTER, AdmissionController, AdmissionRejected, TokenBucket
+
+
+def test_token_bucket_rejects_over_rate_and_allows_debt():
+    """A bucket admits a burst, then reports how long until the next token"""
+    bucket = TokenBucket(rate=1.0, burst=2)
+    assert bucket.take()[0] and bucket.take()[0]
+    taken, wait = bucket.take()
+    assert not taken and 0 < wait <= 1.0
+    
+    large = TokenBucket(rate=1.0, burst=2)
+    assert large.take(cost=5)[0]
+    assert large.tokens == -3
+    assert large.take()[1] > 3
+    
+    # A rate of zero never refills, but still gives a finite hint
+    closed = TokenBucket(rate=0.0, burst=1)
+    assert closed.take()[0]
+    assert closed.take() == (False, MAX_RETRY_AFTER)
+
+
+@pytest.mark.asyncio
+async def test_slots_queue_and_shed_load(monkeypatch):
+    """Requests beyond the slots wait in a bounded queue, then get 503"""
+    monkeypatch.setenv("GENERATION_MAX_CONCURRENCY", "1")
+    monkeypatch.setenv("GENERATION_MAX_QUEUE", "1")
+    monkeypatch.setenv("GENERATION_INITIAL_DURATION_ESTIMATE", "10")
+    admission = AdmissionController()
+    release = asyncio.Event()
+    
+    async def generate(shed=True):
+        async with admission.slot(shed=shed):
+            await release.wait()
+    
+    running = asyncio.create_task(generate())
+    queued = asyncio.create_task(generate())
+    await asyncio.sleep(0.01)
+    assert admission.active == 1 and admission.waiting == 1
+    
+    with pytest.raises(AdmissionRejected) as rejected:
+        async with admission.slot():
+            pass
+    assert rejected.value.status_code == 503
+    assert rejected.value.retry_after >= 10
+    
+    # Background work is never shed; it just waits its turn
+    background = asyncio.create_task(generate(shed=False))
+    await asyncio.sleep(0.01)
+    assert admission.waiting == 2
+    
+    release.set()
+    await asyncio.gather(running, queued, background)
+    assert admission.active == 0 and admission.waiting == 0
+    assert admission.rejected["queue_full"] == 1
+
+
+def test_rate_limited_generation_keeps_reads_open(mock_ollama, monkeypatch):
+    """Clients over their rate get 429 with Retry-After; reads are untouched"""
+    from app.main import app, admission
+    
+    monkeypatch.setattr(admission, "_buckets", {})
+    monkeypatch.setattr(admission, "burst", 1)
+    client = TestClient(app)
+    payload = {"topic": "Optics", "title": "Lenses", "level": "beginner",
+               "learning_style": "visual", "bypass_cache": True}
+    
+    headers = {"X-API-Key": "client-a"}
+    assert client.post("/notes", json=payload, headers=headers).status_code == 200
+    
+    limited = client.post("/notes", json=payload, headers=headers)
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    
+    # Other clients and read endpoints are unaffected
+    assert client.post("/notes", json=payload, headers={"X-API-Key": "client-b"}).status_code == 200
+    assert client.get("/notes").status_code == 200
+    assert client.get("/health").json()["admission"]["rejected"]["rate_limited"] >= 1
+    
+    # GENERATION_RATE_PER_MINUTE=0 blocks generation with a 429, not a 500
+    monkeypatch.setattr(admission, "rate", 0.0)
+    blocked = client.post("/notes", json=payload, headers={"X-API-Key": "client-c"})
+    assert blocked.status_code == 200
+    blocked = client.post("/notes", json=payload, headers={"X-API-Key": "client-c"})
+    assert blocked.status_code == 429
+    assert int(blocked.headers["Retry-After"]) == MAX_RETRY_AFTER
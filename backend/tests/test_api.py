@@ -1,10 +1,14 @@
 # backend/tests/test_api.py
 
+import json
+import time
 import pytest
 import httpx
 import asyncio
 from fastapi.testclient import TestClient
 from app.main import app
+from app import models
+from app.database import SessionLocal
 
 client = TestClient(app)
 
@@ -15,9 +19,8 @@ def test_health_check():
     assert "status" in response.json()
     assert response.json()["status"] == "healthy"
 
-@pytest.mark.asyncio
-async def test_note_creation():
-    """Test creating a new note"""
+def create_test_note() -> int:
+    """Creates a note through the API and returns its id"""
     test_note = {
         "topic": "Python Programming",
         "title": "Introduction to Python Variables",
@@ -32,10 +35,17 @@ async def test_note_creation():
     assert data["title"] == test_note["title"]
     assert "content" in data
     assert "id" in data
-    
-    # Store the note ID for later tests
     return data["id"]
 
+@pytest.fixture
+def note_id(mock_ollama):
+    """Id of a freshly created note"""
+    return create_test_note()
+
+def test_note_creation(mock_ollama):
+    """Test creating a new note"""
+    create_test_note()
+
 @pytest.mark.asyncio
 async def test_note_retrieval(note_id):
     """Test retrieving a specific note"""
@@ -56,12 +66,461 @@ async def test_notes_list():
     assert "total" in data
     assert isinstance(data["notes"], list)
 
-@pytest.mark.asyncio
-async def test_ollama_connection():
-    """Test connection to Ollama server"""
-    async with httpx.AsyncClient() as client:
-        response = await client.get("http://abts55669.de.bosch.com:11434/api/tags")
+def test_note_creation_streaming(mock_ollama):
+    """Test streaming note creation over server-sent events"""
+    test_note = {
+        "topic": "Python Programming",
+        "title": "Introduction to Python Variables",
+        "level": "beginner",
+        "learning_style": "visual",
+        "bypass_cache": True
+    }
+    
+    response = client.post("/notes/stream", json=test_note)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names[:3] == ["chunk", "chunk", "chunk"]
+    assert names[-1] == "done"
+    
+    note_id = json.loads(events[-1][1].removeprefix("data: "))["id"]
+    saved = client.get(f"/notes/{note_id}").json()
+    assert saved["content"] == "# Study Notes\nSome content."
+    assert saved["metadata"]["model_used"] == "phi4:14b"
+    assert saved["metadata"]["ollama_stats"]["eval_count"] == 3
+
+def test_sectioned_note_streaming(mock_ollama):
+    """Test that sections mode streams one chunk per section, in order"""
+    test_note = {
+        "topic": "Plate Tectonics",
+        "title": "Plates",
+        "level": "intermediate",
+        "learning_style": "reading",
+        "bypass_cache": True,
+        "generation_mode": "sections"
+    }
+    
+    response = client.post("/notes/stream", json=test_note)
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names == ["chunk"] * 5 + ["done"]
+    
+    note_id = json.loads(events[-1][1].removeprefix("data: "))["id"]
+    saved = client.get(f"/notes/{note_id}").json()
+    assert saved["content"].startswith("# Plate Tectonics\n")
+    assert "\n\n# Practice and Application\n" in saved["content"]
+    assert saved["metadata"]["generation_mode"] == "sections"
+    assert client.post("/notes", json={**test_note, "generation_mode": "outline"}).status_code == 422
+
+def test_async_note_creation_job(mock_ollama):
+    """Test queueing a note with ?async=true and polling the job until done"""
+    test_note = {
+        "topic": "Photosynthesis",
+        "title": "How Plants Make Food",
+        "level": "intermediate",
+        "learning_style": "reading"
+    }
+    
+    with TestClient(app) as app_client:
+        response = app_client.post("/notes?async=true", json=test_note)
+        assert response.status_code == 202
+        job = response.json()
+        assert response.headers["location"] == f"/jobs/{job['id']}"
+        assert job["status"] in ("queued", "running")
+        
+        for _ in range(100):
+            job = app_client.get(f"/jobs/{job['id']}").json()
+            if job["status"] in ("done", "failed"):
+                break
+            time.sleep(0.05)
+        
+        assert job["status"] == "done"
+        note = app_client.get(f"/notes/{job['note_id']}").json()
+        assert note["title"] == test_note["title"]
+    
+    assert client.get("/jobs/does-not-exist").status_code == 404
+
+def test_notes_cursor_pagination():
+    """Test walking every page with next_cursor and the summary projection"""
+    db = SessionLocal()
+    try:
+        for index in range(7):
+            db.add(models.Note(
+                title=f"Page Test {index}",
+                topic="Pagination",
+                content="x" * 100,
+                level="beginner",
+                learning_style="visual"
+            ))
+        db.commit()
+    finally:
+        db.close()
+    
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3, "fields": "summary"}
+        if cursor:
+            params["cursor"] = cursor
+        data = client.get("/notes", params=params).json()
+        assert all("content" not in note for note in data["notes"])
+        seen.extend(note["id"] for note in data["notes"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    
+    assert len(seen) == len(set(seen))
+    assert len(seen) >= 7
+    assert client.get("/notes", params={"cursor": "not-a-cursor"}).status_code == 400
+
+def test_notes_search():
+    """Test full-text search with ranking, snippets and filters"""
+    db = SessionLocal()
+    try:
+        db.add(models.Note(
+            title="Mitochondria Basics",
+            topic="Cell Biology",
+            content="The mitochondria is the powerhouse of the cell.",
+            level="beginner",
+            learning_style="visual"
+        ))
+        db.add(models.Note(
+            title="Organelles",
+            topic="Cell Biology",
+            content="Ribosomes build proteins while mitochondria produce energy.",
+            level="expert",
+            learning_style="reading"
+        ))
+        db.commit()
+    finally:
+        db.close()
+    
+    data = client.get("/notes/search", params={"q": "mitochondria"}).json()
+    titles = [result["title"] for result in data["results"]]
+    assert titles[0] == "Mitochondria Basics"
+    assert "Organelles" in titles
+    assert "<mark>" in data["results"][0]["snippet"]
+    
+    data = client.get("/notes/search", params={"q": "mitochondria", "level": "expert"}).json()
+    assert [result["title"] for result in data["results"]] == ["Organelles"]
+    
+    data = client.get("/notes/search", params={"q": "mitochondria", "limit": 1}).json()
+    assert len(data["results"]) == 1 and data["has_more"] is True
+
+def test_notes_search_snippets_escape_note_html():
+    """Test that search snippets escape HTML in note content before highlighting"""
+    db = SessionLocal()
+    try:
+        db.add(models.Note(
+            title="Injected",
+            topic="Web Security",
+            content='Cross-site <script>alert("xss")</script> scripting & sanitizers',
+            level="beginner",
+            learning_style="reading"
+        ))
+        db.commit()
+    finally:
+        db.close()
+    
+    data = client.get("/notes/search", params={"q": "sanitizers"}).json()
+    snippet = data["results"][0]["snippet"]
+    assert "<script>" not in snippet
+    assert "&lt;script&gt;" in snippet and "&amp;" in snippet
+    assert "<mark>sanitizers</mark>" in snippet
+
+def test_semantic_and_related_notes(mock_ollama):
+    """Test embedding-based related notes, semantic search and reuse"""
+    created = []
+    for topic in ["Volcano Eruptions", "Volcano Formation", "Baroque Music"]:
+        response = client.post("/notes", json={
+            "topic": topic,
+            "title": f"{topic} Notes",
+            "level": "beginner",
+            "learning_style": "visual",
+            "bypass_cache": True
+        })
         assert response.status_code == 200
+        created.append(response.json()["id"])
+    
+    # Embeddings are computed in the background after each save
+    from app.main import embedding_service
+    for note_id in created:
+        asyncio.run(embedding_service.index_note(
+            note_id, f"{client.get(f'/notes/{note_id}').json()['title']}"
+        ))
+    
+    related = client.get(f"/notes/{created[0]}/related", params={"k": 2}).json()
+    assert related["results"][0]["id"] == created[1]
+    assert created[0] not in [result["id"] for result in related["results"]]
+    
+    semantic = client.get("/notes/semantic", params={"q": "baroque music notes"}).json()
+    assert semantic["results"][0]["id"] == created[2]
+    
+    reused = client.post("/notes", json={
+        "topic": "Baroque Music",
+        "title": "Baroque Music Notes",
+        "level": "beginner",
+        "learning_style": "visual",
+        "reuse_similar": True
+    }).json()
+    assert reused["id"] == created[2]
+    assert reused["metadata"]["reused"] is True
+
+def test_batch_note_creation(mock_ollama, monkeypatch):
+    """Test batch generation with one failing item and a streamed summary"""
+    generate = mock_ollama.generate_study_notes
+    
+    async def flaky_generate(topic, **kwargs):
+        if topic == "Unknowable":
+            raise RuntimeError("model refused")
+        return await generate(topic=topic, **kwargs)
+    
+    monkeypatch.setattr(mock_ollama, "generate_study_notes", flaky_generate)
+    
+    items = [
+        {"topic": topic, "title": f"{topic} Notes", "level": "beginner",
+         "learning_style": "kinesthetic", "bypass_cache": True}
+        for topic in ["Fractions", "Unknowable", "Decimals"]
+    ]
+    response = client.post("/notes/batch", json={"items": items, "concurrency": 2})
+    assert response.status_code == 200
+    
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["type"] for record in records] == ["item", "item", "item", "summary"]
+    
+    summary = records[-1]
+    assert summary["created"] == 2 and summary["failed"] == 1
+    assert summary["results"][1]["status"] == "failed"
+    for result in (summary["results"][0], summary["results"][2]):
+        assert result["status"] == "created"
+        assert client.get(f"/notes/{result['note_id']}").status_code == 200
+
+def test_note_conditional_get_and_read_cache():
+    """Test ETag/Last-Modified revalidation and the serialized read cache"""
+    from app.services import note_service
+    
+    db = SessionLocal()
+    try:
+        note = models.Note(title="Cached Note", topic="Caching", content="Immutable " * 200,
+                           level="beginner", learning_style="reading")
+        db.add(note)
+        db.commit()
+        note_id = note.id
+    finally:
+        db.close()
+    
+    first = client.get(f"/notes/{note_id}")
+    assert first.status_code == 200
+    assert first.json()["title"] == "Cached Note"
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("public")
+    assert first.headers["content-encoding"] == "gzip"
+    
+    hits = note_service.read_cache.hits
+    assert client.get(f"/notes/{note_id}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/notes/{note_id}", headers={
+        "If-Modified-Since": first.headers["last-modified"]
+    }).status_code == 304
+    assert client.get(f"/notes/{note_id}", headers={"If-None-Match": '"stale"'}).status_code == 200
+    assert note_service.read_cache.hits == hits + 3
+    
+    # Invalidation forces the next read back to the database
+    note_service.invalidate_note(note_id)
+    misses = note_service.read_cache.misses
+    assert client.get(f"/notes/{note_id}").headers["etag"] == etag
+    assert note_service.read_cache.misses == misses + 1
+    assert client.get("/notes/999999").status_code == 404
+
+def test_metrics_endpoint(mock_ollama):
+    """Test that /metrics reports route, stage and Ollama throughput metrics"""
+    test_note = {
+        "topic": "Thermodynamics",
+        "title": "Metrics",
+        "level": "beginner",
+        "learning_style": "reading",
+        "bypass_cache": True
+    }
+    
+    response = client.post("/notes", json=test_note)
+    assert response.status_code == 200
+    stats = response.json()["metadata"]["ollama_stats"]
+    assert stats["eval_count"] == 3
+    assert stats["tokens_per_second"] > 0
+    client.get(f"/notes/{response.json()['id']}")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/notes/{note_id}",status="200"}' in body
+    for stage in ("prompt_build", "admission_wait", "ollama_queue_wait", "generation", "db_commit"):
+        assert f'note_generation_stage_seconds_count{{stage="{stage}"}}' in body
+    assert 'db_pool_connections_in_use{engine="async"}' in body
+    assert 'db_pool_checkout_wait_seconds_count{engine="async"}' in body
+    assert "ollama_eval_tokens_total" in body
+    assert 'ollama_duration_seconds_count{phase="load"}' in body
+
+def test_cache_hits_do_not_wait_for_generation_slots(mock_ollama, monkeypatch):
+    """Test that cached notes are served while every generation slot is taken"""
+    from app.main import admission
+    test_note = {
+        "topic": "Fluid Dynamics",
+        "title": "Flow",
+        "level": "expert",
+        "learning_style": "visual"
+    }
+    assert client.post("/notes", json=test_note).status_code == 200
+    
+    # Every slot held and the wait queue full: anything reaching Ollama is shed
+    monkeypatch.setattr(admission, "_semaphore", asyncio.Semaphore(0))
+    monkeypatch.setattr(admission, "waiting", admission.max_waiting)
+    last_active = admission.last_active
+    
+    response = client.post("/notes", json=test_note)
+    assert response.status_code == 200
+    assert response.json()["metadata"]["cache_hit"] == "memory"
+    response = client.post("/notes/stream", json=test_note)
+    assert response.status_code == 200
+    assert response.text.split("\n\n")[-2].startswith("event: done")
+    # Cache hits neither count as demand nor feed the duration estimate
+    assert admission.last_active == last_active
+    
+    response = client.post("/notes", json={**test_note, "bypass_cache": True})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert client.post("/notes/stream", json={**test_note, "bypass_cache": True}).status_code == 503
+
+def test_shared_rows_are_not_reused_across_requests(mock_ollama, monkeypatch):
+    """Test that shared-row mode never hands a later request an earlier note"""
+    import app.main
+    monkeypatch.setattr(app.main, "NOTE_DEDUP_MODE", "shared")
+    test_note = {"topic": "Tidal Locking", "level": "beginner", "learning_style": "visual"}
+    
+    alice = client.post("/notes", json={**test_note, "title": "Alice's notes"}).json()
+    bob = client.post("/notes", json={**test_note, "title": "Bob's notes"}).json()
+    again = client.post("/notes", json={**test_note, "title": "Alice's notes"}).json()
+    assert bob["metadata"]["cache_hit"] == "memory"
+    assert len({alice["id"], bob["id"], again["id"]}) == 3
+    assert bob["title"] == "Bob's notes"
+    assert client.get(f"/notes/{alice['id']}").json()["title"] == "Alice's notes"
+
+def test_note_creation_with_group_commit(mock_ollama, monkeypatch):
+    """Test that notes saved through the group-commit writer are readable at once"""
+    from app.main import note_writer
+    monkeypatch.setattr(note_writer, "enabled", True)
+    
+    rows = note_writer.rows
+    response = client.post("/notes", json={
+        "topic": "Write-ahead logging",
+        "title": "Group Commit",
+        "level": "expert",
+        "learning_style": "reading",
+        "bypass_cache": True
+    })
+    assert response.status_code == 200
+    assert note_writer.rows == rows + 1
+    note = client.get(f"/notes/{response.json()['id']}").json()
+    assert note["title"] == "Group Commit"
+    assert note["content"] == response.json()["content"]
+    assert client.get("/health").json()["note_writer"]["enabled"] is True
+
+def test_note_section_fetch_and_regenerate(mock_ollama):
+    """Test that one section is served and regenerated without touching the others"""
+    content = "\n\n".join([
+        "# Volcanoes\nMolten rock rises.",
+        "# Main Concepts\nMagma and plates.",
+        "# Detailed Explanations\nHow eruptions happen.",
+        "# Key Points to Remember\nHot rock moves up.",
+        "# Practice and Application\n1. Name a volcano."
+    ])
+    db = SessionLocal()
+    try:
+        note = models.Note(title="Volcanoes", topic="Volcanoes", content=content,
+                           level="beginner", learning_style="reading")
+        db.add(note)
+        db.commit()
+        note_id = note.id
+    finally:
+        db.close()
+    
+    response = client.get(f"/notes/{note_id}/sections/main_concepts")
+    assert response.status_code == 200
+    assert response.json() == {"note_id": note_id, "section": "main_concepts",
+                               "heading": "Main Concepts", "content": "Magma and plates."}
+    assert client.get(f"/notes/{note_id}/sections/introduction").json()["heading"] == "Volcanoes"
+    assert client.get(f"/notes/{note_id}/sections/summary").status_code == 404
+    assert client.get(f"/notes/999999/sections/practice").status_code == 404
+    client.get(f"/notes/{note_id}")
+    
+    response = client.post(f"/notes/{note_id}/sections/key_points/regenerate",
+                           json={"instructions": "Use a mnemonic"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["heading"] == "Key Points to Remember"
+    # Headings other than the section's own stay part of the body
+    assert data["content"] == "# Study Notes\nSome content."
+    assert data["metadata"]["regenerated"] is True
+    assert data["metadata"]["ollama_stats"]["eval_count"] == 3
+    
+    # Cached reads are invalidated and the other sections are kept as they were
+    saved = client.get(f"/notes/{note_id}").json()
+    assert saved["content"] == content.replace("Hot rock moves up.", "# Study Notes\nSome content.")
+    assert saved["metadata"]["sections"]["key_points"]["regenerated"] is True
+    assert client.get(f"/notes/{note_id}/sections/practice").json()["content"] == "1. Name a volcano."
+    assert client.post(f"/notes/{note_id}/sections/outline/regenerate").status_code == 404
+
+@pytest.mark.asyncio
+async def test_precompute_fills_cache_and_yields_to_requests(mock_ollama, fake_ollama, monkeypatch):
+    """Test that idle-time precomputation caches popular requests and is preempted at once"""
+    from app.main import admission, generation_cache, precompute_scheduler
+    monkeypatch.setattr(precompute_scheduler, "idle_seconds", 0)
+    
+    db = SessionLocal()
+    try:
+        for topic, mode, count in (("Ocean Currents", "single", 2), ("ocean  currents", "single", 1),
+                                   ("Glaciers", "sections", 3), ("Rare Topic", "single", 1)):
+            for _ in range(count):
+                db.add(models.Note(title=topic, topic=topic, content="Waves " * 20, level="expert",
+                                   learning_style="auditory", note_metadata={"generation_mode": mode}))
+        db.commit()
+    finally:
+        db.close()
+    
+    counts = await precompute_scheduler.run_once()
+    assert counts["generated"] >= 6 and counts["preempted"] == 0
+    key = mock_ollama.cache_key("Ocean Currents", "expert", "auditory")
+    assert await generation_cache.age(key) is not None
+    for section in ("introduction", "practice"):
+        assert await generation_cache.age(mock_ollama.cache_key("Glaciers", "expert", "auditory", section)) is not None
+    assert await generation_cache.age(mock_ollama.cache_key("Rare Topic", "expert", "auditory")) is None
+    
+    # Requests are now served from the cache; a second pass finds everything fresh
+    result = await mock_ollama.generate_study_notes("ocean currents", "expert", "auditory")
+    assert result["metadata"]["cache_hit"] and result["metadata"]["precomputed"] is True
+    assert (await precompute_scheduler.run_once())["generated"] == 0
+    
+    # A request for a generation slot cancels the Ollama call in flight
+    monkeypatch.setattr(precompute_scheduler, "refresh_after", 0)
+    fake_ollama.latency = 30
+    pass_task = asyncio.ensure_future(precompute_scheduler.run_once())
+    while precompute_scheduler._current is None:
+        await asyncio.sleep(0.01)
+    started = time.monotonic()
+    async with admission.slot():
+        counts = await asyncio.wait_for(pass_task, 1)
+    assert time.monotonic() - started < 1
+    assert counts["preempted"] == 1 and counts["generated"] == 0
+    assert precompute_scheduler.stats()["preempted"] >= 1
+
+@pytest.mark.asyncio
+async def test_ollama_connection(mock_ollama):
+    """Test connection to the (fake) Ollama server"""
+    result = await mock_ollama.test_connection()
+    assert result["status"] == "success"
+    assert result["url"] == mock_ollama.base_url
+    assert await mock_ollama.check_model_availability()
 
 def run_tests():
     """Run all tests in sequence"""
@@ -72,7 +531,7 @@ def run_tests():
     
     # Run note creation and retrieval tests
     print("\nTesting note creation and retrieval...")
-    note_id = asyncio.run(test_note_creation())
+    note_id = create_test_note()
     asyncio.run(test_note_retrieval(note_id))
     print("✅ Note creation and retrieval passed")
     
@@ -81,9 +540,10 @@ def run_tests():
     asyncio.run(test_notes_list())
     print("✅ Notes list test passed")
     
-    # Test Ollama connection
+    # Test connection to the configured Ollama server
     print("\nTesting Ollama connection...")
-    asyncio.run(test_ollama_connection())
+    from app.main import ollama_service
+    assert asyncio.run(ollama_service.test_connection())["status"] == "success"
     print("✅ Ollama connection test passed")
 
 if __name__ == "__main__":
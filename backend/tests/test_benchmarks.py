@@ -0,0 +1,44 @@
+# backend/tests/test_benchmarks.py
+
+import httpx
+import pytest
+
+from benchmarks.bench_api import percentile, run_scenario
+from benchmarks import bench_serialization
+from fake_ollama import FakeOllama
+
+
+def test_percentiles_use_nearest_rank():
+    """p50/p95/p99 pick actual samples from the sorted latencies"""
+    samples = [i / 100 for i in range(1, 101)]
+    assert percentile(samples, 0.50) == 0.50
+    assert percentile(samples, 0.95) == 0.95
+    assert percentile(samples, 0.99) == 0.99
+    assert percentile([], 0.99) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_run_scenario_counts_fake_ollama_errors():
+    """Failed requests count as errors and are left out of the latency sample"""
+    fake = FakeOllama(error_rate=0.5, seed=1)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(fake.handler),
+                                 base_url="http://fake") as client:
+        summary = await run_scenario(
+            lambda i: client.post("/api/generate", json={"model": "phi4:14b", "stream": False}),
+            requests=40,
+            concurrency=4
+        )
+    assert summary["requests"] == 40
+    assert 0 < summary["errors"] < 40
+    assert fake.requests["/api/generate"] == 40
+    assert summary["p50_ms"] <= summary["p95_ms"] <= summary["p99_ms"] <= summary["max_ms"]
+
+
+def test_serialization_benchmark_paths_agree():
+    """The single-pass encoding writes the same documents as the previous path"""
+    args = bench_serialization.parse_args(["--note-size", "2048", "--page-size", "3",
+                                           "--iterations", "2", "--repeat", "1"])
+    results = bench_serialization.run(args)
+    for case in ("note", "list_page"):
+        assert results[case]["bytes"] > 2048
+        assert results[case]["speedup"] > 0
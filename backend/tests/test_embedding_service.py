@@ -0,0 +1,45 @@
+# backend/tests/test_embedding_service.py
+
+import numpy as np
+from app.services.embedding_service import EmbeddingIndex, hash_embedding, to_blob, from_blob
+
+
+def test_exact_top_k_matches_brute_force():
+    """Vectorized top-k returns the same neighbours as a brute-force scan"""
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(500, 32)).astype(np.float32)
+    index = EmbeddingIndex()
+    for note_id, vector in enumerate(vectors):
+        index.add(note_id, vector)
+    
+    query = rng.normal(size=32).astype(np.float32)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = list(np.argsort(-(normalized @ query))[:5])
+    
+    assert [note_id for note_id, _ in index.search(query, k=5)] == expected
+    assert 0 not in [note_id for note_id, _ in index.search(vectors[0], k=5, exclude={0})]
+
+
+def test_approximate_index_finds_near_duplicates():
+    """The IVF index still finds a vector's own cluster-mates"""
+    rng = np.random.default_rng(2)
+    centers = rng.normal(size=(20, 32)).astype(np.float32)
+    vectors = np.repeat(centers, 100, axis=0) + 0.01 * rng.normal(size=(2000, 32)).astype(np.float32)
+    
+    index = EmbeddingIndex()
+    index.use_ann, index.ann_min_rows, index.ann_probes = True, 1000, 4
+    index.load(list(range(2000)), list(vectors))
+    
+    results = index.search(vectors[150], k=10)
+    assert index._ann is not None
+    assert all(100 <= note_id < 200 for note_id, _ in results)
+
+
+def test_blob_round_trip_and_local_embedding():
+    """Embeddings survive float32 packing; shared words raise similarity"""
+    vector = hash_embedding("photosynthesis in plants")
+    assert np.allclose(from_blob(to_blob(vector)), vector)
+    
+    close = np.dot(vector, hash_embedding("plants and photosynthesis"))
+    far = np.dot(vector, hash_embedding("medieval castle architecture"))
+    assert close > far
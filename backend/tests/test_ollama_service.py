@@ -0,0 +1,386 @@
+# backend/tests/test_ollama_service.py
+
+import json
+import time
+import asyncio
+import httpx
+from contextlib import asynccontextmanager
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+from app.services.cache_service import GenerationCache
+from app.services.ollama_service import SECTION_KEYS, OllamaService
+from app.services.resilience import CircuitOpenError
+from fake_ollama import FakeOllama
+
+
+def make_transport(calls):
+    """Builds a mock transport that records every request path it receives."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "phi4:14b"}]})
+        if request.url.path == "/api/generate":
+            body = json.loads(request.content)
+            return httpx.Response(200, json={"response": f"# Notes\n{body['model']}", "done": True})
+        return httpx.Response(404)
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_generation_reuses_client_without_preflight():
+    """Generations share one client and skip the per-request /api/tags probe"""
+    calls = []
+    service = OllamaService(transport=make_transport(calls))
+    service.warm_up_on_start = False
+    await service.start()
+    try:
+        client = service.client
+        for _ in range(3):
+            result = await service.generate_study_notes("Python", "beginner", "visual")
+            assert result["content"].startswith("# Notes")
+        assert service.client is client
+        assert calls.count("/api/tags") == 1
+        assert calls.count("/api/generate") == 3
+        assert await service.check_server_health() is True
+    finally:
+        await service.close()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_keep_alive_and_prompt_prefix_reuse():
+    """The model is preloaded and kept loaded, and prompts share a cached prefix"""
+    fake = FakeOllama(load_time=0.01)
+    service = OllamaService(transport=httpx.MockTransport(fake.handler))
+    service.keep_alive = 0.3
+    service.keep_alive_refresh_interval = 0.05
+    await service.start()
+    try:
+        for _ in range(50):
+            if fake.loads:
+                break
+            await asyncio.sleep(0.01)
+        assert fake.loads == 1
+        
+        # Idle for longer than keep_alive: the refresher keeps the model loaded
+        await asyncio.sleep(0.5)
+        result = await service.generate_study_notes("Photosynthesis", "beginner", "visual")
+        stats = result["metadata"]["ollama_stats"]
+        assert fake.loads == 1
+        assert stats["load_duration"] == 0
+        
+        # Only the request-specific tail of the prompt is evaluated
+        prompt = service._create_study_notes_prompt("Photosynthesis", "beginner", "visual")
+        assert 0 < stats["prompt_eval_count"] < len(prompt.split()) / 4
+        
+        assert await service.check_model_availability() is True
+        service.model = "llama3"
+        assert await service.check_model_availability() is False
+    finally:
+        await service.close()
+
+
+@pytest.mark.asyncio
+async def test_keep_alive_refresh_is_not_suppressed_by_health_probes():
+    """Health probes more frequent than the refresh interval do not count as use"""
+    fake = FakeOllama(load_time=0.01)
+    service = OllamaService(transport=httpx.MockTransport(fake.handler))
+    service.keep_alive = 0.3
+    service.keep_alive_refresh_interval = 0.1
+    service.health_check_interval = 0.02
+    await service.start()
+    try:
+        for _ in range(50):
+            if fake.loads:
+                break
+            await asyncio.sleep(0.01)
+        warm_up_requests = fake.requests["/api/generate"]
+        
+        await asyncio.sleep(0.6)
+        assert fake.requests["/api/tags"] > 10
+        assert fake.requests["/api/generate"] > warm_up_requests
+        result = await service.generate_study_notes("Photosynthesis", "beginner", "visual")
+        assert fake.loads == 1
+        assert result["metadata"]["ollama_stats"]["load_duration"] == 0
+    finally:
+        await service.close()
+
+
+@pytest.mark.asyncio
+async def test_generation_cache_tiers_and_flags():
+    """Repeat requests hit the cache; bypass and refresh call the model again"""
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    
+    calls = []
+    cache = GenerationCache(session_factory=session_factory)
+    service = OllamaService(transport=make_transport(calls), cache=cache)
+    
+    first = await service.generate_study_notes("Python  Variables", "beginner", "visual")
+    assert "cache_hit" not in first["metadata"]
+    
+    second = await service.generate_study_notes("python variables", "beginner", "visual")
+    assert second["metadata"]["cache_hit"] == "memory"
+    assert second["content"] == first["content"]
+    
+    # The title only replaces the heading, so every title shares the entry
+    titled = await service.generate_study_notes("Python Variables", "beginner", "visual", title="Names")
+    assert titled["content"] == first["content"].replace("# Notes", "# Names", 1)
+    other = await service.generate_study_notes("Python Variables", "beginner", "visual", title="Bindings")
+    assert other["content"].startswith("# Bindings\n")
+    streamed = [chunk async for chunk in service.stream_study_notes(
+        "Python Variables", "beginner", "visual", title="Streams"
+    )]
+    assert "".join(streamed).startswith("# Streams\n")
+    fresh = [chunk async for chunk in service.stream_study_notes(
+        "Python Variables", "beginner", "visual", title="Fresh", bypass_cache=True
+    )]
+    assert "".join(fresh) == "# Fresh\nphi4:14b"
+    
+    # A fresh process only has the durable tier
+    restarted = OllamaService(transport=make_transport(calls),
+                              cache=GenerationCache(session_factory=session_factory))
+    third = await restarted.generate_study_notes("Python Variables", "beginner", "visual")
+    assert third["metadata"]["cache_hit"] == "durable"
+    
+    await service.generate_study_notes("Python Variables", "beginner", "visual", bypass_cache=True)
+    await service.generate_study_notes("Python Variables", "beginner", "visual", refresh_cache=True)
+    assert calls.count("/api/generate") == 4
+    assert cache.stats()["memory_hits"] == 4
+    assert cache.stats()["misses"] == 1
+    
+    await service.close()
+    await restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_generation():
+    """Identical concurrent requests coalesce, survive a cancelled waiter and share failures"""
+    calls = []
+    fail = {"value": False}
+    
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        if fail["value"]:
+            return httpx.Response(400, json={"error": "model not found"})
+        return httpx.Response(200, json={"response": "# Shared", "done": True})
+    
+    service = OllamaService(transport=httpx.MockTransport(handler))
+    
+    waiters = [
+        asyncio.create_task(service.generate_study_notes("Physics", "expert", "reading"))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0.01)
+    waiters[0].cancel()
+    results = await asyncio.gather(*waiters[1:])
+    
+    assert calls == ["/api/generate"]
+    assert all(result["content"] == "# Shared" for result in results)
+    assert len({result["metadata"]["generation_id"] for result in results}) == 1
+    assert sum(bool(result["metadata"].get("coalesced")) for result in results) == 4
+    
+    fail["value"] = True
+    failures = await asyncio.gather(
+        *[service.generate_study_notes("Physics", "expert", "reading") for _ in range(3)],
+        return_exceptions=True
+    )
+    assert all(isinstance(failure, RuntimeError) for failure in failures)
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_sectioned_generation_runs_in_parallel_and_caches_sections(monkeypatch):
+    """Sections are generated concurrently across nodes, assembled in order and cached one by one"""
+    monkeypatch.setenv("OLLAMA_API_URLS", "http://gpu-1:11434,http://gpu-2:11434")
+    monkeypatch.setenv("OLLAMA_NODE_CONCURRENCY", "3")
+    fake = FakeOllama(latency=0.1, chunks=["Section body."])
+    service = OllamaService(transport=httpx.MockTransport(fake.handler), cache=GenerationCache())
+    
+    started = time.perf_counter()
+    result = await service.generate_study_notes(
+        "Optics", "beginner", "visual", generation_mode="sections"
+    )
+    # Five 0.1s sections on six slots take about as long as one section
+    assert time.perf_counter() - started < 0.3
+    assert fake.requests["/api/generate"] == 5
+    
+    headings = [line for line in result["content"].split("\n") if line.startswith("# ")]
+    assert headings == ["# Optics", "# Main Concepts", "# Detailed Explanations",
+                        "# Key Points to Remember", "# Practice and Application"]
+    metadata = result["metadata"]
+    assert metadata["generation_mode"] == "sections"
+    assert list(metadata["sections"]) == list(SECTION_KEYS)
+    assert metadata["ollama_stats"]["eval_count"] == 5
+    
+    # Every section is now cached; regenerating one section costs one request
+    again = await service.generate_study_notes("optics", "beginner", "visual", generation_mode="sections")
+    assert fake.requests["/api/generate"] == 5
+    assert again["content"].split("\n", 1)[1] == result["content"].split("\n", 1)[1]
+    assert {section["cache_hit"] for section in again["metadata"]["sections"].values()} == {"memory"}
+    
+    await service.generate_section("Optics", "beginner", "visual", "practice", refresh_cache=True)
+    assert fake.requests["/api/generate"] == 6
+    
+    # Concurrent sections share one generation slot; cache hits take none
+    holds = []
+    
+    @asynccontextmanager
+    async def slot():
+        holds.append(1)
+        yield
+    
+    await service.generate_study_notes("Optics", "beginner", "visual", generation_mode="sections",
+                                       refresh_cache=True, slot=slot)
+    assert fake.requests["/api/generate"] == 11
+    assert len(holds) == 1
+    await service.generate_study_notes("Optics", "beginner", "visual", generation_mode="sections", slot=slot)
+    assert len(holds) == 1
+    with pytest.raises(ValueError):
+        await service.generate_section("Optics", "beginner", "visual", "appendix")
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_node_pool_routes_by_load_and_fails_over(monkeypatch):
+    """Requests spread over free nodes, retry elsewhere and eject failing nodes"""
+    monkeypatch.setenv("OLLAMA_API_URLS", "http://gpu-1:11434,http://gpu-2:11434")
+    monkeypatch.setenv("OLLAMA_NODE_FAILURE_THRESHOLD", "2")
+    hosts = []
+    down = set()
+    
+    async def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if request.url.host in down:
+            raise httpx.ConnectError("connection refused", request=request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"response": request.url.host, "done": True})
+    
+    service = OllamaService(transport=httpx.MockTransport(handler))
+    
+    # One slot per node: two concurrent requests land on different nodes
+    results = await asyncio.gather(
+        service._make_request("first"), service._make_request("second")
+    )
+    assert sorted(content for content, _ in results) == ["gpu-1", "gpu-2"]
+    assert all(node.in_flight == 0 for node in service.pool.nodes)
+    
+    # A failed attempt moves to the other node without backing off
+    down.add("gpu-1")
+    hosts.clear()
+    content, _ = await service._make_request("third")
+    assert content == "gpu-2"
+    assert hosts == ["gpu-1", "gpu-2"]
+    
+    await service._make_request("fourth")
+    gpu_1 = service.pool.nodes[0]
+    assert gpu_1.healthy is False
+    assert gpu_1.consecutive_failures == 2
+    
+    # Ejected nodes get no traffic until a probe readmits them
+    hosts.clear()
+    await service._make_request("fifth")
+    assert hosts == ["gpu-2"]
+    
+    down.clear()
+    await service._probe_health()
+    assert gpu_1.healthy is True
+    states = {node["url"]: node["state"] for node in service.pool.status()}
+    assert states == {"http://gpu-1:11434": "healthy", "http://gpu-2:11434": "healthy"}
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_and_retry_policy(monkeypatch):
+    """Only transient errors are retried, and repeated failures open the circuit"""
+    monkeypatch.setenv("OLLAMA_RETRY_BACKOFF_BASE", "0.01")
+    monkeypatch.setenv("OLLAMA_BREAKER_FAILURE_THRESHOLD", "2")
+    monkeypatch.setenv("OLLAMA_BREAKER_RECOVERY_TIMEOUT", "0.2")
+    monkeypatch.setenv("OLLAMA_NODE_FAILURE_THRESHOLD", "100")
+    calls = []
+    status_code = {"value": 400}
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if status_code["value"] != 200:
+            return httpx.Response(status_code["value"], json={"error": "failed"})
+        return httpx.Response(200, json={"response": "# Recovered", "done": True})
+    
+    service = OllamaService(transport=httpx.MockTransport(handler))
+    
+    # Bad requests fail once and do not count against the circuit
+    with pytest.raises(RuntimeError):
+        await service._make_request("prompt")
+    assert len(calls) == 1
+    assert service.breaker.state == "closed"
+    
+    # Overload responses are retried up to max_attempts, then trip the breaker
+    status_code["value"] = 503
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await service._make_request("prompt")
+    assert len(calls) == 1 + 2 * service.max_attempts
+    assert service.breaker.state == "open"
+    
+    with pytest.raises(CircuitOpenError) as raised:
+        await service.generate_study_notes("Physics", "expert", "reading")
+    assert raised.value.retry_after > 0
+    assert len(calls) == 1 + 2 * service.max_attempts
+    
+    # After the recovery timeout one trial call closes the circuit again
+    await asyncio.sleep(0.25)
+    status_code["value"] = 200
+    content, _ = await service._make_request("prompt")
+    assert content == "# Recovered"
+    assert service.breaker.state == "closed"
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_timeouts_do_not_open_the_circuit(monkeypatch):
+    """Requests that time out waiting for a free node never count as Ollama failures"""
+    monkeypatch.setenv("OLLAMA_NODE_CONCURRENCY", "1")
+    monkeypatch.setenv("OLLAMA_BREAKER_FAILURE_THRESHOLD", "2")
+    
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.5)
+        return httpx.Response(200, json={"response": "done", "done": True})
+    
+    service = OllamaService(transport=httpx.MockTransport(handler))
+    service.request_deadline = 1.0
+    # One call holds the only node slot while others give up waiting for it
+    holder = asyncio.ensure_future(service._make_request("holder"))
+    await asyncio.sleep(0.01)
+    service.request_deadline = 0.05
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            await service._make_request("queued")
+    
+    assert (await holder)[0] == "done"
+    assert service.breaker.state == "closed"
+    assert service.breaker.times_opened == 0
+    await service.close()
+
+
+def test_create_note_fails_fast_while_circuit_is_open(mock_ollama):
+    """create_note answers 503 with Retry-After instead of calling Ollama"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    
+    breaker = mock_ollama.breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    try:
+        response = TestClient(app).post("/notes", json={
+            "topic": "Thermodynamics", "title": "Heat", "level": "beginner",
+            "learning_style": "visual", "bypass_cache": True
+        })
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+    finally:
+        breaker.record_success()
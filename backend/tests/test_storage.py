@@ -0,0 +1,403 @@
+# backend/tests/test_storage.py
+
+import gzip
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.main import app
+from app import models
+from app.compression import FORMAT_GZIP, FORMAT_RAW, compress_text, decompress_text
+from app.database import SessionLocal
+from app.schema import upgrade_schema
+
+
+def test_compression_formats_round_trip():
+    """Every format tag decodes, short values stay raw and unknown tags fail"""
+    content = "# Study Notes\n" + "Photosynthesis converts light into energy. " * 50
+    for codec in ("zstd", "gzip", "none"):
+        blob = compress_text(content, codec=codec)
+        assert decompress_text(blob) == content
+    
+    assert compress_text(content, codec="gzip")[0] == FORMAT_GZIP
+    assert len(compress_text(content, codec="gzip")) < len(content) / 5
+    assert compress_text("short", codec="gzip")[0] == FORMAT_RAW
+    with pytest.raises(ValueError):
+        decompress_text(b"\x7fpayload")
+
+
+def test_content_is_compressed_and_deferred():
+    """New rows store compressed bytes, and list loads skip the content columns"""
+    content = "Enzymes lower activation energy. " * 40
+    db = SessionLocal()
+    try:
+        note = models.Note(title="Enzymes", topic="Biochemistry", content=content,
+                           level="beginner", learning_style="reading")
+        db.add(note)
+        db.commit()
+        note_id = note.id
+        
+        raw = db.execute(
+            text("SELECT content, content_compressed FROM notes WHERE id = :id"), {"id": note_id}
+        ).one()
+        assert raw.content == ""
+        assert len(raw.content_compressed) < len(content)
+        
+        db.expunge_all()
+        loaded = db.execute(select(models.Note).where(models.Note.id == note_id)).scalar_one()
+        assert "content_compressed" not in loaded.__dict__
+        assert loaded.content == content
+    finally:
+        db.close()
+
+
+def test_upgrade_keeps_legacy_rows_readable_and_searchable():
+    """A pre-compression SQLite database is migrated in place on startup"""
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    with engine.begin() as connection:
+        connection.execute(text("""
+            CREATE TABLE notes (
+                id INTEGER PRIMARY KEY, title VARCHAR(255) NOT NULL, topic VARCHAR(255) NOT NULL,
+                content TEXT NOT NULL, level VARCHAR(50) NOT NULL, learning_style VARCHAR(50) NOT NULL,
+                note_metadata JSON, created_at DATETIME, updated_at DATETIME
+            )
+        """))
+        connection.execute(text("""
+            CREATE VIRTUAL TABLE notes_fts USING fts5(
+                title, topic, content, content='notes', content_rowid='id'
+            )
+        """))
+        connection.execute(text("""
+            INSERT INTO notes (id, title, topic, content, level, learning_style)
+            VALUES (1, 'Volcanoes', 'Geology', 'Magma rises through the crust.', 'beginner', 'visual')
+        """))
+    
+    models.Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+    
+    session = sessionmaker(bind=engine)()
+    try:
+        assert session.get(models.Note, 1).content == "Magma rises through the crust."
+        assert session.get(models.Note, 1).canonical_topic == "geology"
+        session.add(models.Note(title="Earthquakes", topic="Geology", content="Faults slip and magma moves.",
+                                level="beginner", learning_style="visual"))
+        session.commit()
+        
+        matches = session.execute(
+            text("SELECT rowid FROM notes_fts WHERE notes_fts MATCH 'magma' ORDER BY rowid")
+        ).scalars().all()
+        assert matches == [1, 2]
+    finally:
+        session.close()
+
+
+def test_responses_are_gzipped_above_threshold():
+    """Large JSON responses are gzip-encoded; small ones are not"""
+    db = SessionLocal()
+    try:
+        for index in range(3):
+            db.add(models.Note(title=f"Gzip {index}", topic="Compression", content="zip " * 500,
+                               level="beginner", learning_style="visual"))
+        db.commit()
+    finally:
+        db.close()
+    
+    client = TestClient(app)
+    large = client.get("/notes", params={"limit": 3}, headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.json()["notes"]
+    
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    
+    # Streams pass through uncompressed, however large
+    stream = client.get("/notes/export", headers={"Accept-Encoding": "gzip"})
+    assert stream.headers["content-type"].startswith("application/x-ndjson")
+    assert "content-encoding" not in stream.headers
+    assert len(stream.content) > 1000 and b'"Gzip 0"' in stream.content
+
+
+def test_export_and_import_round_trip():
+    """Notes export as NDJSON, resume by id, and import back idempotently"""
+    db = SessionLocal()
+    try:
+        notes = [models.Note(title=f"Transfer {index}", topic="Migration", content="move " * 100,
+                             level="expert", learning_style="reading", note_metadata={"n": index})
+                 for index in range(3)]
+        db.add_all(notes)
+        db.commit()
+        note_ids = [note.id for note in notes]
+    finally:
+        db.close()
+    
+    client = TestClient(app)
+    after_id = note_ids[0] - 1
+    response = client.get("/notes/export", params={"after_id": after_id, "batch_size": 2})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    exported = [record for record in records if record["type"] == "note"]
+    assert [record["id"] for record in exported] == note_ids
+    assert exported[0]["content"] == "move " * 100
+    assert exported[1]["metadata"] == {"n": 1}
+    assert [record["exported"] for record in records if record["type"] == "progress"] == [2, 3]
+    assert records[-1] == {"type": "end", "exported": 3, "last_id": note_ids[-1]}
+    
+    resumed = client.get("/notes/export", params={"after_id": note_ids[1]})
+    assert [json.loads(line)["id"] for line in resumed.text.splitlines()[:1]] == [note_ids[2]]
+    
+    gzipped = client.get("/notes/export", params={"after_id": after_id, "compression": "gzip",
+                                                  "batch_size": 2},
+                         headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-type"] == "application/gzip"
+    assert "content-encoding" not in gzipped.headers
+    # One sync flush per batch of notes and one for the end record, not one per record
+    assert gzipped.content.count(b"\x00\x00\xff\xff") == 3
+    body = gzip.decompress(gzipped.content)
+    assert [record for record in map(json.loads, body.decode().splitlines())
+            if record["type"] == "note"] == exported
+    
+    # Importing into a database that already holds the notes changes nothing
+    summary = client.post("/notes/import", content=body).json()
+    assert summary["imported"] == 0 and summary["existing"] == 3 and summary["complete"]
+    
+    db = SessionLocal()
+    try:
+        db.execute(text("DELETE FROM notes WHERE id IN (:a, :b)"), {"a": note_ids[1], "b": note_ids[2]})
+        db.commit()
+    finally:
+        db.close()
+    
+    summary = client.post(
+        "/notes/import", params={"after_id": note_ids[0], "batch_size": 1},
+        content=body + b"not json\n"
+    ).json()
+    assert summary["imported"] == 2 and summary["skipped"] == 1
+    assert summary["last_id"] == note_ids[2]
+    assert summary["failed"] == 1 and summary["errors"][0]["line"] == 7
+    restored = client.get(f"/notes/{note_ids[2]}").json()
+    assert restored["content"] == "move " * 100 and restored["metadata"] == {"n": 2}
+    search = client.get("/notes/search", params={"q": "Transfer 1"}).json()
+    assert note_ids[1] in [result["id"] for result in search["results"]]
+    
+    # ids=new copies the notes under fresh ids
+    summary = client.post("/notes/import", params={"ids": "new"}, content=gzip.compress(body)).json()
+    assert summary["imported"] == 3
+    assert client.get("/notes/export", params={"after_id": note_ids[-1]}).text.count('"Transfer 0"') == 1
+    
+    # Imported notes are embedded after the summary is sent
+    semantic = client.get("/notes/semantic", params={"q": "Transfer 2 Migration move", "k": 50}).json()
+    assert any(result["id"] > note_ids[-1] and result["title"] == "Transfer 2"
+               for result in semantic["results"])
+
+
+@pytest.mark.asyncio
+async def test_embedding_backfill_indexes_imported_notes():
+    """Backfill embeds imported notes, which are written without embeddings"""
+    from app.database import AsyncSessionLocal
+    from app.services import transfer_service
+    from app.services.embedding_service import EmbeddingService, hash_embedding
+    
+    async def lines():
+        yield json.dumps({"type": "note", "title": "Imported Glaciers", "topic": "Glaciology",
+                          "content": "Glaciers carve valleys into bedrock.", "level": "beginner",
+                          "learning_style": "reading"})
+    
+    summary = await transfer_service.import_notes(AsyncSessionLocal, lines(), keep_ids=False)
+    assert summary["imported"] == 1
+    
+    async def embed(text):
+        return hash_embedding(text)
+    
+    service = EmbeddingService(embed=embed, session_factory=AsyncSessionLocal, model="backfill-test")
+    await service.ensure_loaded()
+    assert await service.backfill() >= 1
+    
+    async with AsyncSessionLocal() as db:
+        imported = (await db.execute(
+            select(models.Note.id).where(models.Note.title == "Imported Glaciers")
+        )).scalar_one()
+    matches = await service.search_text("Imported Glaciers\nGlaciology\nGlaciers carve valleys", k=1)
+    assert matches[0][0] == imported
+    assert await service.backfill() == 0
+
+
+@pytest.mark.asyncio
+async def test_group_commit_writer_batches_concurrent_inserts():
+    """Concurrent saves share one commit, and a bad row only fails its own caller"""
+    from app.database import AsyncSessionLocal
+    from app.services import note_service
+    from app.services.note_writer import GroupCommitWriter
+    
+    writer = GroupCommitWriter(session_factory=AsyncSessionLocal, write=note_service.insert_notes)
+    writer.max_wait = 0.05
+    
+    def row(index, level="beginner"):
+        return {"title": f"Grouped {index}", "topic": "Group commit", "level": level,
+                "learning_style": "visual",
+                "generation_result": {"content": f"grouped note {index}", "metadata": {}}}
+    
+    try:
+        saved = await asyncio.gather(*(writer.submit(row(index)) for index in range(8)))
+        assert writer.groups == 1 and writer.rows == 8
+        assert len({note_id for note_id, _ in saved}) == 8
+        assert all(created_at is not None for _, created_at in saved)
+        
+        # NOT NULL violation: the group is retried row by row
+        results = await asyncio.gather(
+            writer.submit(row(8)), writer.submit(row(9, level=None)), writer.submit(row(10)),
+            return_exceptions=True
+        )
+        assert isinstance(results[1], Exception)
+        assert not isinstance(results[0], Exception) and not isinstance(results[2], Exception)
+    finally:
+        await writer.close()
+    
+    async with AsyncSessionLocal() as db:
+        note = await note_service.get_note(db, saved[3][0])
+        assert note.title == "Grouped 3" and note.content == "grouped note 3"
+
+
+@pytest.mark.asyncio
+async def test_shared_note_insert_survives_first_caller_going_away():
+    """The shared-row insert runs on its own session, not the first caller's"""
+    from app.database import AsyncSessionLocal
+    from app.services import note_service
+    
+    result = {"content": "shared generation", "metadata": {"generation_id": "shared-insert-test"}}
+    
+    async def save(db):
+        return await note_service.save_generated_note(
+            db, title="Shared", topic="Sharing", level="beginner", learning_style="visual",
+            generation_result=result, share_rows=True, session_factory=AsyncSessionLocal
+        )
+    
+    first_db, second_db = AsyncSessionLocal(), AsyncSessionLocal()
+    first = asyncio.ensure_future(save(first_db))
+    second = asyncio.ensure_future(save(second_db))
+    # The first request disconnects while the insert is under way: its task
+    # is cancelled and its session closed
+    for _ in range(50):
+        if first_db.in_transaction():
+            break
+        await asyncio.sleep(0)
+    first.cancel()
+    await first_db.close()
+    try:
+        note = await second
+        assert note.id is not None and note.content == "shared generation"
+    finally:
+        await second_db.close()
+    
+    async with AsyncSessionLocal() as db:
+        assert (await note_service.get_note(db, note.id)).title == "Shared"
+    
+    # Callers of one generation under another title get a row of their own
+    async with AsyncSessionLocal() as db:
+        other = await note_service.save_generated_note(
+            db, title="Other", topic="Sharing", level="beginner", learning_style="visual",
+            generation_result=result, share_rows=True, session_factory=AsyncSessionLocal
+        )
+        assert other.id != note.id and other.title == "Other"
+
+
+def test_topic_canonicalization_and_trigram_matching():
+    """Reworded topics share a canonical form; near misses score by trigrams"""
+    from app.topics import canonical_topic, trigram_similarity
+    
+    assert canonical_topic("Python Variables") == "python variables"
+    assert canonical_topic("  python   variables ") == "python variables"
+    assert canonical_topic("Variables in Python!") == "python variables"
+    assert canonical_topic("The") == "the"
+    assert trigram_similarity("python variables", "python variables") == 1.0
+    assert trigram_similarity("python variable", "python variables") > 0.8
+    assert trigram_similarity("python variables", "cell biology") == 0.0
+    
+    db = SessionLocal()
+    try:
+        note = models.Note(title="Vars", topic="Variables in Python", content="x = 1 " * 20,
+                           level="beginner", learning_style="reading")
+        db.add(note)
+        db.commit()
+        assert note.canonical_topic == "python variables"
+        note_id = note.id
+    finally:
+        db.close()
+    
+    client = TestClient(app)
+    matches = client.get("/notes/topic-matches", params={
+        "topic": "python variables ", "level": "beginner", "learning_style": "reading"
+    }).json()
+    assert matches["canonical_topic"] == "python variables"
+    assert matches["results"][0]["id"] == note_id and matches["results"][0]["score"] == 1.0
+    
+    fuzzy = client.get("/notes/topic-matches", params={"topic": "Python Variable", "threshold": 0.7}).json()
+    assert note_id in [result["id"] for result in fuzzy["results"]]
+    assert client.get("/notes/topic-matches", params={
+        "topic": "Python Variable", "level": "expert"
+    }).json()["results"] == []
+    
+    # create_note serves the existing note instead of generating
+    response = client.post("/notes", json={
+        "topic": "PYTHON VARIABLES", "title": "Again", "level": "beginner",
+        "learning_style": "reading", "reuse_topic": True
+    })
+    assert response.status_code == 200
+    assert response.json()["id"] == note_id
+    assert response.json()["metadata"]["match"] == "topic"
+    
+    # So do queued jobs
+    from app.main import _run_generation_job
+    assert asyncio.run(_run_generation_job({
+        "topic": "Variables in Python", "title": "Queued", "level": "beginner",
+        "learning_style": "reading", "reuse_topic": True
+    })) == note_id
+
+    # Topics that differ in symbols or in what kind of note they ask for stay apart
+    for first, second in (("C++ Pointers", "C Pointers"), ("C# Pointers", "C Pointers"),
+                          ("C++ Pointers", "C# Pointers"), ("F# Basics", "F Basics"),
+                          (".NET Core", "Core"), ("Introduction to Python", "Python"),
+                          ("Python Basics", "Python")):
+        assert canonical_topic(first) != canonical_topic(second)
+        assert trigram_similarity(canonical_topic(first), canonical_topic(second)) < 0.8
+    
+    db = SessionLocal()
+    try:
+        db.add(models.Note(title="C", topic="C Pointers", content="int *p; " * 20,
+                           level="intermediate", learning_style="kinesthetic"))
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/notes/topic-matches", params={
+        "topic": "C++ Pointers", "level": "intermediate", "learning_style": "kinesthetic"
+    }).json()["results"] == []
+
+
+def test_section_offsets_parse_and_replace():
+    """Sections are located by heading and replaced without touching the rest"""
+    from app.sections import parse_sections, replace_section, split_section
+    
+    content = "# Tides\nThe sea moves.\n\n## Main Concepts\nGravity.\n### Moon\nPulls.\n\n# Practice and Application\nQ1."
+    offsets = parse_sections(content)
+    assert list(offsets) == ["introduction", "main_concepts", "practice"]
+    assert split_section(content[slice(*offsets["main_concepts"])]) == ("Main Concepts", "Gravity.\n### Moon\nPulls.")
+    assert split_section(content[slice(*offsets["practice"])]) == ("Practice and Application", "Q1.")
+    
+    replaced = replace_section(content, offsets, "main_concepts", "# Main Concepts\nMass attracts.")
+    assert replaced == "# Tides\nThe sea moves.\n\n# Main Concepts\nMass attracts.\n\n# Practice and Application\nQ1."
+    assert replace_section(content, offsets, "practice", "# Practice and Application\nQ2.").endswith("\n\n# Practice and Application\nQ2.")
+    assert parse_sections("Just text.") == {"introduction": [0, 10]}
+    
+    db = SessionLocal()
+    try:
+        note = models.Note(title="Tides", topic="Tides", content=content,
+                           level="beginner", learning_style="reading")
+        db.add(note)
+        db.commit()
+        assert db.get(models.Note, note.id).section_offsets == offsets
+    finally:
+        db.close()